@@ -0,0 +1,368 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+# The combat rules, monster data and spawn tables are the dungeon simulator's
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import dungeon_run_simulator as sim
+from sim_engine import BLEED_INTERVAL, POTION_THRESHOLD
+
+# ==============================================================================
+# HEADLESS GAME CORE
+# ==============================================================================
+#
+# A pure-Python stand-in for the browser game, for training without Chrome.
+# It keeps the parts of a dungeon floor an agent observes and acts on: a
+# tile grid of rooms and corridors, walls, enemies that wake up and chase,
+# combat, loot piles and a way down. Everything numeric comes from
+# dungeon_run_simulator: tiered spawns per room, floor scaling, hit and crit
+# chances, damage, attack and move intervals, stun, bleed, potions,
+# level-ups and loot rolls, via its cached matchup_params(). Time runs in the
+# simulator's 0.1s combat ticks, STEP_TICKS per env step.
+#
+# Observations have the browser env's layout: the 11x11 tiles around the
+# player (0 floor, 1 wall, 2 enemy, 3 loot, 9 off the map) and
+# [hp, max_hp, level, gold].
+
+MAP_WIDTH = 64
+MAP_HEIGHT = 64
+VIEW_RADIUS = 5          # 11x11 view, as JS_OBSERVATION_SCRIPT
+ROOM_SIZE = (5, 10)      # Room width/height range in tiles (walls not included)
+ROOM_ATTEMPTS = 60       # Placement tries per room wanted
+AGGRO_RADIUS = 6         # Enemies this close (in tiles) wake up and chase
+STEP_TICKS = 2           # Combat ticks per env step (the game moves a tile every ~150ms)
+STARTING_GOLD = 50       # game.gold at the start of a run
+LOOT_GOLD = {'junk': 2, 'trophy': 10, 'gear': 25}  # Gold a loot pile is worth
+
+# Observation codes
+FLOOR, WALL, ENEMY, LOOT, OFF_MAP = 0, 1, 2, 3, 9
+
+# Action -> (dx, dy); 0 attacks the nearest enemy in reach (SPACE)
+MOVES = {1: (0, -1), 2: (0, 1), 3: (-1, 0), 4: (1, 0)}
+
+class Enemy:
+    """One monster on the floor"""
+
+    __slots__ = ('name', 'x', 'y', 'hp', 'awake', 'next_attack', 'next_move',
+                 'stun_end', 'bleed_end', 'bleed_pulse')
+
+    def __init__(self, name, x, y, hp):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.hp = hp
+        self.awake = False
+        self.next_attack = 0
+        self.next_move = 0
+        self.stun_end = 0    # Stunned while tick < stun_end
+        self.bleed_end = 0   # Bleeds on every BLEED_INTERVAL-th tick up to bleed_end
+        self.bleed_pulse = 0
+
+# ==============================================================================
+# FLOOR GENERATION
+# ==============================================================================
+
+def place_rooms(rng, width, height, count):
+    """Up to count non-touching rooms as (x0, y0, x1, y1) inclusive floor rectangles"""
+    rooms = []
+    for _ in range(ROOM_ATTEMPTS * count):
+        if len(rooms) == count:
+            break
+        w = rng.randint(*ROOM_SIZE)
+        h = rng.randint(*ROOM_SIZE)
+        x0 = rng.randint(1, width - w - 1)
+        y0 = rng.randint(1, height - h - 1)
+        x1, y1 = x0 + w - 1, y0 + h - 1
+        if all(x0 > bx1 + 1 or x1 < bx0 - 1 or y0 > by1 + 1 or y1 < by0 - 1
+               for bx0, by0, bx1, by1 in rooms):
+            rooms.append((x0, y0, x1, y1))
+    return rooms
+
+def carve_floor(rng, width, height, count):
+    """
+    A floor of count rooms chained by L-shaped corridors, in the order they
+    were placed. Returns (walls, rooms): a (height, width) bool array and
+    the room rectangles.
+    """
+    walls = np.ones((height, width), dtype=bool)
+    rooms = place_rooms(rng, width, height, count)
+    for x0, y0, x1, y1 in rooms:
+        walls[y0:y1 + 1, x0:x1 + 1] = False
+    for (ax0, ay0, ax1, ay1), (bx0, by0, bx1, by1) in zip(rooms, rooms[1:]):
+        ax, ay = (ax0 + ax1) // 2, (ay0 + ay1) // 2
+        bx, by = (bx0 + bx1) // 2, (by0 + by1) // 2
+        if rng.random() < 0.5:
+            walls[ay, min(ax, bx):max(ax, bx) + 1] = False
+            walls[min(ay, by):max(ay, by) + 1, bx] = False
+        else:
+            walls[min(ay, by):max(ay, by) + 1, ax] = False
+            walls[by, min(ax, bx):max(ax, bx) + 1] = False
+    return walls, rooms
+
+def room_center(room):
+    x0, y0, x1, y1 = room
+    return (x0 + x1) // 2, (y0 + y1) // 2
+
+# ==============================================================================
+# GAME
+# ==============================================================================
+
+class HeadlessGame:
+    """
+    One game: a player going down floor after floor until they die.
+
+    Each floor has the simulator's room count for it plus a start room. Room
+    k (in corridor order) spawns enemies like the simulator's k-th room on
+    that floor, and the last room holds the way down. Walking onto it heals
+    the player fully (as leaving a floor does in the simulator) and
+    generates the next floor.
+
+    All randomness comes from one random.Random, so a seed reproduces a
+    game exactly, and games are independent of each other and of the
+    global random module.
+    """
+
+    def __init__(self, seed=None, width=MAP_WIDTH, height=MAP_HEIGHT, weapon=None, strategy=None,
+                 cfg=sim.DEFAULT_CONFIG):
+        self.width = width
+        self.height = height
+        self.weapon = weapon
+        self.strategy = strategy
+        self.cfg = cfg
+        self.rng = random.Random(seed)
+        self.reset()
+
+    # --- Setup ---------------------------------------------------------------
+
+    def reset(self, seed=None):
+        """Start a new run (reseeding the game's RNG first when seed is given)"""
+        if seed is not None:
+            self.rng.seed(seed)
+        rand = self.rng.random
+        weapon = self.weapon or self.rng.choice(list(self.cfg.starter_weapons))
+        strategy = self.strategy or self.cfg.strategy_sampler.draw(rand)
+        self.player = sim.create_player(weapon, strategy, self.cfg)
+        self.gold = STARTING_GOLD
+        self.inventory = []
+        self.tick = 0
+        self.next_attack = 0
+        self.floor = 0
+        self.kills = 0
+        self.new_floor()
+
+    def new_floor(self):
+        """Generate the next floor and put the player in its start room"""
+        cfg = self.cfg
+        rng = self.rng
+        self.floor += 1
+        settings = cfg.floor_settings(self.floor)
+        walls, rooms = carve_floor(rng, self.width, self.height, settings['rooms'] + 1)
+
+        R = VIEW_RADIUS
+        self.walls = walls
+        self.view = np.full((self.height + 2 * R, self.width + 2 * R), OFF_MAP, dtype=np.int32)
+        self.view[R:-R, R:-R] = np.where(walls, WALL, FLOOR)
+        self.occupant = [[None] * self.width for _ in range(self.height)]
+        self.loot = {}
+        self.enemies = []
+        self.awake = []
+
+        self.x, self.y = room_center(rooms[0])
+        self.exit = room_center(rooms[-1])
+
+        for room_number, (x0, y0, x1, y1) in enumerate(rooms[1:], 1):
+            if rng.random() < settings['empty_room_chance']:
+                continue
+            spawner = cfg.spawn_table(self.floor, room_number)
+            for _ in range(rng.randint(*settings['enemies_per_room'])):
+                x, y = rng.randint(x0, x1), rng.randint(y0, y1)
+                if self.occupant[y][x] is not None or (x, y) == self.exit:
+                    continue
+                name = spawner.draw(rng.random)
+                hp = int(sim.apply_floor_scaling(cfg.monster_stats[name]['hp'], self.floor, cfg))
+                enemy = Enemy(name, x, y, hp)
+                self.enemies.append(enemy)
+                self.occupant[y][x] = enemy
+                self.refresh(x, y)
+        self.wake()
+
+    # --- Grid ----------------------------------------------------------------
+
+    def refresh(self, x, y):
+        """Recompute a tile's observation code (loot shows over enemies, as in the browser)"""
+        code = LOOT if (x, y) in self.loot else ENEMY if self.occupant[y][x] is not None else \
+            WALL if self.walls[y, x] else FLOOR
+        self.view[y + VIEW_RADIUS, x + VIEW_RADIUS] = code
+
+    def blocked(self, x, y):
+        return not (0 <= x < self.width and 0 <= y < self.height) or self.walls[y, x]
+
+    def wake(self):
+        """Wake every sleeping enemy within AGGRO_RADIUS of the player"""
+        for enemy in self.enemies:
+            if not enemy.awake and enemy.hp > 0 and \
+                    max(abs(enemy.x - self.x), abs(enemy.y - self.y)) <= AGGRO_RADIUS:
+                enemy.awake = True
+                enemy.next_attack = self.tick + self.cfg.monster_ticks[enemy.name]
+                enemy.next_move = self.tick + self.cfg.move_ticks[enemy.name]
+                self.awake.append(enemy)
+
+    # --- Combat --------------------------------------------------------------
+
+    def matchup(self, enemy):
+        p = self.player
+        return sim.matchup_params(p['weapon_name'], p['str'], p['agi'], p['pDef'],
+                                  enemy.name, self.floor, self.cfg)
+
+    def player_attack(self, enemy):
+        """One swing at enemy with the fight()'s rolls: hit, crit, stun, bleed"""
+        c = self.matchup(enemy)
+        rand = self.rng.random
+        self.next_attack = self.tick + c['p_ticks']
+        if c['p_hit'] < 1.0 and rand() >= c['p_hit']:
+            return
+        dmg = max(1, int(c['p_raw']))
+        if c['p_crit'] and rand() < c['p_crit']:
+            dmg = int(dmg * c['crit_mult'])
+        enemy.hp -= dmg
+        if c['stun_chance'] > 0 and rand() < c['stun_chance']:
+            enemy.stun_end = self.tick + c['stun_duration']
+        if c['bleed_chance'] > 0 and rand() < c['bleed_chance']:
+            enemy.bleed_end = self.tick + c['bleed_duration']
+            enemy.bleed_pulse = c['bleed_pulse']
+        if enemy.hp <= 0:
+            self.kill(enemy)
+
+    def monster_attack(self, enemy):
+        c = self.matchup(enemy)
+        p = self.player
+        enemy.next_attack = self.tick + c['m_ticks']
+        if c['m_hit'] < 1.0 and self.rng.random() >= c['m_hit']:
+            return
+        p['hp'] -= max(1, int(c['m_raw']))
+        if p['hp'] < POTION_THRESHOLD and p['potions'] > 0:
+            p['hp'] = min(p['max_hp'], p['hp'] + p['potion_heal'])
+            p['potions'] -= 1
+
+    def kill(self, enemy):
+        """Remove a dead enemy: XP, level-ups and a loot roll where it stood"""
+        cfg = self.cfg
+        self.kills += 1
+        self.occupant[enemy.y][enemy.x] = None
+        if enemy.awake:
+            self.awake.remove(enemy)
+        self.player['xp'] += cfg.spawn_xp[enemy.name]
+        sim.check_level_up(self.player, cfg)
+        if self.rng.uniform(0, 100) <= cfg.drop_chance:
+            self.loot.setdefault((enemy.x, enemy.y), []).append(cfg.loot_sampler.draw(self.rng.random))
+        self.refresh(enemy.x, enemy.y)
+
+    def nearest_target(self):
+        """The closest awake enemy within weapon reach, or None"""
+        reach = self.cfg.starter_weapons[self.player['weapon_name']].get('range', 1)
+        best = None
+        for enemy in self.awake:
+            distance = max(abs(enemy.x - self.x), abs(enemy.y - self.y))
+            if distance <= reach and (best is None or distance < best[0]):
+                best = (distance, enemy)
+        return best and best[1]
+
+    # --- Stepping ------------------------------------------------------------
+
+    def step(self, action):
+        """
+        Apply one action and advance STEP_TICKS ticks.
+        Actions: 1-4 move up/down/left/right (moving into an enemy attacks
+        it), 0 attacks the nearest enemy in reach. Attacks wait for the
+        weapon's attack interval. Returns whether the player is alive.
+        """
+        if action in MOVES:
+            dx, dy = MOVES[action]
+            x, y = self.x + dx, self.y + dy
+            if not self.blocked(x, y):
+                enemy = self.occupant[y][x]
+                if enemy is not None:
+                    if not enemy.awake:
+                        self.wake()
+                    if self.tick >= self.next_attack:
+                        self.player_attack(enemy)
+                else:
+                    self.x, self.y = x, y
+                    self.pick_up()
+                    if (x, y) == self.exit:
+                        self.player['hp'] = self.player['max_hp']
+                        self.new_floor()
+                        return True
+                    self.wake()
+        elif self.tick >= self.next_attack:
+            enemy = self.nearest_target()
+            if enemy is not None:
+                self.player_attack(enemy)
+
+        for _ in range(STEP_TICKS):
+            self.tick += 1
+            self.advance_enemies()
+            if self.player['hp'] <= 0:
+                return False
+        return True
+
+    def pick_up(self):
+        items = self.loot.pop((self.x, self.y), None)
+        if items:
+            self.inventory.extend(items)
+            self.gold += sum(LOOT_GOLD[item] for item in items)
+            self.refresh(self.x, self.y)
+
+    def advance_enemies(self):
+        """One tick for every awake enemy: bleed, then attack if adjacent or step closer"""
+        tick = self.tick
+        cfg = self.cfg
+        for enemy in list(self.awake):
+            if tick <= enemy.bleed_end and tick % BLEED_INTERVAL == 0:
+                enemy.hp -= enemy.bleed_pulse
+                if enemy.hp <= 0:
+                    self.kill(enemy)
+                    continue
+            if tick < enemy.stun_end:
+                continue
+            dx, dy = self.x - enemy.x, self.y - enemy.y
+            if max(abs(dx), abs(dy)) <= cfg.range_config['melee_range']:
+                if tick >= enemy.next_attack:
+                    self.monster_attack(enemy)
+                    if self.player['hp'] <= 0:
+                        return
+            elif tick >= enemy.next_move:
+                enemy.next_move = tick + cfg.move_ticks[enemy.name]
+                self.chase(enemy, dx, dy)
+
+    def chase(self, enemy, dx, dy):
+        """Step an enemy one tile towards the player, along the longer axis first"""
+        sx, sy = (dx > 0) - (dx < 0), (dy > 0) - (dy < 0)
+        options = [(sx, 0), (0, sy)] if abs(dx) >= abs(dy) else [(0, sy), (sx, 0)]
+        for mx, my in options:
+            x, y = enemy.x + mx, enemy.y + my
+            if (mx or my) and not self.walls[y, x] and self.occupant[y][x] is None \
+                    and (x, y) != (self.x, self.y):
+                self.occupant[enemy.y][enemy.x] = None
+                self.refresh(enemy.x, enemy.y)
+                enemy.x, enemy.y = x, y
+                self.occupant[y][x] = enemy
+                self.refresh(x, y)
+                return
+
+    # --- Observation ---------------------------------------------------------
+
+    def grid(self):
+        """The (2R+1)^2 tile codes around the player, row by row"""
+        size = 2 * VIEW_RADIUS + 1
+        return self.view[self.y:self.y + size, self.x:self.x + size].ravel()
+
+    def stats(self):
+        p = self.player
+        return np.array([max(0, p['hp']), p['max_hp'], p['level'], self.gold], dtype=np.float32)
+
+    @property
+    def alive(self):
+        return self.player['hp'] > 0
@@ -1,94 +1,135 @@
+import base64
+import json
+import time
+import urllib.request
+
 import gymnasium as gym
 import numpy as np
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-import time
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.by import By
+except ImportError:  # Only the browser backend needs Selenium
+    webdriver = None
+
+try:
+    import websocket  # websocket-client, installed with Selenium
+except ImportError:
+    websocket = None
 
 # ==========================================
-# PART 1: THE "MIND READER" SCRIPT
-# Now with Nan-Protection!
+# PART 1: THE STEPPING HOOK
+# The game exposes window.AgentStep (js/core/main.js): stepPacked() pauses
+# the real-time loop, holds the action's key for a fixed number of 60 Hz
+# ticks and returns the observation packed as base64 binary, all in one call.
 # ==========================================
-JS_OBSERVATION_SCRIPT = """
-    // 1. Safety Check: Is the game ready?
-    if (typeof window.gameState === 'undefined' || !window.gameState.player) {
-        return null; 
-    }
-
-    const p = window.gameState.player;
-    
-    // Check HP directly (prevent crash if function missing)
-    if (p.hp <= 0) return null; 
-
-    // 2. Define View Radius (5 tiles = 11x11 grid)
-    const R = 5; 
-    let grid = [];
-
-    // 3. Build the Local Grid
-    if (window.gameState.map && window.gameState.map.tiles) {
-        for (let y = p.y - R; y <= p.y + R; y++) {
-            for (let x = p.x - R; x <= p.x + R; x++) {
-                // Bounds check
-                if (x < 0 || y < 0 || x >= window.gameState.map.width || y >= window.gameState.map.height) {
-                    grid.push(9); 
-                    continue;
-                }
-
-                let tileValue = 0; 
-                const tile = window.gameState.map.tiles[y][x];
-                if (tile && tile.type === 'wall') tileValue = 1;
-
-                if (window.gameState.enemies) { 
-                    const enemy = window.gameState.enemies.find(m => m.x === x && m.y === y && m.hp > 0);
-                    if (enemy) tileValue = 2;
-                }
-                
-                if (window.gameState.groundLoot) { 
-                    const item = window.gameState.groundLoot.find(i => i.x === x && i.y === y);
-                    if (item) tileValue = 3;
-                }
-                grid.push(tileValue);
-            }
-        }
-    } else {
-        for(let i=0; i<121; i++) grid.push(0);
-    }
-
-    // 4. Safe Data Extraction
-    // We look for gold in multiple likely places to avoid 'undefined'
-    let currentGold = 0;
-    if (p.stats && typeof p.stats.gold === 'number') currentGold = p.stats.gold;
-    else if (p.gold && typeof p.gold === 'number') currentGold = p.gold;
-    else if (window.sessionState && typeof window.sessionState.gold === 'number') currentGold = window.sessionState.gold;
-
-    // Force everything to be a Number type
-    return {
-        "grid": grid,
-        "hp": Number(p.hp) || 0,
-        "max_hp": Number(p.maxHp) || 100,
-        "level": (p.stats && p.stats.level) ? Number(p.stats.level) : 1,
-        "gold": Number(currentGold) || 0,
-        "is_alive": p.hp > 0
-    };
-"""
+STEP_TICKS = 15  # Fixed ticks per action: one tile of movement at the player's 4 tiles/sec
+GRID_CELLS = 121
+
+STEP_EXPRESSION = "window.AgentStep.stepPacked({action}, {ticks})"
+
+# Episodes start from in-memory snapshots of seeded floors (js/core/state-snapshot.js)
+# instead of a page reload. The pool is generated once, when the env connects.
+SNAPSHOT_POOL = 32
+
+JS_FILL_POOL_SCRIPT = "return window.StateSnapshots.fill(arguments[0]);"
+RESET_EXPRESSION = "(window.StateSnapshots.reset({seed}), window.AgentStep.observePacked())"
+
+def unpack_observation(packed):
+    """AgentStep's packed observation -> (obs, is_alive), as views on the decoded bytes"""
+    raw = base64.b64decode(packed)
+    grid = np.frombuffer(raw, dtype=np.int32, count=GRID_CELLS)
+    stats = np.frombuffer(raw, dtype=np.float32, count=5, offset=GRID_CELLS * 4)
+    return {"grid": grid, "stats": stats[:4]}, stats[4] > 0
 
 # ==========================================
-# PART 2: THE GYM ENVIRONMENT
+# PART 2: THE DEVTOOLS CONNECTION
+# WebDriver commands are HTTP requests relayed through chromedriver. A
+# websocket straight to the page's DevTools endpoint stays open for the
+# whole session, so a step is one message each way.
+# ==========================================
+class DevToolsConnection:
+    def __init__(self, debugger_address):
+        with urllib.request.urlopen(f"http://{debugger_address}/json") as response:
+            targets = json.load(response)
+        page = next(t for t in targets if t["type"] == "page")
+        # Chrome rejects websocket clients that send an Origin it doesn't allow
+        self.ws = websocket.create_connection(page["webSocketDebuggerUrl"], suppress_origin=True)
+        self.message_id = 0
+
+    def evaluate(self, expression):
+        self.message_id += 1
+        self.ws.send(json.dumps({
+            "id": self.message_id,
+            "method": "Runtime.evaluate",
+            "params": {"expression": expression, "returnByValue": True}
+        }))
+        # No domains are enabled, so nothing but replies arrives; skip stale ones
+        while True:
+            message = json.loads(self.ws.recv())
+            if message.get("id") == self.message_id:
+                break
+
+        if "error" in message:
+            raise RuntimeError(f"DevTools error: {message['error'].get('message')}")
+        result = message["result"]
+        if "exceptionDetails" in result:
+            raise RuntimeError(f"Script error: {result['exceptionDetails'].get('text')}")
+        return result["result"].get("value")
+
+    def close(self):
+        self.ws.close()
+
+# ==========================================
+# PART 3: THE GYM ENVIRONMENT
 # ==========================================
 class ShiftingChasmEnv(gym.Env):
-    def __init__(self):
+    """
+    backend='browser' plays the real game in Chrome through Selenium.
+    backend='headless' plays game_core.HeadlessGame in-process instead: same
+    spaces and rewards, no browser, tens of thousands of steps per second.
+    game_options go to HeadlessGame (seed, width, height, weapon, ...).
+    step_ticks is how many fixed game ticks one browser step advances.
+    The browser backend pre-generates floors for seeds 0..snapshot_pool-1;
+    reset() picks one with the env's RNG, or generates the floor for
+    options={"floor_seed": n}.
+    """
+
+    def __init__(self, backend="browser", step_ticks=STEP_TICKS, snapshot_pool=SNAPSHOT_POOL,
+                 **game_options):
         super().__init__()
-        
-        # 1. Start the Browser
-        options = webdriver.ChromeOptions()
-        # options.add_argument("--headless") 
-        self.driver = webdriver.Chrome(options=options)
-        
-        print("Connecting to game...")
-        self.driver.get("http://localhost:8000/index.html")
-        
-        # WAITING LOOP
-        self.wait_for_game_start()
+        self.backend = backend
+        self.step_ticks = step_ticks
+        self.floor_seeds = list(range(snapshot_pool))
+        self.game = None
+        self.driver = None
+        self.devtools = None
+
+        if backend == "headless":
+            from game_core import HeadlessGame
+            self.game = HeadlessGame(**game_options)
+        elif backend == "browser":
+            if webdriver is None:
+                raise ImportError("the browser backend needs selenium (pip install selenium)")
+            # 1. Start the Browser
+            options = webdriver.ChromeOptions()
+            # options.add_argument("--headless") 
+            self.driver = webdriver.Chrome(options=options)
+
+            print("Connecting to game...")
+            self.driver.get("http://localhost:8000/index.html")
+
+            # WAITING LOOP
+            self.wait_for_game_start()
+            self.driver.execute_script(JS_FILL_POOL_SCRIPT, self.floor_seeds)
+
+            # Steps and resets go over DevTools when possible, WebDriver otherwise
+            address = self.driver.capabilities.get("goog:chromeOptions", {}).get("debuggerAddress")
+            if websocket is not None and address:
+                self.devtools = DevToolsConnection(address)
+        else:
+            raise ValueError(f"unknown backend {backend!r} (expected 'browser' or 'headless')")
 
         # 2. Define Actions
         self.action_space = gym.spaces.Discrete(5)
@@ -119,71 +160,54 @@ class ShiftingChasmEnv(gym.Env):
         print("Warning: Game start timed out.")
 
     def step(self, action):
-        # A. Send Action
-        try:
-            body = self.driver.find_element(By.TAG_NAME, "body")
-            if action == 1: body.send_keys(Keys.ARROW_UP)
-            elif action == 2: body.send_keys(Keys.ARROW_DOWN)
-            elif action == 3: body.send_keys(Keys.ARROW_LEFT)
-            elif action == 4: body.send_keys(Keys.ARROW_RIGHT)
-            else: body.send_keys(Keys.SPACE) 
-        except:
-            pass 
-
-        # B. Read the Result
-        data = self.driver.execute_script(JS_OBSERVATION_SCRIPT)
-        
-        if data is None:
-            return self._get_empty_obs(), -10, True, False, {}
-
-        # C. Process Observation (Double Safety Check)
-        # We ensure np.nan never gets into the array
-        stats_array = np.array([
-            data.get("hp", 0), 
-            data.get("max_hp", 100), 
-            data.get("level", 1), 
-            data.get("gold", 0)
-        ], dtype=np.float32)
-
-        # Final sanitization: Replace any lingering NaNs with 0
-        stats_array = np.nan_to_num(stats_array)
-
-        obs = {
-            "grid": np.array(data["grid"], dtype=np.int32),
-            "stats": stats_array
-        }
+        if self.game is not None:
+            return self._headless_step(action)
 
-        # D. Calculate Reward
-        reward = 0.1 
-        terminated = not data["is_alive"]
-        if terminated: reward = -10.0
-            
-        return obs, reward, terminated, False, {}
+        # A. Apply the action and read the result in one call
+        packed = self._evaluate(STEP_EXPRESSION.format(action=int(action), ticks=self.step_ticks))
+        if not packed:
+            return self._get_empty_obs(), -10.0, True, False, {}
+
+        obs, alive = unpack_observation(packed)
+        if not alive:
+            return self._get_empty_obs(), -10.0, True, False, {}
+
+        # B. Reward
+        return obs, 0.1, False, False, {}
 
     def reset(self, seed=None, options=None):
-        current_health = self.driver.execute_script("return (window.gameState && window.gameState.player) ? window.gameState.player.hp : 0;")
-        
-        if current_health <= 0:
-            self.driver.refresh()
-            self.wait_for_game_start()
-        
-        data = self.driver.execute_script(JS_OBSERVATION_SCRIPT)
-        if data is None: return self._get_empty_obs(), {}
-
-        stats_array = np.array([
-            data.get("hp", 100), 
-            data.get("max_hp", 100), 
-            data.get("level", 1), 
-            data.get("gold", 0)
-        ], dtype=np.float32)
-        
-        stats_array = np.nan_to_num(stats_array)
-
-        obs = {
-            "grid": np.array(data["grid"], dtype=np.int32),
-            "stats": stats_array
+        super().reset(seed=seed)
+        if self.game is not None:
+            self.game.reset(seed)
+            return self._headless_obs(), {}
+
+        if options and "floor_seed" in options:
+            floor_seed = int(options["floor_seed"])
+        elif self.floor_seeds:
+            floor_seed = int(self.np_random.choice(self.floor_seeds))
+        else:
+            floor_seed = int(self.np_random.integers(2**31))
+
+        packed = self._evaluate(RESET_EXPRESSION.format(seed=floor_seed))
+        if not packed: return self._get_empty_obs(), {}
+        return unpack_observation(packed)[0], {}
+
+    def _evaluate(self, expression):
+        if self.devtools is not None:
+            return self.devtools.evaluate(expression)
+        return self.driver.execute_script("return " + expression)
+
+    # Headless backend: the same observations and rewards, from game_core
+    def _headless_step(self, action):
+        if not self.game.step(int(action)):
+            return self._get_empty_obs(), -10.0, True, False, {}
+        return self._headless_obs(), 0.1, False, False, {}
+
+    def _headless_obs(self):
+        return {
+            "grid": self.game.grid(),
+            "stats": self.game.stats()
         }
-        return obs, {}
 
     def _get_empty_obs(self):
         return {
@@ -192,4 +216,7 @@ class ShiftingChasmEnv(gym.Env):
         }
 
     def close(self):
-        self.driver.quit()
\ No newline at end of file
+        if self.devtools is not None:
+            self.devtools.close()
+        if self.driver is not None:
+            self.driver.quit()
@@ -332,7 +332,8 @@ function initializeAllSystems() {
  * Phase 6: Post-initialization tasks
  */
 function postInitialization() {
-    if (typeof MonsterSocialSystem !== 'undefined') {
+    // advanced-enemy-system.js has a MonsterSocialSystem class without it
+    if (typeof MonsterSocialSystem !== 'undefined' && typeof MonsterSocialSystem.scanAndFormGroups === 'function') {
         MonsterSocialSystem.scanAndFormGroups();
     }
 
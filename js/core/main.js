@@ -162,10 +162,11 @@ function updatePausedState(dt) {
 }
 
 let lastTime = 0;
+let loopFrame = null;
 function loop(timestamp) {
     if (!lastTime) {
         lastTime = timestamp;
-        requestAnimationFrame(loop);
+        loopFrame = requestAnimationFrame(loop);
         return;
     }
 
@@ -178,9 +179,230 @@ function loop(timestamp) {
     update(dt);
     render();
 
-    requestAnimationFrame(loop);
+    loopFrame = requestAnimationFrame(loop);
 }
 
-requestAnimationFrame(loop);
+loopFrame = requestAnimationFrame(loop);
+
+// ============================================================================
+// AGENT STEPPING HOOK
+// ============================================================================
+
+// Fixed-timestep control for training agents (game_env.py). step() pauses
+// the real-time loop, presses the action's key, advances exactly `ticks`
+// updates of FIXED_DT each, releases the key and returns the observation,
+// all inside one script call, as fast as the updates compute.
+//
+// Several systems also read the wall clock (repath throttles, status
+// effects, boon expiry) or wait on setTimeout (freeze). While paused, a
+// virtual clock stands in for performance.now(), Date.now() and setTimeout:
+// it moves FIXED_DT per update and fires due timeouts between updates, so
+// results depend only on the game state and the actions, not on how long
+// the updates or the agent take.
+const AgentStep = {
+    FIXED_DT: 1000 / 60,
+    VIEW_RADIUS: 5,                          // 11x11 observation grid
+    ACTION_KEYS: [' ', 'ArrowUp', 'ArrowDown', 'ArrowLeft', 'ArrowRight'],
+    paused: false,
+
+    // Virtual clock (installed while paused)
+    time: 0,          // performance.now() value, ms
+    dateOffset: 0,    // Date.now() - performance.now()
+    timers: [],       // Pending setTimeout calls { id, due, callback, args }
+    nextTimerId: 1,
+    native: null,     // The real clock functions, while the virtual one is installed
+
+    pause() {
+        if (this.paused) return;
+        this.paused = true;
+        if (loopFrame !== null) cancelAnimationFrame(loopFrame);
+        loopFrame = null;
+        this.installClock();
+    },
+
+    resume() {
+        if (!this.paused) return;
+        this.paused = false;
+        this.uninstallClock();
+        lastTime = 0;   // Don't count the paused time as one huge frame
+        loopFrame = requestAnimationFrame(loop);
+    },
+
+    /**
+     * Replace performance.now, Date.now, setTimeout and clearTimeout with the
+     * virtual clock, starting from the current real time
+     */
+    installClock() {
+        if (this.native) return;
+        const native = {
+            performanceNow: performance.now,
+            dateNow: Date.now,
+            setTimeout: window.setTimeout,
+            clearTimeout: window.clearTimeout
+        };
+        this.native = native;
+        this.setClock(native.performanceNow.call(performance), native.dateNow());
+
+        performance.now = () => this.time;
+        Date.now = () => Math.floor(this.time + this.dateOffset);
+        window.setTimeout = (callback, delay = 0, ...args) => {
+            const id = this.nextTimerId++;
+            this.timers.push({ id, due: this.time + (Number(delay) || 0), callback, args });
+            return id;
+        };
+        window.clearTimeout = (id) => {
+            this.timers = this.timers.filter(timer => timer.id !== id);
+        };
+    },
+
+    /**
+     * Put the real clock back. Timeouts still pending are handed to the
+     * real setTimeout with the virtual delay they have left.
+     */
+    uninstallClock() {
+        const native = this.native;
+        if (!native) return;
+        performance.now = native.performanceNow;
+        Date.now = native.dateNow;
+        window.setTimeout = native.setTimeout;
+        window.clearTimeout = native.clearTimeout;
+        this.native = null;
+
+        for (const timer of this.timers) {
+            window.setTimeout(timer.callback, Math.max(0, timer.due - this.time), ...timer.args);
+        }
+        this.timers = [];
+    },
+
+    /**
+     * Set the virtual clock and drop its pending timeouts (StateSnapshots
+     * restores every episode to the clock its snapshot was taken at)
+     * @param {number} time - performance.now() value, ms
+     * @param {number} date - Date.now() value at the same moment
+     */
+    setClock(time, date) {
+        this.time = time;
+        this.dateOffset = date - time;
+        this.timers = [];
+    },
+
+    /**
+     * Move the virtual clock forward and run the timeouts that came due,
+     * earliest first
+     * @param {number} ms - Milliseconds to advance
+     */
+    advanceClock(ms) {
+        this.time += ms;
+        for (;;) {
+            let next = null;
+            for (const timer of this.timers) {
+                if (timer.due <= this.time && (!next || timer.due < next.due)) next = timer;
+            }
+            if (!next) break;
+            this.timers.splice(this.timers.indexOf(next), 1);
+            if (typeof next.callback === 'function') next.callback(...next.args);
+        }
+    },
+
+    /**
+     * Apply an action for a fixed number of ticks
+     * @param {number} action - Index into ACTION_KEYS (0 = space, 1-4 = arrows)
+     * @param {number} ticks - Fixed updates to advance while the key is held
+     * @returns {object|null} observe() after the ticks
+     */
+    step(action, ticks = 1) {
+        this.pause();
+        const key = this.ACTION_KEYS[action] || ' ';
+        // Through the real listeners, so keys[] and every key handler see it
+        window.dispatchEvent(new KeyboardEvent('keydown', { key }));
+        for (let i = 0; i < ticks; i++) {
+            this.advanceClock(this.FIXED_DT);
+            update(this.FIXED_DT);
+        }
+        window.dispatchEvent(new KeyboardEvent('keyup', { key }));
+        render();
+        return this.observe();
+    },
+
+    /**
+     * The agent's view: an 11x11 grid around the player (0 floor, 1 wall,
+     * 2 enemy, 3 loot, 9 off the map) and the player's stats
+     * @returns {object|null} null until a player exists
+     */
+    observe() {
+        const p = game.player;
+        if (!p) return null;
+
+        const R = this.VIEW_RADIUS;
+        const size = 2 * R + 1;
+        const grid = new Array(size * size).fill(0);
+        // Positions are fractional mid-move (91.99999 on the way to 92), so round to a tile
+        const px = Math.round(p.gridX);
+        const py = Math.round(p.gridY);
+        const cell = (x, y) => {
+            const dx = x - px + R;
+            const dy = y - py + R;
+            return (dx >= 0 && dy >= 0 && dx < size && dy < size) ? dy * size + dx : -1;
+        };
+
+        for (let dy = 0; dy < size; dy++) {
+            const row = game.map[py - R + dy];
+            for (let dx = 0; dx < size; dx++) {
+                const tile = row ? row[px - R + dx] : undefined;
+                if (!tile) grid[dy * size + dx] = 9;
+                else if (tile.type === 'wall' || tile.type === 'void' || tile.type === 'interior_wall') {
+                    grid[dy * size + dx] = 1;
+                }
+            }
+        }
+        for (const enemy of game.enemies || []) {
+            if (enemy.hp <= 0) continue;
+            const i = cell(Math.round(enemy.gridX), Math.round(enemy.gridY));
+            if (i >= 0) grid[i] = 2;
+        }
+        for (const pile of game.groundLoot || []) {
+            const i = cell(Math.round(pile.x), Math.round(pile.y));
+            if (i >= 0) grid[i] = 3;
+        }
+
+        let gold = 0;
+        if (p.stats && typeof p.stats.gold === 'number') gold = p.stats.gold;
+        else if (typeof p.gold === 'number') gold = p.gold;
+        else if (typeof sessionState !== 'undefined' && typeof sessionState.gold === 'number') gold = sessionState.gold;
+
+        return {
+            grid,
+            hp: Number(p.hp) || 0,
+            max_hp: Number(p.maxHp) || 100,
+            level: (p.stats && p.stats.level) ? Number(p.stats.level) : 1,
+            gold: Number(gold) || 0,
+            is_alive: p.hp > 0
+        };
+    },
+
+    /**
+     * step() with the observation packed as base64 binary: 121 int32 grid
+     * cells, then float32 hp, max_hp, level, gold and is_alive (1/0)
+     * @returns {string} Packed observation, '' until a player exists
+     */
+    stepPacked(action, ticks = 1) {
+        return this.pack(this.step(action, ticks));
+    },
+
+    observePacked() {
+        return this.pack(this.observe());
+    },
+
+    pack(obs) {
+        if (!obs) return '';
+        const cells = obs.grid.length;
+        const buffer = new ArrayBuffer((cells + 5) * 4);
+        new Int32Array(buffer, 0, cells).set(obs.grid);
+        new Float32Array(buffer, cells * 4, 5).set(
+            [obs.hp, obs.max_hp, obs.level, obs.gold, obs.is_alive ? 1 : 0]);
+        return btoa(String.fromCharCode.apply(null, new Uint8Array(buffer)));
+    }
+};
+window.AgentStep = AgentStep;
 
 console.log('✅ Main loop loaded. Enable perf monitoring with: perfMonitor.enabled = true');
@@ -0,0 +1,168 @@
+// === js/core/state-snapshot.js ===
+// Seeded dungeon generation and in-memory snapshot/restore of the game state,
+// so training environments can start an episode without reloading the page
+
+// ============================================================================
+// SEEDED RANDOM
+// ============================================================================
+
+/**
+ * Seedable replacement for Math.random (mulberry32). The game draws all of
+ * its randomness from Math.random, so installing this makes generation
+ * reproducible from a seed, and play too when time comes from AgentStep's
+ * virtual clock.
+ */
+const SeededRandom = {
+    state: 0,
+    installed: false,
+    nativeRandom: Math.random,
+
+    next() {
+        let t = (this.state = (this.state + 0x6D2B79F5) | 0);
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    },
+
+    seed(seed) {
+        this.state = seed | 0;
+        if (!this.installed) {
+            Math.random = () => this.next();
+            this.installed = true;
+        }
+    },
+
+    uninstall() {
+        Math.random = this.nativeRandom;
+        this.installed = false;
+    }
+};
+
+// ============================================================================
+// SNAPSHOTS
+// ============================================================================
+
+const StateSnapshots = {
+    // Pre-generated floors by seed
+    pool: new Map(),
+
+    /**
+     * Generate a floor-1 dungeon from a seed and capture it, as
+     * initializeDungeonCore() would build it up to the player's placement.
+     * Leaves the generated floor loaded but not started.
+     * @param {number} seed - Generation seed
+     * @returns {Object} Snapshot { seed, rngState, time, date, state }
+     */
+    generate(seed) {
+        cleanupPreviousGame();
+        resetGameState();
+        SeededRandom.seed(seed);
+        generateDungeon();
+        initializePlayer();
+        return this.capture(seed);
+    },
+
+    /**
+     * Deep copy of the game state, the random generator's position and the
+     * clock (performance.now() and Date.now()).
+     * structuredClone keeps Sets, Maps and the shared references between
+     * tiles, rooms and decorations intact. Enemy AI controllers aren't
+     * copied; restore() registers fresh ones.
+     * @param {number} seed - Seed the state was generated from
+     * @returns {Object} Snapshot
+     */
+    capture(seed) {
+        const detached = (game.enemies || []).map(enemy => {
+            const ai = enemy.ai;
+            delete enemy.ai;
+            return ai;
+        });
+        try {
+            return {
+                seed,
+                rngState: SeededRandom.state,
+                time: performance.now(),
+                date: Date.now(),
+                state: structuredClone(game)
+            };
+        } finally {
+            game.enemies.forEach((enemy, i) => {
+                if (detached[i] !== undefined) enemy.ai = detached[i];
+            });
+        }
+    },
+
+    /**
+     * Load a snapshot and start the run on it: systems, extraction points
+     * and the starter chest are set up as after a fresh generation. With
+     * AgentStep loaded, the real-time loop is paused and its virtual clock
+     * set back to the snapshot's, so together with the random generator
+     * every restore of a snapshot plays out the same for the same actions.
+     * Without it, systems that read the wall clock see real time.
+     * The snapshot itself is left untouched for reuse.
+     * @param {Object} snapshot - From generate()/capture()
+     */
+    restore(snapshot) {
+        cleanupPreviousGame();
+        for (const key of Object.keys(game)) {
+            delete game[key];
+        }
+        Object.assign(game, structuredClone(snapshot.state));
+        SeededRandom.seed(snapshot.rngState);
+        if (typeof AgentStep !== 'undefined') {
+            AgentStep.pause();
+            AgentStep.setClock(snapshot.time, snapshot.date);
+        }
+
+        if (typeof SessionManager !== 'undefined') {
+            SessionManager.startRun(game.floor, [], 0);
+        }
+        initializeCamera();
+        initializeAllSystems();
+        if (typeof ExtractionSystem !== 'undefined' && game.rooms) {
+            const spawnRoom = game.rooms.find(r => r.type === 'entrance');
+            ExtractionSystem.init(game.floor, game.rooms, spawnRoom);
+        }
+        postInitialization();
+        game.state = 'playing';
+    },
+
+    /**
+     * Pre-generate snapshots for a list of seeds
+     * @param {Array<number>} seeds - Seeds to generate
+     * @returns {number} Pool size
+     */
+    fill(seeds) {
+        for (const seed of seeds) {
+            if (!this.pool.has(seed)) {
+                this.pool.set(seed, this.generate(seed));
+            }
+        }
+        return this.pool.size;
+    },
+
+    /**
+     * Start an episode on the floor for a seed, generating (and pooling)
+     * it first if it isn't in the pool yet
+     * @param {number} seed - Generation seed
+     */
+    reset(seed) {
+        if (!this.pool.has(seed)) {
+            this.pool.set(seed, this.generate(seed));
+        }
+        this.restore(this.pool.get(seed));
+    },
+
+    clear() {
+        this.pool.clear();
+    }
+};
+
+// ============================================================================
+// EXPORTS
+// ============================================================================
+
+window.SeededRandom = SeededRandom;
+window.StateSnapshots = StateSnapshots;
+
+console.log('✅ State snapshots loaded');
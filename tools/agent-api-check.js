@@ -0,0 +1,169 @@
+#!/usr/bin/env node
+// ============================================================================
+// AGENT API CHECK - The Shifting Chasm
+// ============================================================================
+// End-to-end check of what game_env.py's browser backend calls:
+// StateSnapshots.fill() and reset() (js/core/state-snapshot.js) and
+// AgentStep.stepPacked() (js/core/main.js). Loads index.html's scripts in
+// a Node vm with a stub DOM, so it runs without a browser.
+// Run: node tools/agent-api-check.js
+// ============================================================================
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const ROOT = path.join(__dirname, '..');
+const SEEDS = [1, 2];
+const ACTIONS = [4, 4, 2, 2, 3, 1, 0, 4, 2, 3, 3, 1];  // Indices into AgentStep.ACTION_KEYS
+const TICKS = 15;
+const GRID_CELLS = 121;
+const GRID_CODES = new Set([0, 1, 2, 3, 9]);
+
+// ============================================================================
+// STUB DOM
+// ============================================================================
+
+/**
+ * Stand-in for any browser object: every property is another stub, calls
+ * and constructors return stubs, and it converts to 0. Enough for the
+ * renderer and UI code to run without drawing anything.
+ */
+function stub() {
+    const props = {};
+    return new Proxy(function () {}, {
+        get(target, key) {
+            if (key === Symbol.toPrimitive || key === 'toString' || key === 'valueOf') return () => 0;
+            if (key === Symbol.iterator) return function* () {};
+            if (key === 'then' || key === 'prototype') return undefined;
+            if (key === 'length') return 0;
+            if (!(key in props)) props[key] = stub();
+            return props[key];
+        },
+        set(target, key, value) { props[key] = value; return true; },
+        apply() { return stub(); },
+        construct() { return stub(); },
+        has() { return true; }
+    });
+}
+
+function createContext() {
+    const listeners = {};
+    const storage = {};
+    const quiet = () => {};
+    const ctx = {
+        console: { log: quiet, info: quiet, debug: quiet, warn: quiet, error: quiet,
+                   group: quiet, groupEnd: quiet, table: quiet },
+        document: stub(), navigator: stub(), location: stub(),
+        Image: function () { return stub(); },
+        localStorage: {
+            getItem: key => (key in storage ? storage[key] : null),
+            setItem: (key, value) => { storage[key] = String(value); },
+            removeItem: key => { delete storage[key]; }
+        },
+        requestAnimationFrame: () => 1, cancelAnimationFrame: quiet,
+        setTimeout, clearTimeout, setInterval: () => 0, clearInterval: quiet,
+        performance: { now: () => performance.now() },
+        structuredClone, atob, btoa,
+        KeyboardEvent: function (type, init) {
+            Object.assign(this, init, { type, preventDefault: quiet });
+        },
+        addEventListener: (type, fn) => { (listeners[type] = listeners[type] || []).push(fn); },
+        removeEventListener: quiet,
+        dispatchEvent: event => { (listeners[event.type] || []).forEach(fn => fn(event)); return true; },
+        alert: quiet, confirm: () => true, prompt: () => null,
+        innerWidth: 1280, innerHeight: 720, devicePixelRatio: 1
+    };
+    ctx.window = ctx;
+    ctx.self = ctx;
+    return vm.createContext(ctx);
+}
+
+/**
+ * Run every script index.html loads, in order. Scripts that fail to load
+ * in the browser too (duplicate top-level declarations) are reported and
+ * skipped, as the browser skips them.
+ */
+function loadGame(ctx) {
+    const html = fs.readFileSync(path.join(ROOT, 'index.html'), 'utf8');
+    const scripts = [...html.matchAll(/<script[^>]*\ssrc="([^"]+)"/g)].map(m => m[1]);
+    const failed = [];
+    for (const src of scripts) {
+        try {
+            vm.runInContext(fs.readFileSync(path.join(ROOT, src), 'utf8'), ctx, { filename: src });
+        } catch (e) {
+            failed.push(`${src}: ${e.message}`);
+        }
+    }
+    return { loaded: scripts.length - failed.length, failed };
+}
+
+// ============================================================================
+// CHECKS
+// ============================================================================
+
+function decode(packed) {
+    const bytes = Buffer.from(packed, 'base64');
+    const buffer = bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.length);
+    return {
+        grid: Array.from(new Int32Array(buffer, 0, GRID_CELLS)),
+        stats: Array.from(new Float32Array(buffer, GRID_CELLS * 4, 5))
+    };
+}
+
+/** Reset to a seed and play ACTIONS, returning every packed observation */
+function play(ctx, seed) {
+    return vm.runInContext(`(() => {
+        StateSnapshots.reset(${seed});
+        const observations = [AgentStep.observePacked()];
+        for (const action of ${JSON.stringify(ACTIONS)}) {
+            observations.push(AgentStep.stepPacked(action, ${TICKS}));
+        }
+        return observations;
+    })()`, ctx);
+}
+
+function main() {
+    const ctx = createContext();
+    const { loaded, failed } = loadGame(ctx);
+    console.log(`Loaded ${loaded} scripts (${failed.length} failed to load, as in the browser)`);
+
+    const errors = [];
+    const check = (ok, message) => {
+        console.log(`  ${ok ? 'ok  ' : 'FAIL'} ${message}`);
+        if (!ok) errors.push(message);
+    };
+
+    try {
+        const pool = vm.runInContext(`StateSnapshots.fill(${JSON.stringify(SEEDS)})`, ctx);
+        check(pool === SEEDS.length, `fill(${JSON.stringify(SEEDS)}) pooled ${pool} snapshots`);
+
+        for (const seed of SEEDS) {
+            const observations = play(ctx, seed);
+            const state = vm.runInContext('game.state', ctx);
+            check(state === 'playing', `reset(${seed}) left the game ${state}`);
+            const chest = vm.runInContext(`(game.decorations || []).some(d => d.type === 'starter_chest')`, ctx);
+            check(chest, `reset(${seed}) placed the starter chest`);
+
+            const decoded = observations.map(decode);
+            const badCodes = decoded.filter(o => o.grid.some(code => !GRID_CODES.has(code))).length;
+            check(badCodes === 0, `${ACTIONS.length} stepPacked() calls, grids only hold codes 0/1/2/3/9`);
+            const offMap = decoded.filter(o => o.grid.every(code => code === 9)).length;
+            check(offMap === 0, `no observation is entirely off the map (${offMap} were)`);
+            check(decoded.some(o => o.grid.includes(1)), 'walls show up in the grid');
+            const keys = vm.runInContext('Object.keys(AgentStep.observe().grid).length', ctx);
+            check(keys === GRID_CELLS, `observe().grid has ${keys} keys`);
+
+            const again = play(ctx, seed);
+            check(JSON.stringify(again) === JSON.stringify(observations),
+                  `reset(${seed}) replays the same observations for the same actions`);
+        }
+    } catch (e) {
+        check(false, `threw ${e && e.stack ? e.stack.split('\n').slice(0, 3).join(' | ') : e}`);
+    }
+
+    console.log(errors.length ? `\n${errors.length} check(s) failed` : '\nAll checks passed');
+    process.exit(errors.length ? 1 : 0);
+}
+
+main();
@@ -1,12 +1,32 @@
+import argparse
+import bisect
+import functools
+import math
 import random
 import statistics
+import sys
 from collections import Counter, defaultdict
+from types import MappingProxyType
+
+import game_data
+import sim_engine as engine
+import sim_profile
+from run_store import RunTable, value_counts
+from sim_engine import (format_override, freeze, paired_delta, parse_override, ranked, resolve_fights,
+                        run_stream, target_met)
+from streaming_stats import Histogram, RunningStats, Summary
+from weighted_sampler import AliasSampler, DrawPool
 
 # ==============================================================================
 # CONFIGURATION
 # ==============================================================================
 
 SIMULATIONS = 5000
+
+# Sequential stopping (--target-ci)
+CI_CONFIDENCE = 0.95           # Confidence level of the reported intervals
+MAX_SEQUENTIAL_RUNS = 1000000  # Give up on the targets after this many runs
+SEQUENTIAL_STEP = 1000         # Runs between checks of the targets
 ALTAR_INTERVAL = 8  # Altar appears every 8 kills (approx 5 rooms)
 
 # Time Settings
@@ -20,6 +40,7 @@ KILLS_PER_FLOOR = 15      # Approximate kills before floor transition
 
 # XP Curve
 XP_THRESHOLDS = {2: 100, 3: 300, 4: 600, 5: 1000}
+LEVEL_GAINS = {'str': 2, 'pDef': 1}  # Stat gains per level, on top of +10 max HP and a full heal
 
 PLAYER_START = {
     'level': 1, 'xp': 0,
@@ -37,324 +58,844 @@ LOOT_TABLE = {
     'gear':   {'weight': 10, 'heal': 60}    # Sword (Rare)
 }
 
-SPAWN_POOL = {
-    'Flame Bat':        {'weight': 30, 'xp': 15},
-    'Magma Slime':      {'weight': 30, 'xp': 25},
-    'Skeletal Warrior': {'weight': 20, 'xp': 28},
-    'Shadow Stalker':   {'weight': 10, 'xp': 42},
-    'Cave Bat':         {'weight': 10, 'xp': 10}
-}
+# --- MONSTERS (js/data/monsters-data.js, the full bestiary) ---
+# Spawn weights are the game's relative spawnWeight, as in getRandomMonster()
+SPAWN_POOL = game_data.spawn_pool()
+MONSTER_STATS = game_data.monster_stats()
 
-MONSTER_STATS = {
-    'Flame Bat':        {'hp': 40, 'str': 10, 'pDef': 4,  'atkSpeed': 1.2, 'armor': 'unarmored'},
-    'Cave Bat':         {'hp': 25, 'str': 6,  'pDef': 2,  'atkSpeed': 1.0, 'armor': 'unarmored'},
-    'Magma Slime':      {'hp': 60, 'str': 12, 'pDef': 15, 'atkSpeed': 2.5, 'armor': 'unarmored'},
-    'Skeletal Warrior': {'hp': 50, 'str': 13, 'pDef': 10, 'atkSpeed': 1.8, 'armor': 'bone'},
-    'Shadow Stalker':   {'hp': 45, 'str': 15, 'pDef': 6,  'atkSpeed': 1.0, 'armor': 'hide'}
-}
+# Damage multiplier per weapon damage type and armor (js/data/weapon-armor-matrix.js)
+WEAPON_MATRIX = {damage_type: {armor: 1.0 + mod for armor, mod in mods.items()}
+                 for damage_type, mods in game_data.weapon_armor_matrix().items()}
+
+# ==============================================================================
+# SIMULATION CONFIG
+# ==============================================================================
+
+# The game constants above, in the order they're compiled into a SimConfig
+CONFIG_NAMES = (
+    'ALTAR_INTERVAL', 'NAV_TIME_PER_ROOM', 'TICK_DURATION', 'FLOOR_SCALING', 'FLOOR_SCALING_CAP',
+    'KILLS_PER_FLOOR', 'XP_THRESHOLDS', 'LEVEL_GAINS', 'PLAYER_START', 'DROP_CHANCE', 'LOOT_TABLE',
+    'SPAWN_POOL', 'MONSTER_STATS', 'WEAPON_MATRIX',
+)
+
+def config_constants():
+    """The constants a SimConfig is compiled from, by name"""
+    return {name: globals()[name] for name in CONFIG_NAMES}
+
+class SimConfig:
+    """
+    Immutable, precompiled simulation config, as in dungeon_run_simulator.
+
+    Compiled from the constants above plus optional overrides (parsed
+    NAME.key=value pairs, see sim_engine.parse_override()). Every constant
+    is available as a lower-case attribute holding a frozen copy
+    (cfg.monster_stats, cfg.loot_table, ...), next to the alias samplers for
+    spawn and loot rolls and each monster's XP.
+
+    The engine functions take a config argument instead of reading the
+    module constants, so an A/B variant runs next to the baseline without
+    touching them. Configs hash by identity, which is what the matchup
+    cache keys on.
+    """
+
+    def __init__(self, overrides=()):
+        values = engine.override_values(config_constants(), overrides)
+        fields = {name.lower(): freeze(value) for name, value in values.items()}
+        fields['overrides'] = tuple(overrides)
+
+        fields['spawn_sampler'] = AliasSampler({n: d['weight'] for n, d in values['SPAWN_POOL'].items()})
+        fields['loot_sampler'] = AliasSampler({i: d['weight'] for i, d in values['LOOT_TABLE'].items()})
+        fields['spawn_xp'] = MappingProxyType({n: d['xp'] for n, d in values['SPAWN_POOL'].items()})
+
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SimConfig is immutable; compile a new one with compile_config()")
 
-WEAPON_MATRIX = {'blade': {'unarmored': 1.3, 'hide': 1.0, 'bone': 0.7}}
+    def pooled(self, rng):
+        """
+        Copy of this config whose spawn and loot rolls come from DrawPools
+        on the NumPy Generator rng, for runs advancing in lockstep (--batch)
+        """
+        copy = object.__new__(SimConfig)
+        copy.__dict__.update(self.__dict__)
+        object.__setattr__(copy, 'spawn_sampler', DrawPool(self.spawn_sampler, rng))
+        object.__setattr__(copy, 'loot_sampler', DrawPool(self.loot_sampler, rng))
+        return copy
+
+    def floor_multiplier(self, floor):
+        """Monster stat multiplier for a floor"""
+        return engine.floor_multiplier(floor, self.floor_scaling, self.floor_scaling_cap)
+
+def compile_config(overrides=()):
+    """SimConfig for a set of overrides; the shared default when there are none"""
+    if not overrides:
+        return DEFAULT_CONFIG
+    return SimConfig(overrides)
+
+DEFAULT_CONFIG = SimConfig()
 
 # ==============================================================================
 # HELPER FUNCTIONS
 # ==============================================================================
 
-def get_floor(kills):
+def get_floor(kills, cfg=DEFAULT_CONFIG):
     """Calculate current floor based on kill count"""
-    return 1 + (kills // KILLS_PER_FLOOR)
+    return 1 + (kills // cfg.kills_per_floor)
 
-def apply_floor_scaling(base_stat, floor):
+def apply_floor_scaling(base_stat, floor, cfg=DEFAULT_CONFIG):
     """Apply floor scaling to a stat"""
-    return base_stat * min(FLOOR_SCALING_CAP, 1.0 + (floor - 1) * FLOOR_SCALING)
-
-def get_damage(attacker, defender, is_player, floor=1):
-    """Calculate damage with floor scaling for monsters"""
-    if is_player:
-        base = attacker['weaponDmg'] + (attacker['str'] * 0.5)
-        mod = WEAPON_MATRIX[attacker['weaponType']].get(defender['armor'], 1.0)
-        base *= mod
-    else:
-        # Apply floor scaling to monster damage
-        scaled_str = apply_floor_scaling(attacker['str'], floor)
-        base = (scaled_str * 0.5) + (scaled_str / 5.0)
-
-    def_val = min(defender['pDef'], 50)
-    def_mod = max(0.25, 1.0 - (def_val * 0.015))
-    return max(1, int(base * def_mod * random.uniform(0.9, 1.1)))
-
-def check_potion(p):
-    """Use potion if HP is low"""
-    if p['hp'] < 40 and p['potions'] > 0:
-        p['hp'] = min(p['max_hp'], p['hp'] + p['potion_heal'])
-        p['potions'] -= 1
-        return True
-    return False
-
-def check_level_up(p):
-    """Check and apply level up"""
-    next_lvl = p['level'] + 1
-    if next_lvl in XP_THRESHOLDS and p['xp'] >= XP_THRESHOLDS[next_lvl]:
-        p['level'] = next_lvl
-        p['max_hp'] += 10
-        p['hp'] = p['max_hp']  # Full Heal
-        p['str'] += 2
-        p['pDef'] += 1
-        return True
-    return False
-
-def fight(p, m_name, floor=1):
-    """
-    Simulate a fight between player and monster.
+    return base_stat * cfg.floor_multiplier(floor)
+
+def fight(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """
+    Simulate a fight between player and monster with sim_engine.fight().
     Returns: (ticks, dmg_dealt, dmg_taken, won)
     """
-    m_stats = MONSTER_STATS[m_name].copy()
-    # Apply floor scaling to monster HP and defense
-    m_hp = int(apply_floor_scaling(m_stats['hp'], floor))
-    m_stats['pDef'] = int(apply_floor_scaling(m_stats['pDef'], floor))
-
-    p_ticks = 7
-    m_ticks = int(7 * m_stats['atkSpeed'])
-    tick = 0
-    total_dmg_dealt = 0
-    total_dmg_taken = 0
-
-    while p['hp'] > 0 and m_hp > 0:
-        tick += 1
-        if tick % p_ticks == 0:
-            dmg = get_damage(p, m_stats, True)
-            m_hp -= dmg
-            total_dmg_dealt += dmg
-        if m_hp > 0 and tick % m_ticks == 0:
-            dmg = get_damage(m_stats, p, False, floor)
-            p['hp'] -= dmg
-            total_dmg_taken += dmg
-            check_potion(p)
-
-    won = p['hp'] > 0
-    return (tick, total_dmg_dealt, total_dmg_taken, won)
-
-def drop_loot(inventory):
-    """Roll for loot drop"""
-    if random.uniform(0, 100) > DROP_CHANCE:
-        return None
-    roll = random.uniform(0, 100)
-    if roll < 60:
-        item = 'junk'
-    elif roll < 90:
-        item = 'trophy'
-    else:
-        item = 'gear'
-    inventory.append(item)
-    return item
-
-def visit_altar(p, inventory):
-    """Sacrifice items at altar for HP"""
-    if p['hp'] >= p['max_hp']:
-        return (0, 0)
-    sacrifices = 0
-    hp_restored = 0
-    inventory.sort(key=lambda x: LOOT_TABLE[x]['heal'])
-    items_to_remove = []
+    return engine.fight(p, matchup_params(p['weaponDmg'], p['weaponType'], p['str'], p['pDef'],
+                                          m_name, floor, cfg))
 
-    for item in inventory:
-        if p['hp'] >= p['max_hp']:
-            break
-        heal_val = LOOT_TABLE[item]['heal']
-        actual_heal = min(heal_val, p['max_hp'] - p['hp'])
-        p['hp'] = min(p['max_hp'], p['hp'] + heal_val)
-        items_to_remove.append(item)
-        sacrifices += 1
-        hp_restored += actual_heal
-
-    for item in items_to_remove:
-        inventory.remove(item)
-    return (sacrifices, hp_restored)
-
-def percentile(data, p):
-    """Get percentile value from sorted data"""
-    if not data:
-        return 0
-    idx = int(len(data) * p)
-    return data[min(idx, len(data) - 1)]
+def fight_by_tick(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """Reference tick-by-tick version of fight(), see sim_engine.fight_by_tick()"""
+    return engine.fight_by_tick(p, matchup_params(p['weaponDmg'], p['weaponType'], p['str'], p['pDef'],
+                                                  m_name, floor, cfg))
+
+def bound_fight(cfg=DEFAULT_CONFIG, exact=False):
+    """
+    fight(), or sample_fight() with exact, on one config, as the fight_fn the
+    sim_engine run drivers take
+    """
+    fight_fn = sample_fight if exact else fight
+    if cfg is DEFAULT_CONFIG:
+        return fight_fn
+    return functools.partial(fight_fn, cfg=cfg)
+
+def fight_matchup(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """The matchup fight() resolves, as batch_combat.drive_lockstep() takes it"""
+    return matchup_params(p['weaponDmg'], p['weaponType'], p['str'], p['pDef'], m_name, floor, cfg)
+
+@functools.lru_cache(maxsize=4096)
+def matchup_params(weapon_dmg, weapon_type, p_str, p_pdef, m_name, floor, cfg=DEFAULT_CONFIG):
+    """
+    The part of a fight that only depends on stats, not on HP: a
+    plain melee matchup with a +/-10% damage roll on every hit.
+    """
+    m_stats = cfg.monster_stats[m_name]
+    m_pdef = int(apply_floor_scaling(m_stats['pDef'], floor, cfg))
+    armor_mult = cfg.weapon_matrix[weapon_type].get(m_stats['armor'], 1.0)
+    floor_mult = cfg.floor_multiplier(floor)
+
+    return engine.matchup(
+        m_hp=int(apply_floor_scaling(m_stats['hp'], floor, cfg)),
+        p_raw=engine.player_damage(weapon_dmg + (p_str * 0.5), armor_mult, m_pdef),
+        m_raw=engine.monster_damage(m_stats['str'], floor_mult, p_pdef),
+        p_ticks=7,
+        m_ticks=int(7 * m_stats['atkSpeed']),
+        variance=0.1
+    )
+
+def spawn_enemy(cfg=DEFAULT_CONFIG):
+    """Spawn a random enemy based on weights"""
+    return cfg.spawn_sampler.draw()
+
+# ==============================================================================
+# EXACT FIGHT SOLVER
+# ==============================================================================
+#
+# A fight is two independent processes that only meet in who drops first:
+# the monster's HP under the player's attacks, and the player's HP/potions
+# under the monster's attacks. Each side is solved by DP over HP states, and
+# the two are joined into "branches" (who dies, on which attack). Sampling a
+# fight is then: pick a branch, pick the monster-side and player-side detail.
+#
+# Only the monster side depends on nothing but the matchup, so that is what
+# sample_fight() caches: one table per matchup (a few hundred per config),
+# which EXACT_CACHE_SIZE holds with room to spare. The player side depends on
+# the player's current HP and potions and is rolled hit by hit instead; keyed
+# on exact HP, its tables would number in the tens of thousands and evict
+# each other faster than they are reused. fight_distribution() still solves
+# both sides, for the fresh-player expectations of print_exact_threats().
+
+EXACT_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def damage_distribution(base):
+    """
+    Exact distribution of max(1, int(base * uniform(0.9, 1.1))).
+    Returns a tuple of (damage, probability).
+    """
+    lo, hi = base * 0.9, base * 1.1
+    dist = defaultdict(float)
+    k = int(lo)
+    while k < hi:
+        width = min(hi, k + 1) - max(lo, k)
+        if width > 0:
+            dist[max(1, k)] += width / (hi - lo)
+        k += 1
+    return tuple(sorted(dist.items()))
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def monster_side(p_base, m_hp):
+    """
+    The monster's HP under repeated player attacks.
+    Returns (alive, killed): alive[j] maps damage dealt after j attacks to the
+    probability the monster is still standing; killed[j] maps damage dealt to
+    the probability the monster dies on attack j (killed[0] is empty).
+    """
+    rolls = damage_distribution(p_base)
+    alive = [{0: 1.0}]
+    killed = [{}]
+    while alive[-1]:
+        standing = defaultdict(float)
+        dead = defaultdict(float)
+        for dealt, prob in alive[-1].items():
+            for dmg, p_dmg in rolls:
+                total = dealt + dmg
+                if total >= m_hp:
+                    dead[total] += prob * p_dmg
+                else:
+                    standing[total] += prob * p_dmg
+        alive.append(dict(standing))
+        killed.append(dict(dead))
+    return tuple(alive), tuple(killed)
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def player_side(hp, max_hp, potions, potion_heal, m_base, max_hits):
+    """
+    The player's HP under up to max_hits monster attacks, drinking potions the
+    same way check_potion() does. States are (hp, potions, healed).
+    Returns (alive, died): alive[k] is the state distribution of a player still
+    standing after k hits; died[k] the state distribution for dying on hit k.
+    """
+    rolls = damage_distribution(m_base)
+    alive = [{(hp, potions, 0): 1.0}]
+    died = [{}]
+    while len(alive) <= max_hits and alive[-1]:
+        standing = defaultdict(float)
+        dead = defaultdict(float)
+        for (cur_hp, pots, healed), prob in alive[-1].items():
+            for dmg, p_dmg in rolls:
+                new_hp = cur_hp - dmg
+                new_pots = pots
+                new_healed = healed
+                if new_hp < engine.POTION_THRESHOLD and new_pots > 0:
+                    healed_hp = min(max_hp, new_hp + potion_heal)
+                    new_healed += healed_hp - new_hp
+                    new_hp = healed_hp
+                    new_pots -= 1
+                state = (new_hp, new_pots, new_healed)
+                if new_hp > 0:
+                    standing[state] += prob * p_dmg
+                else:
+                    dead[state] += prob * p_dmg
+        alive.append(dict(standing))
+        died.append(dict(dead))
+    return tuple(alive), tuple(died)
+
+def cumulative(dist):
+    """Turn a {value: prob} dict into (values, cumulative probs) for sampling"""
+    values = list(dist)
+    cum = []
+    total = 0.0
+    for value in values:
+        total += dist[value]
+        cum.append(total)
+    return values, cum
+
+def pick(values, cum):
+    """Sample from a cumulative() table with one random draw"""
+    idx = bisect.bisect_right(cum, random.random() * cum[-1])
+    return values[min(idx, len(values) - 1)]
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def fight_distribution(hp, max_hp, potions, potion_heal, weapon_dmg, weapon_type, p_str, p_pdef, m_name, floor,
+                       cfg=DEFAULT_CONFIG):
+    """
+    Exact outcome distribution of fight() for one player state and matchup.
+    Returns a list of branches (prob, ticks, won, dealt_dist, state_dist),
+    where dealt_dist is {dmg_dealt: prob} and state_dist is
+    {(end_hp, potions_left, healed): prob}, both conditional on the branch.
+    """
+    c = matchup_params(weapon_dmg, weapon_type, p_str, p_pdef, m_name, floor, cfg)
+    p_ticks = c['p_ticks']
+    m_ticks = c['m_ticks']
+    m_alive, m_killed = monster_side(c['p_raw'], c['m_hp'])
+
+    # Monster hits that land strictly before the killing blow at the last tick
+    max_hits = (p_ticks * (len(m_killed) - 1) - 1) // m_ticks
+    p_alive, p_died = player_side(hp, max_hp, potions, potion_heal, c['m_raw'], max_hits)
+
+    branches = []
+
+    # Player wins on attack j: the monster gets every hit before that tick
+    for j in range(1, len(m_killed)):
+        tick = j * p_ticks
+        hits = (tick - 1) // m_ticks
+        if not m_killed[j] or hits >= len(p_alive) or not p_alive[hits]:
+            continue
+        prob = sum(m_killed[j].values()) * sum(p_alive[hits].values())
+        branches.append((prob, tick, True, m_killed[j], p_alive[hits]))
+
+    # Player dies on hit k: the player attacks first on shared ticks
+    for k in range(1, len(p_died)):
+        tick = k * m_ticks
+        attacks = tick // p_ticks
+        if not p_died[k] or attacks >= len(m_alive) or not m_alive[attacks]:
+            continue
+        prob = sum(p_died[k].values()) * sum(m_alive[attacks].values())
+        branches.append((prob, tick, False, m_alive[attacks], p_died[k]))
+
+    return branches
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def damage_sampler(base):
+    """damage_distribution(base) as a cumulative() table"""
+    return cumulative(dict(damage_distribution(base)))
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def monster_sampler(p_base, m_hp):
+    """
+    monster_side(p_base, m_hp) as cumulative() tables: kills over the
+    (attack, dmg_dealt) the monster dies on, and standing[j] over the damage
+    dealt to a monster still standing after j attacks.
+    """
+    alive, killed = monster_side(p_base, m_hp)
+    kills = cumulative({(j, dealt): q for j, dist in enumerate(killed) for dealt, q in dist.items()})
+    standing = tuple(cumulative(dist) if dist else None for dist in alive)
+    return kills, standing
+
+def fight_key(p, m_name, floor, cfg=DEFAULT_CONFIG):
+    """Everything a fight outcome depends on, as a hashable cache key"""
+    return (p['hp'], p['max_hp'], p['potions'], p['potion_heal'],
+            p['weaponDmg'], p['weaponType'], p['str'], p['pDef'], m_name, floor, cfg)
+
+def sample_fight(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """
+    Drop-in replacement for fight() with the same outcome distribution. The
+    attack the monster dies on and the damage dealt come from its cached
+    monster_sampler() in one draw; the monster's hits before that attack are
+    rolled one by one. If they kill the player first, the damage dealt so far
+    is drawn from the monster's standing table at that point (the two sides
+    are independent, so that is its exact conditional distribution).
+    Returns: (ticks, dmg_dealt, dmg_taken, won)
+    """
+    c = matchup_params(p['weaponDmg'], p['weaponType'], p['str'], p['pDef'], m_name, floor, cfg)
+    p_ticks = c['p_ticks']
+    m_ticks = c['m_ticks']
+    kills, standing = monster_sampler(c['p_raw'], c['m_hp'])
+    attacks, dmg_dealt = pick(*kills)
+    win_tick = attacks * p_ticks
+
+    rolls = damage_sampler(c['m_raw'])
+    hp = start_hp = p['hp']
+    healed = 0
+    for hit in range(1, (win_tick - 1) // m_ticks + 1):
+        hp -= pick(*rolls)
+        if hp < engine.POTION_THRESHOLD and p['potions'] > 0:
+            healed_hp = min(p['max_hp'], hp + p['potion_heal'])
+            healed += healed_hp - hp
+            hp = healed_hp
+            p['potions'] -= 1
+        if hp <= 0:
+            tick = hit * m_ticks
+            p['hp'] = hp
+            return (tick, pick(*standing[tick // p_ticks]), start_hp - hp + healed, False)
+    p['hp'] = hp
+    return (win_tick, dmg_dealt, start_hp - hp + healed, True)
+
+def fight_expectations(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """Exact win chance and expected ticks / damage for one fight, no sampling"""
+    win = ticks = dealt = taken = 0.0
+    for prob, b_ticks, won, dealt_dist, state_dist in fight_distribution(*fight_key(p, m_name, floor, cfg)):
+        b_dealt = sum(d * q for d, q in dealt_dist.items()) / sum(dealt_dist.values())
+        b_taken = sum((p['hp'] - s[0] + s[2]) * q for s, q in state_dist.items()) / sum(state_dist.values())
+        win += prob * won
+        ticks += prob * b_ticks
+        dealt += prob * b_dealt
+        taken += prob * b_taken
+    return {'win': win, 'ticks': ticks, 'dmg_dealt': dealt, 'dmg_taken': taken}
 
 # ==============================================================================
 # MAIN SIMULATION
 # ==============================================================================
 
-def run_simulation():
-    # ==========================================================================
-    # METRICS INITIALIZATION
-    # ==========================================================================
-
-    # Run-level metrics
-    history_kills = []
-    history_level = []
-    history_time = []
-    history_bag_size = []
-    history_hp_before_death = []
-    history_wasted_potions = []
-    history_items_dropped = []
-    history_items_sacrificed = []
-
-    # Death tracking
-    killers = []
-    death_context = []
-    level_at_death = Counter()
-    floor_at_death = Counter()
-
-    # Per-fight tracking
-    survival_at_fight = Counter()
+def new_metrics(cfg=DEFAULT_CONFIG, store=False):
+    """
+    Create an empty set of aggregated run metrics. With store=True it also
+    keeps every run as a row of a RunTable under 'run_table'.
+    """
+    metrics = {
+        'runs': 0,
+
+        # Run-level metrics
+        'history_kills': Summary(quantiles=True, edges=[15, 30, 50]),
+        'history_level': RunningStats(),
+        'history_time': RunningStats(),
+        'history_bag_size': Histogram([3]),
+        'history_hp_before_death': Summary(quantiles=True, edges=[40, 60]),
+        'history_wasted_potions': RunningStats(),
+        'history_items_dropped': RunningStats(),
+        'history_items_sacrificed': RunningStats(),
+
+        # Death tracking
+        'killers': Counter(),
+        'death_context': Counter(),
+        'level_at_death': Counter(),
+        'floor_at_death': Counter(),
+
+        # Per-fight tracking
+        'survival_at_fight': Counter(),
+        'close_calls': 0,
+        'total_fights': 0,
+
+        # Monster analytics
+        'monster_analytics': {name: {
+            'fights': 0,
+            'kills': 0,
+            'deaths_caused': 0,
+            'total_dmg_dealt': 0,
+            'total_dmg_taken': 0,
+            'total_ticks': 0
+        } for name in cfg.monster_stats},
+
+        # HP tracking
+        'hp_after_fights': RunningStats(),
+        'hp_deltas': RunningStats(),  # HP change per fight
+
+        # Altar analytics
+        'altar_visits': 0,
+        'total_sacrificed': 0,
+        'total_hp_restored': 0,
+
+        # Death spiral detection (3+ consecutive fights losing >15 HP each)
+        'death_spirals': 0,
+    }
+    if store:
+        metrics['run_table'] = RunTable()
+    return metrics
+
+def simulate_run(metrics, cfg=DEFAULT_CONFIG):
+    """
+    Simulate one run until death and record it into metrics.
+
+    Generator: yields (player, enemy, floor) for every fight and expects the
+    fight() result tuple to be sent back, so fights can be resolved one at a
+    time (resolve_fights) or batched across many runs (batch_combat).
+    """
+    m = metrics
+    monster_analytics = m['monster_analytics']
+    table = m.get('run_table')
+
+    player = dict(cfg.player_start)
+    inventory = []
+    kills = 0
+    combat_ticks = 0
+    recent_enemies = []
+    recent_hp_deltas = []
+    items_dropped_this_run = 0
+    items_sacrificed_this_run = 0
     close_calls = 0
-    total_fights = 0
-
-    # Monster analytics
-    monster_analytics = {name: {
-        'fights': 0,
-        'kills': 0,
-        'deaths_caused': 0,
-        'total_dmg_dealt': 0,
-        'total_dmg_taken': 0,
-        'total_ticks': 0
-    } for name in MONSTER_STATS}
-
-    # HP tracking
-    hp_after_fights = []
-    hp_deltas = []  # HP change per fight
-
-    # Altar analytics
     altar_visits = 0
-    total_sacrificed = 0
-    total_hp_restored = 0
+    hp_restored = 0
+    hp_after_fights = RunningStats()
+    hp_deltas = RunningStats()
+    fight_log = [] if table is not None else None
+    death_spiral = False
+
+    while player['hp'] > 0:
+        # 1. Determine floor and spawn enemy
+        floor = get_floor(kills, cfg)
+
+        enemy = spawn_enemy(cfg)
+
+        recent_enemies.append(enemy)
+        if len(recent_enemies) > 3:
+            recent_enemies.pop(0)
+
+        # 2. Record pre-fight state
+        hp_before = player['hp']
+
+        # 3. Fight
+        ticks, dmg_dealt, dmg_taken, won = yield (player, enemy, floor)
+        combat_ticks += ticks
+        m['total_fights'] += 1
+
+        # 4. Record fight analytics
+        monster_analytics[enemy]['fights'] += 1
+        monster_analytics[enemy]['total_dmg_dealt'] += dmg_dealt
+        monster_analytics[enemy]['total_dmg_taken'] += dmg_taken
+        monster_analytics[enemy]['total_ticks'] += ticks
+        if fight_log is not None:
+            fight_log.append((enemy, ticks, dmg_dealt, dmg_taken, won))
+
+        hp_delta = player['hp'] - hp_before
+        hp_deltas.add(hp_delta)
+        recent_hp_deltas.append(hp_delta)
+        if len(recent_hp_deltas) > 3:
+            recent_hp_deltas.pop(0)
+
+        # 5. Check for death
+        if not won:
+            # Record death metrics
+            m['killers'][enemy] += 1
+            m['history_bag_size'].add(len(inventory))
+            m['history_hp_before_death'].add(hp_before)
+            m['history_wasted_potions'].add(player['potions'])
+            m['level_at_death'][player['level']] += 1
+            m['floor_at_death'][floor] += 1
+            monster_analytics[enemy]['deaths_caused'] += 1
+
+            if len(recent_enemies) >= 2:
+                m['death_context'][tuple(recent_enemies[-2:])] += 1
+
+            # Check for death spiral
+            if len(recent_hp_deltas) >= 3 and all(d <= -15 for d in recent_hp_deltas[-3:]):
+                m['death_spirals'] += 1
+                death_spiral = True
 
-    # Death spiral detection (3+ consecutive fights losing >15 HP each)
-    death_spirals = 0
+            break
 
-    print(f"Running {SIMULATIONS} Simulations...")
+        # 6. Post-fight processing (survived)
+        kills += 1
+        monster_analytics[enemy]['kills'] += 1
+        m['survival_at_fight'][kills] += 1
+
+        # Track close calls
+        if player['hp'] < player['max_hp'] * 0.2:
+            close_calls += 1
+
+        hp_after_fights.add(player['hp'])
+
+        # XP and level up
+        player['xp'] += cfg.spawn_xp[enemy]
+        leveled = engine.check_level_up(player, cfg.xp_thresholds, cfg.level_gains)
+
+        # Loot
+        item = engine.drop_loot(inventory, cfg.drop_chance, cfg.loot_sampler)
+        if item:
+            items_dropped_this_run += 1
+
+        # Altar visit
+        if kills % cfg.altar_interval == 0:
+            sacrificed, restored = engine.visit_altar(player, inventory, cfg.loot_table)
+            if sacrificed > 0:
+                altar_visits += 1
+                hp_restored += restored
+                items_sacrificed_this_run += sacrificed
+
+    # End of run calculations
+    rooms = kills / 1.5
+    total_time = (combat_ticks * cfg.tick_duration) + (rooms * cfg.nav_time_per_room)
+
+    m['runs'] += 1
+    m['history_kills'].add(kills)
+    m['history_level'].add(player['level'])
+    m['history_time'].add(total_time)
+    m['history_items_dropped'].add(items_dropped_this_run)
+    m['history_items_sacrificed'].add(items_sacrificed_this_run)
+    m['close_calls'] += close_calls
+    m['altar_visits'] += altar_visits
+    m['total_sacrificed'] += items_sacrificed_this_run
+    m['total_hp_restored'] += hp_restored
+    m['hp_after_fights'].merge(hp_after_fights)
+    m['hp_deltas'].merge(hp_deltas)
+
+    if table is not None:
+        table.add({
+            'kills': kills,
+            'level': player['level'],
+            'time': total_time,
+            'floor': floor,
+            'killer': enemy,
+            'prev_enemy': recent_enemies[-2] if len(recent_enemies) >= 2 else None,
+            'hp_before_death': hp_before,
+            'bag_size': len(inventory),
+            'wasted_potions': player['potions'],
+            'items_dropped': items_dropped_this_run,
+            'items_sacrificed': items_sacrificed_this_run,
+            'death_spiral': death_spiral,
+            'close_calls': close_calls,
+            'altar_visits': altar_visits,
+            'hp_restored': hp_restored,
+            **monster_columns(fight_log, cfg),
+            'hp_after_fights': hp_after_fights.parts(),
+            'hp_deltas': hp_deltas.parts(),
+        })
+
+def monster_columns(fight_log, cfg=DEFAULT_CONFIG):
+    """Per-monster fight totals of one run, as per-run table columns in MONSTER_STATS order"""
+    totals = {name: [0, 0, 0, 0, 0] for name in cfg.monster_stats}
+    for enemy, ticks, dmg_dealt, dmg_taken, won in fight_log:
+        t = totals[enemy]
+        t[0] += 1
+        t[1] += won
+        t[2] += dmg_dealt
+        t[3] += dmg_taken
+        t[4] += ticks
+    columns = ('monster_fights', 'monster_kills', 'monster_dmg_dealt', 'monster_dmg_taken', 'monster_ticks')
+    return {column: [totals[name][i] for name in cfg.monster_stats] for i, column in enumerate(columns)}
+
+def simulate_runs(metrics, seed, first_run, count, exact=False, cfg=DEFAULT_CONFIG):
+    """Simulate runs first_run.. first_run + count - 1 of a batch, each on its own run_stream()"""
+    fight_fn = bound_fight(cfg, exact)
+    for run_index in range(first_run, first_run + count):
+        random.seed(run_stream(seed, run_index))
+        resolve_fights(simulate_run(metrics, cfg), fight_fn)
+
+def collect_metrics(simulations=SIMULATIONS, seed=None, batch=False, exact=False, store=False,
+                    cfg=DEFAULT_CONFIG):
+    """
+    Run a batch of simulations and return the metrics.
+    Every run plays on its own run_stream(). With batch=True all runs advance
+    in lockstep and their fights go through batch_combat.drive_lockstep(),
+    on one stream for the whole batch, with spawn and loot rolls pre-drawn
+    in bulk (SimConfig.pooled()); this pays off from a few thousand runs
+    and is roughly 10-20% faster end to end. With exact=True fight outcomes are
+    sampled from the cached exact distributions (sample_fight). With
+    store=True the runs are kept as rows of metrics['run_table'] too.
+    """
+    metrics = new_metrics(cfg, store)
+    if batch:
+        import numpy as np
+        import batch_combat
+
+        random.seed(seed)
+        rng = np.random.default_rng(seed)
+        pooled = cfg.pooled(rng)
+        runs = [simulate_run(metrics, pooled) for _ in range(simulations)]
+        batch_combat.drive_lockstep(runs, functools.partial(fight_matchup, cfg=cfg), rng)
+    else:
+        simulate_runs(metrics, seed, 0, simulations, exact, cfg)
+    return metrics
+
+def interval_targets(metrics):
+    """The proportions --target-ci has to pin down: (label, successes, trials)"""
+    runs = metrics['runs']
+    kills = metrics['history_kills'].hist
+    return [
+        ('Floor 1 Clear (15 kills)', kills.above(15), runs),
+        ('Floor 2 Clear (30 kills)', kills.above(30), runs),
+        ('Immortal (50+ kills)', kills.above(50), runs),
+    ]
+
+def collect_until(target, confidence=CI_CONFIDENCE, max_runs=MAX_SEQUENTIAL_RUNS, relative=False,
+                  seed=None, batch=False, exact=False, store=False, cfg=DEFAULT_CONFIG):
+    """
+    Run SEQUENTIAL_STEP runs at a time until every interval target has a
+    half-width of at most target (or max_runs is reached; see
+    sim_engine.collect_until()).
+    Outside batch mode the runs are exactly the ones collect_metrics() would
+    play, in the same order, so stopping after n runs gives the metrics of an
+    n-run batch.
+    """
+    metrics = new_metrics(cfg, store)
+    if batch:
+        import numpy as np
+        import batch_combat
+
+        random.seed(seed)
+        rng = np.random.default_rng(seed)
+        pooled = cfg.pooled(rng)
+
+    def advance(metrics):
+        step = min(SEQUENTIAL_STEP, max_runs - metrics['runs'])
+        if batch:
+            runs = [simulate_run(metrics, pooled) for _ in range(step)]
+            batch_combat.drive_lockstep(runs, functools.partial(fight_matchup, cfg=cfg), rng)
+        else:
+            simulate_runs(metrics, seed, metrics['runs'], step, exact, cfg)
+
+    return engine.collect_until(sys.modules[__name__], metrics, advance, target, confidence, max_runs, relative)
+
+def run_simulation(simulations=SIMULATIONS, seed=None, batch=False, exact=False,
+                   target_ci=None, confidence=CI_CONFIDENCE, max_runs=MAX_SEQUENTIAL_RUNS,
+                   relative=False, store=None):
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+
+    if target_ci:
+        print(f"Running Simulations until every {confidence*100:.0f}% CI is within "
+              + (f"±{target_ci*100:.1f}% of the rate" if relative else f"±{target_ci*100:.2f}%")
+              + f" (max {max_runs} runs)...")
+    else:
+        print(f"Running {simulations} Simulations...")
     print(f"Config: Altars every {ALTAR_INTERVAL} kills | Floor scaling: {FLOOR_SCALING*100:.0f}%/floor")
+    print(f"Seed: {seed}" + engine.mode_label(batch, exact))
     print("-" * 60)
 
-    # ==========================================================================
-    # SIMULATION LOOP
-    # ==========================================================================
-
-    for sim in range(SIMULATIONS):
-        player = PLAYER_START.copy()
-        inventory = []
-        kills = 0
-        combat_ticks = 0
-        recent_enemies = []
-        recent_hp_deltas = []
-        items_dropped_this_run = 0
-        items_sacrificed_this_run = 0
-
-        while player['hp'] > 0:
-            # 1. Determine floor and spawn enemy
-            floor = get_floor(kills)
-
-            roll = random.uniform(0, 100)
-            cum = 0
-            enemy = 'Flame Bat'
-            for n, d in SPAWN_POOL.items():
-                cum += d['weight']
-                if roll <= cum:
-                    enemy = n
-                    break
-
-            recent_enemies.append(enemy)
-            if len(recent_enemies) > 3:
-                recent_enemies.pop(0)
-
-            # 2. Record pre-fight state
-            hp_before = player['hp']
-
-            # 3. Fight
-            ticks, dmg_dealt, dmg_taken, won = fight(player, enemy, floor)
-            combat_ticks += ticks
-            total_fights += 1
-
-            # 4. Record fight analytics
-            monster_analytics[enemy]['fights'] += 1
-            monster_analytics[enemy]['total_dmg_dealt'] += dmg_dealt
-            monster_analytics[enemy]['total_dmg_taken'] += dmg_taken
-            monster_analytics[enemy]['total_ticks'] += ticks
-
-            hp_delta = player['hp'] - hp_before
-            hp_deltas.append(hp_delta)
-            recent_hp_deltas.append(hp_delta)
-            if len(recent_hp_deltas) > 3:
-                recent_hp_deltas.pop(0)
-
-            # 5. Check for death
-            if not won:
-                # Record death metrics
-                killers.append(enemy)
-                history_bag_size.append(len(inventory))
-                history_hp_before_death.append(hp_before)
-                history_wasted_potions.append(player['potions'])
-                level_at_death[player['level']] += 1
-                floor_at_death[floor] += 1
-                monster_analytics[enemy]['deaths_caused'] += 1
-
-                if len(recent_enemies) >= 2:
-                    death_context.append(tuple(recent_enemies[-2:]))
-
-                # Check for death spiral
-                if len(recent_hp_deltas) >= 3 and all(d <= -15 for d in recent_hp_deltas[-3:]):
-                    death_spirals += 1
-
-                break
-
-            # 6. Post-fight processing (survived)
-            kills += 1
-            monster_analytics[enemy]['kills'] += 1
-            survival_at_fight[kills] += 1
-
-            # Track close calls
-            if player['hp'] < player['max_hp'] * 0.2:
-                close_calls += 1
-
-            hp_after_fights.append(player['hp'])
-
-            # XP and level up
-            player['xp'] += SPAWN_POOL[enemy]['xp']
-            leveled = check_level_up(player)
-
-            # Loot
-            item = drop_loot(inventory)
-            if item:
-                items_dropped_this_run += 1
-
-            # Altar visit
-            if kills % ALTAR_INTERVAL == 0:
-                sacrificed, restored = visit_altar(player, inventory)
-                if sacrificed > 0:
-                    altar_visits += 1
-                    total_sacrificed += sacrificed
-                    total_hp_restored += restored
-                    items_sacrificed_this_run += sacrificed
-
-        # End of run calculations
-        rooms = kills / 1.5
-        total_time = (combat_ticks * TICK_DURATION) + (rooms * NAV_TIME_PER_ROOM)
-
-        history_kills.append(kills)
-        history_level.append(player['level'])
-        history_time.append(total_time)
-        history_items_dropped.append(items_dropped_this_run)
-        history_items_sacrificed.append(items_sacrificed_this_run)
-
-    # ==========================================================================
-    # REPORTING
-    # ==========================================================================
-
-    avg_kills = statistics.mean(history_kills)
-    avg_rooms = avg_kills / 1.5
-    avg_time = statistics.mean(history_time) / 60
-    avg_lvl = statistics.mean(history_level)
+    if target_ci:
+        metrics = collect_until(target_ci, confidence, max_runs, relative, seed, batch, exact, bool(store))
+    else:
+        metrics = collect_metrics(simulations, seed, batch, exact, bool(store))
+    if store:
+        engine.store_runs(metrics, store, {'simulator': 'balance_simulator', 'seed': seed, 'batch': batch,
+                                           'exact': exact, 'overrides': [], 'monsters': list(MONSTER_STATS)})
+    print_report(metrics)
+    if exact:
+        print_exact_threats()
+    if target_ci:
+        print_intervals(metrics, target_ci, confidence, relative)
+
+# ==============================================================================
+# STORED RUNS
+# ==============================================================================
+#
+# --store keeps every run as a row of a columnar .npz table (run_store);
+# --report rebuilds the metrics from such a table with vectorized group-bys
+# and prints the same report, without simulating anything.
+
+def metrics_from_runs(runs):
+    """Rebuild the metrics of a stored run table"""
+    import numpy as np
+
+    metrics = new_metrics()
+    kills = runs['kills']
+    metrics['runs'] = len(runs)
+
+    metrics['history_kills'] = Summary.from_array(kills, quantiles=True, edges=[15, 30, 50])
+    for name in ('level', 'time', 'wasted_potions', 'items_dropped', 'items_sacrificed'):
+        metrics[f'history_{name}'] = RunningStats.from_array(runs[name])
+    metrics['history_bag_size'] = Histogram.from_array(runs['bag_size'], [3])
+    metrics['history_hp_before_death'] = Summary.from_array(runs['hp_before_death'], quantiles=True,
+                                                            edges=[40, 60])
+
+    metrics['killers'] = runs.counts('killer')
+    after = runs['prev_enemy'] >= 0
+    pairs = value_counts(runs['prev_enemy'][after] * len(runs.levels['killer']) + runs['killer'][after])
+    metrics['death_context'] = Counter({
+        (runs.levels['prev_enemy'][code // len(runs.levels['killer'])],
+         runs.levels['killer'][code % len(runs.levels['killer'])]): count
+        for code, count in pairs.items()})
+    metrics['level_at_death'] = value_counts(runs['level'])
+    metrics['floor_at_death'] = value_counts(runs['floor'])
+
+    # survival_at_fight[n] counts the runs that won at least n fights
+    reached = np.cumsum(np.bincount(kills)[::-1])[::-1]
+    metrics['survival_at_fight'] = Counter({n: int(reached[n]) for n in range(1, len(reached))})
+    metrics['close_calls'] = int(runs['close_calls'].sum())
+    metrics['total_fights'] = int(runs['monster_fights'].sum())
+
+    monsters = runs.meta['monsters']
+    deaths = runs.counts('killer')
+    columns = {'fights': 'monster_fights', 'kills': 'monster_kills', 'total_dmg_dealt': 'monster_dmg_dealt',
+               'total_dmg_taken': 'monster_dmg_taken', 'total_ticks': 'monster_ticks'}
+    totals = {key: runs[column].sum(axis=0).tolist() for key, column in columns.items()}
+    for i, name in enumerate(monsters):
+        ma = metrics['monster_analytics'].setdefault(name, {})
+        ma.update({key: totals[key][i] for key in columns})
+        ma['deaths_caused'] = deaths.get(name, 0)
+
+    metrics['hp_after_fights'] = RunningStats.from_parts(runs['hp_after_fights'])
+    metrics['hp_deltas'] = RunningStats.from_parts(runs['hp_deltas'])
+
+    metrics['altar_visits'] = int(runs['altar_visits'].sum())
+    metrics['total_sacrificed'] = int(runs['items_sacrificed'].sum())
+    metrics['total_hp_restored'] = int(runs['hp_restored'].sum())
+    metrics['death_spirals'] = int(runs['death_spiral'].sum())
+    return metrics
+
+# ==============================================================================
+# REPLAY
+# ==============================================================================
+#
+# Every run of a seeded batch plays on its own run_stream(), so one run can be
+# re-simulated alone, fight by fight, without rerunning the batch. Run
+# indices are row numbers of a --store table.
+
+def print_run(row):
+    """Summary of one replayed run from its run table row, after sim_engine.replay_run()'s trace"""
+    print(f"  Died on floor {row['floor']} to {row['killer']} (HP {row['hp_before_death']} before the fight)")
+    print(f"  Level {row['level']} | {row['kills']} kills | {row['time'] / 60:.1f} minutes alive")
+    print(f"  Items: {row['items_dropped']} dropped, {row['items_sacrificed']} sacrificed, "
+          f"{row['bag_size']} in the bag at death | {row['wasted_potions']} potions unused")
+
+# ==============================================================================
+# A/B COMPARISON
+# ==============================================================================
+
+# Baseline and variant runs share common random numbers: each run draws its
+# spawns and loot from its own stream, and each fight in the run from a stream
+# of its own, so both arms face the same monsters with the same damage rolls
+# until the change makes them diverge.
+
+def paired_result(metrics):
+    """
+    What an A/B comparison compares of one run (see sim_engine.paired_run()).
+    Returns: (kills, level)
+    """
+    return (metrics['history_kills'].stats.total, metrics['history_level'].total)
+
+def collect_pairs(simulations, variant_cfg, seed, exact=False, baseline_cfg=DEFAULT_CONFIG):
+    """Run both arms of an A/B comparison and return (baseline, variant) results"""
+    sim = sys.modules[__name__]
+    streams = [run_stream(seed, run) for run in range(simulations)]
+    baseline_fight, variant_fight = bound_fight(baseline_cfg, exact), bound_fight(variant_cfg, exact)
+
+    baseline = [engine.paired_run(sim, stream, baseline_fight, baseline_cfg) for stream in streams]
+    variant = [engine.paired_run(sim, stream, variant_fight, variant_cfg) for stream in streams]
+    return baseline, variant
+
+def paired_metrics(baseline, variant):
+    """[(label, a_values, b_values)] for every compared metric"""
+    rows = []
+    for label, kills in (('Floor 1 Clear (15 kills)', 15), ('Floor 2 Clear (30 kills)', 30),
+                         ('Immortal (50+ kills)', 50)):
+        rows.append((label, [int(r[0] >= kills) for r in baseline], [int(r[0] >= kills) for r in variant]))
+    rows.append(('Kills per run', [r[0] for r in baseline], [r[0] for r in variant]))
+    rows.append(('Level at death', [r[1] for r in baseline], [r[1] for r in variant]))
+    return rows
+
+def run_comparison(simulations, overrides, seed=None, exact=False, confidence=CI_CONFIDENCE):
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+
+    print(f"Running {simulations} Paired Simulations (common random numbers)...")
+    print(f"Variant: {' | '.join(format_override(o) for o in overrides)}")
+    print(f"Seed: {seed}" + engine.mode_label(exact=exact))
+    print("-" * 60)
+
+    baseline, variant = collect_pairs(simulations, SimConfig(overrides), seed, exact)
+    print_comparison(baseline, variant, confidence)
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+
+def print_report(metrics):
+    """Print the full progression report for a set of metrics"""
+    simulations = metrics['runs']
+
+    history_kills = metrics['history_kills']
+    history_level = metrics['history_level']
+    history_time = metrics['history_time']
+    history_bag_size = metrics['history_bag_size']
+    history_hp_before_death = metrics['history_hp_before_death']
+    history_wasted_potions = metrics['history_wasted_potions']
+    history_items_dropped = metrics['history_items_dropped']
+    history_items_sacrificed = metrics['history_items_sacrificed']
+
+    killers = metrics['killers']
+    death_context = metrics['death_context']
+    level_at_death = metrics['level_at_death']
+    floor_at_death = metrics['floor_at_death']
+
+    survival_at_fight = metrics['survival_at_fight']
+    close_calls = metrics['close_calls']
+    total_fights = metrics['total_fights']
+
+    monster_analytics = metrics['monster_analytics']
 
-    # Sort for percentiles
-    history_kills_sorted = sorted(history_kills)
-    history_hp_before_death_sorted = sorted(history_hp_before_death) if history_hp_before_death else [0]
+    altar_visits = metrics['altar_visits']
+    total_sacrificed = metrics['total_sacrificed']
+    total_hp_restored = metrics['total_hp_restored']
+
+    death_spirals = metrics['death_spirals']
+
+    avg_kills = history_kills.stats.mean
+    avg_rooms = avg_kills / 1.5
+    avg_time = history_time.mean / 60
+    avg_lvl = history_level.mean
 
     print("\n" + "=" * 60)
     print("                    MASTER PROGRESSION REPORT")
@@ -367,42 +908,42 @@ def run_simulation():
     print(f"  Average Time Alive:   {avg_time:.1f} minutes")
 
     print("\n--- KILL DISTRIBUTION ---")
-    print(f"  Min:    {min(history_kills)}")
-    print(f"  25th%:  {percentile(history_kills_sorted, 0.25)}")
-    print(f"  50th%:  {percentile(history_kills_sorted, 0.50)}")
-    print(f"  75th%:  {percentile(history_kills_sorted, 0.75)}")
-    print(f"  90th%:  {percentile(history_kills_sorted, 0.90)}")
-    print(f"  Max:    {max(history_kills)}")
+    print(f"  Min:    {history_kills.stats.min}")
+    print(f"  25th%:  {history_kills.quantile(0.25)}")
+    print(f"  50th%:  {history_kills.quantile(0.50)}")
+    print(f"  75th%:  {history_kills.quantile(0.75)}")
+    print(f"  90th%:  {history_kills.quantile(0.90)}")
+    print(f"  Max:    {history_kills.stats.max}")
 
     print("\n--- SURVIVAL CURVE ---")
     for n in [5, 10, 15, 20, 25, 30, 40, 50]:
-        pct = (survival_at_fight[n] / SIMULATIONS) * 100
+        pct = (survival_at_fight[n] / simulations) * 100
         bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
         print(f"  {n:2d} fights: {bar} {pct:5.1f}%")
 
     print("\n--- MILESTONE RATES ---")
-    k15 = len([k for k in history_kills if k >= 15])
-    k30 = len([k for k in history_kills if k >= 30])
-    k50 = len([k for k in history_kills if k >= 50])
-    print(f"  Floor 1 Clear (15 kills):  {(k15/SIMULATIONS)*100:.1f}%")
-    print(f"  Floor 2 Clear (30 kills):  {(k30/SIMULATIONS)*100:.1f}%")
-    print(f"  Immortal (50+ kills):      {(k50/SIMULATIONS)*100:.1f}%")
+    k15 = history_kills.hist.above(15)
+    k30 = history_kills.hist.above(30)
+    k50 = history_kills.hist.above(50)
+    print(f"  Floor 1 Clear (15 kills):  {(k15/simulations)*100:.1f}%")
+    print(f"  Floor 2 Clear (30 kills):  {(k30/simulations)*100:.1f}%")
+    print(f"  Immortal (50+ kills):      {(k50/simulations)*100:.1f}%")
 
     print("\n--- CLOSE CALLS & SPIRALS ---")
     print(f"  Close Calls (<20% HP):     {close_calls} ({(close_calls/total_fights)*100:.2f}% of fights)")
-    print(f"  Death Spirals:             {death_spirals} ({(death_spirals/SIMULATIONS)*100:.1f}% of runs)")
+    print(f"  Death Spirals:             {death_spirals} ({(death_spirals/simulations)*100:.1f}% of runs)")
 
     # Economy
     print("\n" + "=" * 60)
     print("                       ECONOMY REPORT")
     print("=" * 60)
 
-    tragic_deaths = len([x for x in history_bag_size if x >= 3])
-    tragedy_pct = (tragic_deaths / len(history_bag_size)) * 100 if history_bag_size else 0
+    tragic_deaths = history_bag_size.above(3)
+    tragedy_pct = (tragic_deaths / len(history_bag_size)) * 100 if len(history_bag_size) else 0
 
-    avg_dropped = statistics.mean(history_items_dropped) if history_items_dropped else 0
-    avg_sacrificed = statistics.mean(history_items_sacrificed) if history_items_sacrificed else 0
-    avg_wasted_potions = statistics.mean(history_wasted_potions) if history_wasted_potions else 0
+    avg_dropped = history_items_dropped.mean
+    avg_sacrificed = history_items_sacrificed.mean
+    avg_wasted_potions = history_wasted_potions.mean
 
     print(f"\n  Avg Items Dropped:         {avg_dropped:.1f}")
     print(f"  Avg Items Sacrificed:      {avg_sacrificed:.1f}")
@@ -421,51 +962,51 @@ def run_simulation():
     print("=" * 60)
 
     print("\n--- HP BEFORE FATAL FIGHT ---")
-    if history_hp_before_death:
-        print(f"  Min:    {min(history_hp_before_death)}")
-        print(f"  25th%:  {percentile(history_hp_before_death_sorted, 0.25)}")
-        print(f"  50th%:  {percentile(history_hp_before_death_sorted, 0.50)}")
-        print(f"  75th%:  {percentile(history_hp_before_death_sorted, 0.75)}")
-        print(f"  Max:    {max(history_hp_before_death)}")
+    if len(history_hp_before_death):
+        print(f"  Min:    {history_hp_before_death.stats.min}")
+        print(f"  25th%:  {history_hp_before_death.quantile(0.25)}")
+        print(f"  50th%:  {history_hp_before_death.quantile(0.50)}")
+        print(f"  75th%:  {history_hp_before_death.quantile(0.75)}")
+        print(f"  Max:    {history_hp_before_death.stats.max}")
 
         # Categorize deaths
-        burst_deaths = len([hp for hp in history_hp_before_death if hp >= 60])
-        attrition_deaths = len([hp for hp in history_hp_before_death if hp < 40])
+        burst_deaths = history_hp_before_death.hist.above(60)
+        attrition_deaths = history_hp_before_death.hist.below(40)
         print(f"\n  Burst Deaths (HP>=60):     {(burst_deaths/len(history_hp_before_death))*100:.1f}%")
         print(f"  Attrition Deaths (HP<40):  {(attrition_deaths/len(history_hp_before_death))*100:.1f}%")
 
     print("\n--- LEVEL AT DEATH ---")
     for lvl in sorted(level_at_death.keys()):
         count = level_at_death[lvl]
-        pct = (count / SIMULATIONS) * 100
+        pct = (count / simulations) * 100
         bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
         print(f"  Level {lvl}: {bar} {pct:5.1f}%")
 
     print("\n--- FLOOR AT DEATH ---")
     for flr in sorted(floor_at_death.keys()):
         count = floor_at_death[flr]
-        pct = (count / SIMULATIONS) * 100
+        pct = (count / simulations) * 100
         bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
         print(f"  Floor {flr}: {bar} {pct:5.1f}%")
 
     print("\n--- CAUSE OF DEATH (Top 5) ---")
-    killer_counts = Counter(killers)
+    total_deaths = sum(killers.values())
     if not killers:
         print("  No deaths recorded.")
     else:
-        for name, count in killer_counts.most_common(5):
-            pct = (count / len(killers)) * 100
+        for name, count in ranked(killers, 5):
+            pct = (count / total_deaths) * 100
             bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
             print(f"  {name:<20} {bar} {pct:5.1f}%")
 
     print("\n--- DEATH CONTEXT (Last 2 Enemies) ---")
-    context_counts = Counter(death_context)
     if not death_context:
         print("  N/A")
     else:
-        for pair, count in context_counts.most_common(5):
+        context_total = sum(death_context.values())
+        for pair, count in ranked(death_context, 5):
             label = f"{pair[0]} -> {pair[1]}"
-            pct = (count / len(death_context)) * 100
+            pct = (count / context_total) * 100
             print(f"  {label:<40} {pct:.1f}%")
 
     # Monster Threat Analysis
@@ -483,7 +1024,7 @@ def run_simulation():
             continue
 
         win_pct = (ma['kills'] / fights) * 100
-        death_pct = (ma['deaths_caused'] / len(killers)) * 100 if killers else 0
+        death_pct = (ma['deaths_caused'] / total_deaths) * 100 if killers else 0
         avg_ttk = (ma['total_ticks'] / fights) * TICK_DURATION
         avg_dpf = ma['total_dmg_taken'] / fights  # Damage per fight (to player)
 
@@ -521,11 +1062,11 @@ def run_simulation():
     recommendations = []
 
     # Check floor 1 clear rate
-    if (k15/SIMULATIONS)*100 < 50:
+    if (k15/simulations)*100 < 50:
         recommendations.append("- Floor 1 clear rate is low (<50%). Consider reducing early monster damage or HP.")
 
     # Check attrition vs burst
-    if history_hp_before_death:
+    if len(history_hp_before_death):
         burst_pct = (burst_deaths/len(history_hp_before_death))*100
         if burst_pct > 40:
             recommendations.append(f"- {burst_pct:.0f}% of deaths are burst (HP>=60). Some monsters may hit too hard.")
@@ -535,13 +1076,13 @@ def run_simulation():
         recommendations.append(f"- Tragedy rate is {tragedy_pct:.0f}%. Consider reducing altar interval from {ALTAR_INTERVAL}.")
 
     # Check death spirals
-    if (death_spirals/SIMULATIONS)*100 > 20:
+    if (death_spirals/simulations)*100 > 20:
         recommendations.append("- High death spiral rate. Players may need more recovery options between fights.")
 
     # Check specific monster threats
     for name, ma in monster_analytics.items():
         if killers:
-            death_pct = (ma['deaths_caused'] / len(killers)) * 100
+            death_pct = (ma['deaths_caused'] / total_deaths) * 100
             if death_pct > 30:
                 recommendations.append(f"- {name} causes {death_pct:.0f}% of deaths. Consider nerfing.")
 
@@ -553,9 +1094,178 @@ def run_simulation():
 
     print("\n" + "=" * 60)
 
+def print_intervals(metrics, target, confidence=CI_CONFIDENCE, relative=False):
+    """Print the confidence intervals a --target-ci run stopped at"""
+    print("\n" + "=" * 60)
+    print(f"                  {confidence*100:.0f}% CONFIDENCE INTERVALS")
+    print("=" * 60)
+
+    print(f"\n  Runs: {metrics['runs']} | Target half-width: ±{target*100:.2f}%" + (" of the rate" if relative else ""))
+    print(f"\n  {'Metric':<26} {'Rate':>7} {'Low':>7} {'High':>7} {'±':>6}")
+    print("  " + "-" * 57)
+    for label, rate, low, high in engine.confidence_intervals(interval_targets(metrics), confidence):
+        half = (high - low) / 2
+        flag = "" if target_met(rate, low, high, target, relative) else "  (not met)"
+        print(f"  {label:<26} {rate*100:>6.2f}% {low*100:>6.2f}% {high*100:>6.2f}% {half*100:>5.2f}%{flag}")
+
+    print("\n" + "=" * 60)
+
+def print_comparison(baseline, variant, confidence=CI_CONFIDENCE):
+    """Print paired deltas from collect_pairs() results"""
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    print("\n" + "=" * 60)
+    print("                  A/B PAIRED COMPARISON")
+    print("=" * 60)
+
+    print(f"\n  Runs: {len(baseline)}")
+    print(f"\n  {'Metric':<26} {'Base':>7} {'Variant':>7} {'Delta':>7} {'SE':>6} {'z':>6} {'VR':>6}")
+    print("  " + "-" * 71)
+    for label, a, b in paired_metrics(baseline, variant):
+        mean_a, mean_b, delta, se, se_ind = paired_delta(a, b)
+        score = delta / se if se > 0 else 0.0
+        reduction = f"{(se_ind / se) ** 2:>5.1f}x" if se > 0 else f"{'-':>6}"
+        if label in ('Kills per run', 'Level at death'):
+            print(f"  {label:<26} {mean_a:>7.2f} {mean_b:>7.2f} {delta:>+7.2f} {se:>6.3f} {score:>+6.1f} {reduction}")
+        else:
+            print(f"  {label:<26} {mean_a*100:>6.2f}% {mean_b*100:>6.2f}% {delta*100:>+6.2f}% "
+                  f"{se*100:>5.2f}% {score:>+6.1f} {reduction}")
+
+    # Runs needed to pin the floor 2 clear-rate delta to ±1 point
+    label, a, b = paired_metrics(baseline, variant)[1]
+    _, _, _, se, se_ind = paired_delta(a, b)
+    n = len(a)
+    print("\n  SE: paired standard error | VR: variance reduction vs. independent batches")
+    print(f"  Runs for a ±1.00% {label} delta at {confidence*100:.0f}%: "
+          f"{math.ceil(n * (z * se / 0.01) ** 2)} paired vs. "
+          f"{math.ceil(n * (z * se_ind / 0.01) ** 2)} independent")
+
+    print("\n" + "=" * 60)
+
+def print_exact_threats(floors=(1, 2, 3)):
+    """
+    Noise-free threat table: a fresh player against each monster, per floor.
+    A fresh player beats every monster alone, so the table shows what the
+    fight costs instead: its expected length in ticks and damage taken (DPF).
+    """
+    print("\n" + "=" * 60)
+    print("                  EXACT THREAT TABLE (Fresh Player)")
+    print("=" * 60)
+
+    header = "".join(f" {'F' + str(f) + ' Ticks':>9} {'DPF':>6}" for f in floors)
+    print(f"\n  {'Monster':<20}{header}")
+    print("  " + "-" * (20 + 16 * len(floors)))
+
+    for name in sorted(MONSTER_STATS.keys()):
+        row = ""
+        for flr in floors:
+            e = fight_expectations(PLAYER_START, name, flr)
+            row += f" {e['ticks']:>9.1f} {e['dmg_taken']:>6.1f}"
+        print(f"  {name:<20}{row}")
+
+    print("\n" + "=" * 60)
+
+# ==============================================================================
+# PROFILING
+# ==============================================================================
+#
+# What --profile times (see sim_profile). The damage formulas only run when
+# matchup_params() misses its cache.
+
+def profile_phases():
+    """(phase, owner, attribute) of every callable --profile times"""
+    import batch_combat
+    import run_store
+    import streaming_stats
+
+    module = sys.modules[__name__]
+    phases = [
+        ('spawn rolls', module, 'spawn_enemy'),
+        ('fight()', module, 'fight'),
+        ('fight()', module, 'sample_fight'),
+        ('fight()', batch_combat, 'resolve_batch'),
+        ('fight columns', batch_combat, 'stack_fights'),
+        ('matchups', module, 'matchup_params'),
+        ('damage', engine, 'player_damage'),
+        ('damage', engine, 'monster_damage'),
+        ('level-ups', engine, 'check_level_up'),
+        ('loot', engine, 'drop_loot'),
+        ('altars', engine, 'visit_altar'),
+        ('analytics', module, 'monster_columns'),
+        ('analytics', run_store.RunTable, 'add'),
+    ]
+    for cls in (streaming_stats.RunningStats, streaming_stats.Summary,
+                streaming_stats.QuantileSketch, streaming_stats.Histogram):
+        phases.append(('analytics', cls, 'add'))
+    return phases
+
+def profile_counters():
+    """(label, owner, attribute, size) of the runs and fights --profile counts"""
+    import batch_combat
+
+    module = sys.modules[__name__]
+    return [
+        ('runs', module, 'simulate_run', None),
+        ('fights', engine, 'fight', None),
+        ('fights', module, 'sample_fight', None),
+        ('fights', batch_combat, 'resolve_batch', lambda S, F, rng: S.shape[1]),
+    ]
+
 # ==============================================================================
 # ENTRY POINT
 # ==============================================================================
 
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo kill-count balance simulator")
+    parser.add_argument('--runs', type=int, default=SIMULATIONS, help="number of runs to simulate")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    parser.add_argument('--target-ci', type=float, default=None,
+                        help="run until every milestone rate's CI half-width is at most this (e.g. 0.01)")
+    parser.add_argument('--confidence', type=float, default=CI_CONFIDENCE, help="confidence level for --target-ci")
+    parser.add_argument('--max-runs', type=int, default=MAX_SEQUENTIAL_RUNS, help="run cap for --target-ci")
+    parser.add_argument('--relative', action='store_true', help="--target-ci is a fraction of each rate")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true', help="resolve fights with the NumPy batch engine (10-20%% faster from a few thousand runs)")
+    mode.add_argument('--exact', action='store_true', help="sample fights from cached exact distributions of the monster side")
+    parser.add_argument('--variant', type=functools.partial(parse_override, constants=config_constants()),
+                        action='append', metavar='NAME.key=value',
+                        help="compare against this config change on common random numbers (repeatable)")
+    parser.add_argument('--replay', type=int, default=None, metavar='RUN',
+                        help="re-simulate run RUN of the --seed batch alone, with a fight-by-fight trace")
+    parser.add_argument('--store', metavar='PATH', default=None,
+                        help="also write every run as a row of a columnar .npz table")
+    parser.add_argument('--report', metavar='PATH', default=None,
+                        help="print the report for a table written by --store instead of simulating")
+    sim_profile.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.store and (args.variant or args.report):
+        parser.error("--store can't be combined with --variant or --report")
+    if args.replay is not None:
+        if args.seed is None:
+            parser.error("--replay needs the --seed of the batch")
+        if args.batch or args.variant:
+            parser.error("--replay can't be combined with --batch or --variant")
+    if args.variant and (args.batch or args.target_ci):
+        parser.error("--variant can't be combined with --batch or --target-ci")
+    if sim_profile.requested(args) and args.report:
+        parser.error("--profile, --profile-out and --flamegraph can't be combined with --report")
+
+    with sim_profile.profiling(args, profile_phases, profile_counters):
+        dispatch(args)
+
+def dispatch(args):
+    """Run whichever mode the command line asked for"""
+    if args.replay is not None:
+        engine.replay_run(sys.modules[__name__], args.seed, args.replay, bound_fight(exact=args.exact),
+                          DEFAULT_CONFIG, engine.mode_label(exact=args.exact))
+    elif args.report:
+        engine.run_report(sys.modules[__name__], args.report, 'balance_simulator')
+    elif args.variant:
+        run_comparison(args.runs, args.variant, args.seed, args.exact, args.confidence)
+    else:
+        run_simulation(args.runs, args.seed, args.batch, args.exact,
+                       args.target_ci, args.confidence, args.max_runs, args.relative, args.store)
+
 if __name__ == "__main__":
-    run_simulation()
+    main()
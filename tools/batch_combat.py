@@ -0,0 +1,417 @@
+import time
+
+import numpy as np
+
+import sim_engine as engine
+from sim_engine import BLEED_INTERVAL, MELEE_RANGE, PARAM_DEFAULTS, POTION_THRESHOLD
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+COMPACT_FRACTION = 0.5   # Drop finished fights once they make up this share of the batch
+SCALAR_BATCH = 256       # Smaller batches go through the scalar fight(): below a few
+                         # hundred fights NumPy's per-tick overhead outweighs the gain
+
+# Fight columns. Integer state lives in one (k, n) matrix and float parameters
+# in another, so dropping finished fights is two fancy-index operations no
+# matter how many columns there are. Stun and bleed are stored as the tick
+# they wear off rather than as countdowns, and attacks and movement steps
+# land on multiples of a fight's fixed intervals, so a fight costs nothing
+# on ticks where it does not act.
+PLAYER_COLUMNS = ['p_hp', 'p_max_hp', 'potions', 'potion_heal']
+MATCHUP_COLUMNS = [
+    'm_hp', 'p_ticks', 'm_ticks', 'move_ticks',
+    'p_range', 'distance', 'stun_duration', 'bleed_duration',
+    'bleed_pulse'
+]
+STATE_COLUMNS = ['stun_end', 'bleed_end', 'dmg_dealt', 'dmg_taken', 'index']
+INT_COLUMNS = PLAYER_COLUMNS + MATCHUP_COLUMNS + STATE_COLUMNS
+FLOAT_COLUMNS = [
+    'p_raw', 'm_raw', 'p_hit', 'm_hit', 'p_crit', 'crit_mult',
+    'stun_chance', 'bleed_chance', 'variance'
+]
+
+# ==============================================================================
+# BATCH ENGINE
+# ==============================================================================
+
+def stack_params(param_rows):
+    """Turn a list of per-fight parameter dicts into column arrays (of the columns fight_batch() reads)"""
+    keys = [k for k in param_rows[0] if k in INT_COLUMNS or k in FLOAT_COLUMNS]
+    return {k: np.array([row[k] for row in param_rows]) for k in keys}
+
+def fight_batch(params, rng):
+    """
+    Resolve many independent fights at once.
+
+    params: dict of equal-length arrays (scalars broadcast). Per fight:
+      p_hp, p_max_hp, potions, potion_heal  - player state
+      p_raw, m_raw       - damage per hit before variance (base * def_mod)
+      p_hit, m_hit       - hit chances
+      p_crit, crit_mult  - player crit chance and multiplier
+      p_ticks, m_ticks   - attack intervals in ticks
+      m_hp               - monster HP (already floor-scaled)
+      move_ticks, distance, p_range - range mechanics
+      stun_chance, stun_duration, bleed_chance, bleed_duration,
+      bleed_pulse        - on-hit effects (bleed_pulse = damage per pulse)
+      variance           - damage roll spread (0.1 = uniform(0.9, 1.1))
+
+    Returns: dict of arrays ticks, dmg_dealt, dmg_taken, won, hp, potions
+    """
+    n = len(params['p_hp'])
+    merged = dict(PARAM_DEFAULTS, **params)
+    S = np.empty((len(INT_COLUMNS), n), dtype=np.int32)
+    F = np.empty((len(FLOAT_COLUMNS), n), dtype=np.float64)
+    for row, key in enumerate(PLAYER_COLUMNS + MATCHUP_COLUMNS):
+        S[row] = merged[key]
+    for row, key in enumerate(FLOAT_COLUMNS):
+        F[row] = merged[key]
+    return resolve_batch(S, F, rng)
+
+NO_FIGHTS = np.empty(0, dtype=np.intp)
+
+def interval_groups(intervals):
+    """
+    [(interval, indices)] of the fights sharing each interval, the indices
+    in ascending order. A fight with interval d acts on every multiple of d,
+    so the fights acting on a tick are the groups whose interval divides it.
+    """
+    order = np.argsort(intervals, kind='stable')
+    values, starts = np.unique(intervals[order], return_index=True)
+    return [(d, group) for d, group in zip(values.tolist(), np.split(order, starts[1:])) if d > 0]
+
+def acting(groups, tick):
+    """Indices (ascending) of the fights in groups that act on tick"""
+    due = [group for d, group in groups if tick % d == 0]
+    if not due:
+        return NO_FIGHTS
+    if len(due) == 1:
+        return due[0]
+    return np.sort(np.concatenate(due))
+
+def resolve_batch(S, F, rng):
+    """
+    fight_batch() on columns already stacked: S is (len(INT_COLUMNS), n)
+    int32 with the player and matchup rows filled in (the running state rows
+    are set here), F is (len(FLOAT_COLUMNS), n) float64.
+
+    Follows the tick order of the scalar fight(): bleed, stun decay, monster
+    movement, player attack, monster attack, potion check. All fights start
+    at tick 0, so the tick counter is shared and every per-fight test is a
+    masked array operation. Fights are grouped by their attack and movement
+    intervals (see interval_groups()), so a tick only touches the fights
+    that act on it instead of scanning the whole batch.
+    """
+    n = S.shape[1]
+    state = len(PLAYER_COLUMNS) + len(MATCHUP_COLUMNS)
+    S[state:state + 4] = 0                             # stun_end, bleed_end, dmg_dealt, dmg_taken
+    S[state + 4] = np.arange(n)                        # index
+    alive = np.ones(n, dtype=bool)
+
+    out_ticks = np.zeros(n, dtype=np.int64)
+    out_hp = np.zeros(n, dtype=np.int64)
+    out_potions = np.zeros(n, dtype=np.int64)
+    out_dealt = np.zeros(n, dtype=np.int64)
+    out_taken = np.zeros(n, dtype=np.int64)
+
+    (hp, max_hp, potions, heal, m_hp, p_ticks, m_ticks, move_ticks, p_range,
+     distance, stun_duration, bleed_duration, bleed_pulse,
+     stun_end, bleed_end, dealt, taken, index) = S
+    p_groups = interval_groups(p_ticks)
+    m_groups = interval_groups(m_ticks)
+    move_groups = interval_groups(move_ticks)
+    p_raw, m_raw, p_hit, m_hit, p_crit, crit_mult, stun_chance, bleed_chance, variance = F
+
+    # Only draw the uniforms some fight in the batch can actually use
+    p_rolls = [name for name, used in (
+        ('hit', (p_hit < 1.0).any()), ('spread', variance.any()), ('crit', p_crit.any()),
+        ('stun', stun_chance.any()), ('bleed', bleed_chance.any())) if used]
+    m_rolls = [name for name, used in (
+        ('hit', (m_hit < 1.0).any()), ('spread', variance.any())) if used]
+    p_rows = {name: i for i, name in enumerate(p_rolls)}
+    m_rows = {name: i for i, name in enumerate(m_rolls)}
+
+    far = np.count_nonzero(distance > MELEE_RANGE)
+    tick = 0
+    while alive.size:
+        tick += 1
+        pulse_tick = tick % BLEED_INTERVAL == 0
+
+        # Bleed damage lands once per second while the bleed timer runs
+        if pulse_tick:
+            pulse = bleed_pulse * (bleed_end >= tick)
+            m_hp -= pulse
+            dealt += pulse
+
+        # Monster closes distance (blocked by stun)
+        if far:
+            movers = acting(move_groups, tick)
+            movers = movers[(distance[movers] > MELEE_RANGE) & (stun_end[movers] <= tick)]
+            distance[movers] -= 1
+            far -= np.count_nonzero(distance[movers] <= MELEE_RANGE)
+
+        # Player attack
+        attackers = acting(p_groups, tick)
+        if far:
+            attackers = attackers[distance[attackers] <= p_range[attackers]]
+        if attackers.size:
+            u = rng.random((len(p_rows), attackers.size), dtype=np.float32)
+            dmg = p_raw[attackers]
+            if 'spread' in p_rows:
+                spread = variance[attackers]
+                dmg = dmg * (1.0 - spread + 2.0 * spread * u[p_rows['spread']])
+            dmg = np.maximum(1.0, np.floor(dmg))
+            if 'crit' in p_rows:
+                crit = u[p_rows['crit']] < p_crit[attackers]
+                dmg[crit] = np.floor(dmg[crit] * crit_mult[attackers[crit]])
+            if 'hit' in p_rows:
+                hit = u[p_rows['hit']] < p_hit[attackers]
+                dmg *= hit
+            else:
+                hit = True
+            dmg = dmg.astype(np.int32)
+            m_hp[attackers] -= dmg
+            dealt[attackers] += dmg
+
+            if 'stun' in p_rows:
+                stunned = attackers[hit & (u[p_rows['stun']] < stun_chance[attackers])]
+                stun_end[stunned] = tick + stun_duration[stunned]
+            if 'bleed' in p_rows:
+                bled = attackers[hit & (u[p_rows['bleed']] < bleed_chance[attackers])]
+                bleed_end[bled] = tick + bleed_duration[bled]
+
+        # Monster attack (melee only, blocked by stun)
+        strikers = acting(m_groups, tick)
+        strikers = strikers[(m_hp[strikers] > 0) & (stun_end[strikers] <= tick)]
+        if far:
+            strikers = strikers[distance[strikers] <= MELEE_RANGE]
+        if strikers.size:
+            u = rng.random((len(m_rows), strikers.size), dtype=np.float32)
+            dmg = m_raw[strikers]
+            if 'spread' in m_rows:
+                spread = variance[strikers]
+                dmg = dmg * (1.0 - spread + 2.0 * spread * u[m_rows['spread']])
+            dmg = np.maximum(1.0, np.floor(dmg))
+            if 'hit' in m_rows:
+                dmg *= u[m_rows['hit']] < m_hit[strikers]
+            dmg = dmg.astype(np.int32)
+            new_hp = hp[strikers] - dmg
+            taken[strikers] += dmg
+
+            # Potion check after every hit, as check_potion() does
+            drink = (dmg > 0) & (new_hp < POTION_THRESHOLD) & (potions[strikers] > 0)
+            hp[strikers] = np.where(drink, np.minimum(max_hp[strikers], new_hp + heal[strikers]), new_hp)
+            potions[strikers] -= drink
+
+        # Record finished fights; only fights that took damage this tick can end
+        if pulse_tick:
+            hurt_sets = (np.flatnonzero(alive),)
+        else:
+            hurt_sets = (attackers, strikers)
+        retired = 0
+        for hurt in hurt_sets:
+            done = hurt[alive[hurt] & ((hp[hurt] <= 0) | (m_hp[hurt] <= 0))]
+            if not done.size:
+                continue
+            finished = index[done]
+            out_ticks[finished] = tick
+            out_hp[finished] = hp[done]
+            out_potions[finished] = potions[done]
+            out_dealt[finished] = dealt[done]
+            out_taken[finished] = taken[done]
+            alive[done] = False
+            retired += done.size
+        if not retired:
+            continue
+
+        # Compact the columns once enough finished fights have piled up
+        live = np.count_nonzero(alive)
+        if live <= alive.size * (1.0 - COMPACT_FRACTION):
+            S = S[:, alive]
+            F = F[:, alive]
+            alive = np.ones(live, dtype=bool)
+            (hp, max_hp, potions, heal, m_hp, p_ticks, m_ticks, move_ticks, p_range,
+             distance, stun_duration, bleed_duration, bleed_pulse,
+             stun_end, bleed_end, dealt, taken, index) = S
+            p_raw, m_raw, p_hit, m_hit, p_crit, crit_mult, stun_chance, bleed_chance, variance = F
+            p_groups = interval_groups(p_ticks)
+            m_groups = interval_groups(m_ticks)
+            move_groups = interval_groups(move_ticks)
+            far = np.count_nonzero(distance > MELEE_RANGE)
+
+    return {
+        'ticks': out_ticks,
+        'dmg_dealt': out_dealt,
+        'dmg_taken': out_taken,
+        'won': out_hp > 0,
+        'hp': out_hp,
+        'potions': out_potions
+    }
+
+# ==============================================================================
+# LOCKSTEP RUN DRIVER
+# ==============================================================================
+
+class MatchupTable:
+    """
+    The constant columns of every matchup seen so far, one column each, so
+    a batch gathers its fights' parameters with one fancy index instead of
+    building a dict per fight. Matchups come out of the simulators' caches
+    and are looked up by identity; the table keeps a reference to each one
+    so an id is never reused while its column is.
+    """
+
+    def __init__(self, capacity=256):
+        self.columns = {}
+        self.matchups = []
+        self.ints = np.empty((len(MATCHUP_COLUMNS), capacity), dtype=np.int32)
+        self.floats = np.empty((len(FLOAT_COLUMNS), capacity), dtype=np.float64)
+
+    def column(self, c):
+        """Column of matchup c, added on first sight"""
+        key = id(c)
+        column = self.columns.get(key)
+        if column is None:
+            column = len(self.matchups)
+            if column == self.ints.shape[1]:
+                self.ints = np.concatenate([self.ints, np.empty_like(self.ints)], axis=1)
+                self.floats = np.concatenate([self.floats, np.empty_like(self.floats)], axis=1)
+            self.ints[:, column] = [c[k] for k in MATCHUP_COLUMNS]
+            self.floats[:, column] = [c[k] for k in FLOAT_COLUMNS]
+            self.columns[key] = column
+            self.matchups.append(c)
+        return column
+
+def stack_fights(requests, matchup_fn, table):
+    """
+    resolve_batch() columns for a list of (player, monster_name, floor)
+    fight requests: the player rows read from the player dicts, the matchup
+    rows gathered from table
+    """
+    players = len(PLAYER_COLUMNS)
+    matchups = players + len(MATCHUP_COLUMNS)
+    S = np.empty((len(INT_COLUMNS), len(requests)), dtype=np.int32)
+    S[:players] = np.array([(p['hp'], p['max_hp'], p['potions'], p['potion_heal'])
+                            for p, _, _ in requests], dtype=np.int32).T
+    column = table.column
+    index = [column(matchup_fn(p, m_name, floor)) for p, m_name, floor in requests]
+    S[players:matchups] = table.ints[:, index]
+    return S, table.floats[:, index]
+
+def drive_lockstep(runs, matchup_fn, rng, scalar_batch=SCALAR_BATCH):
+    """
+    Advance many run generators together, resolving their fights in batches.
+
+    Each run is a generator that yields (player, monster_name, floor) when it
+    needs a fight and receives the scalar fight() tuple
+    (ticks, dmg_dealt, dmg_taken, won) back. matchup_fn(player, monster_name,
+    floor) returns the (cached) sim_engine matchup of the fight; its
+    constants are gathered from a MatchupTable and only the player's hp,
+    max_hp, potions and potion_heal are read per fight. The player's hp and
+    potions are updated in place, exactly as the scalar fight() does.
+
+    Once fewer than scalar_batch runs are left (runs end at different
+    times, so the batches shrink), their fights go through
+    sim_engine.fight() on the random module instead, which is faster than
+    NumPy at that size.
+    """
+    pending = []
+    for run in runs:
+        try:
+            pending.append((run, next(run)))
+        except StopIteration:
+            pass
+
+    table = MatchupTable()
+    while pending:
+        if len(pending) < scalar_batch:
+            results = [engine.fight(p, matchup_fn(p, m_name, floor)) for _, (p, m_name, floor) in pending]
+        else:
+            result = resolve_batch(*stack_fights([request for _, request in pending], matchup_fn, table), rng)
+            for (_, (player, _, _)), hp, potions in zip(pending, result['hp'].tolist(),
+                                                        result['potions'].tolist()):
+                player['hp'] = hp
+                player['potions'] = potions
+            results = zip(result['ticks'].tolist(), result['dmg_dealt'].tolist(),
+                          result['dmg_taken'].tolist(), result['won'].tolist())
+
+        still_running = []
+        for (run, _), outcome in zip(pending, results):
+            try:
+                request = run.send(outcome)
+            except StopIteration:
+                continue
+            still_running.append((run, request))
+        pending = still_running
+
+# ==============================================================================
+# VALIDATION / BENCHMARK
+# ==============================================================================
+
+def compare_with_scalar(sim, make_player, fights=100000, seed=1):
+    """
+    Resolve the same matchups with sim.fight() and fight_batch() and report
+    outcome statistics and wall time for both.
+
+    sim: a simulator module exposing fight(), fight_matchup() and MONSTER_STATS.
+    make_player(i): fresh player dict for the i-th matchup.
+
+    The scalar fight() jumps from event to event rather than stepping every
+    tick, so the batch engine's lead is in the single digits, and smaller
+    still once building the columns from player dicts is counted.
+    """
+    import random
+
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    monsters = list(sim.MONSTER_STATS.keys())
+    matchups = [(make_player(i), monsters[i % len(monsters)], 1 + i % 3) for i in range(fights)]
+
+    start = time.perf_counter()
+    scalar = []
+    for player, m_name, floor in matchups:
+        p = dict(player)
+        ticks, dealt, taken, won = sim.fight(p, m_name, floor)
+        scalar.append((ticks, dealt, taken, won, p['hp']))
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    S, F = stack_fights(matchups, sim.fight_matchup, MatchupTable())
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = resolve_batch(S, F, rng)
+    batch_time = time.perf_counter() - start
+
+    scalar_cols = np.array(scalar, dtype=np.float64)
+    batch_cols = np.column_stack([batch['ticks'], batch['dmg_dealt'], batch['dmg_taken'],
+                                  batch['won'], batch['hp']]).astype(np.float64)
+
+    print(f"\n  {'Metric':<12} {'Scalar':>10} {'Batch':>10} {'Diff/SE':>8}")
+    print("  " + "-" * 42)
+    for col, label in enumerate(['ticks', 'dmg_dealt', 'dmg_taken', 'win rate', 'end hp']):
+        a = scalar_cols[:, col]
+        b = batch_cols[:, col]
+        se = np.sqrt(a.var() / len(a) + b.var() / len(b)) or 1.0
+        print(f"  {label:<12} {a.mean():>10.3f} {b.mean():>10.3f} {(b.mean() - a.mean()) / se:>8.2f}")
+
+    print(f"\n  Scalar fight():   {scalar_time:.3f}s ({fights / scalar_time:,.0f} fights/sec)")
+    print(f"  fight_batch():    {batch_time:.3f}s ({fights / batch_time:,.0f} fights/sec)"
+          f" + {build_time:.3f}s building params")
+    print(f"  Speedup:          {scalar_time / batch_time:.1f}x resolving,"
+          f" {scalar_time / (batch_time + build_time):.1f}x building included")
+
+if __name__ == "__main__":
+    import balance_simulator
+    import dungeon_run_simulator
+
+    weapons = list(dungeon_run_simulator.STARTER_WEAPONS.keys())
+    setups = [
+        (dungeon_run_simulator, lambda i: dungeon_run_simulator.create_player(weapons[i % len(weapons)])),
+        (balance_simulator, lambda i: balance_simulator.PLAYER_START.copy()),
+    ]
+    for sim, make_player in setups:
+        print("=" * 60)
+        print(f"  {sim.__name__}: scalar vs batch")
+        print("=" * 60)
+        compare_with_scalar(sim, make_player)
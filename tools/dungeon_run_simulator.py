@@ -1,6 +1,24 @@
+import argparse
+import functools
+import math
+import multiprocessing
+import os
+import pickle
 import random
 import statistics
+import sys
+import time
 from collections import Counter, defaultdict
+from types import MappingProxyType
+
+import game_data
+import sim_engine as engine
+import sim_profile
+from run_store import RunTable, value_counts
+from sim_engine import (format_override, freeze, paired_delta, parse_override, ranked, resolve_fights,
+                        run_stream, target_met)
+from streaming_stats import Histogram, RunningStats, Summary
+from weighted_sampler import AliasSampler, DrawPool, percent_weights
 
 # ==============================================================================
 # CONFIGURATION
@@ -8,6 +26,21 @@ from collections import Counter, defaultdict
 
 SIMULATIONS = 5000
 
+# --- PARALLEL EXECUTION ---
+WORKERS = 1        # Worker processes (0 = one per CPU core)
+CHUNK_SIZE = 100   # Runs per RNG shard. Fixed so results don't depend on WORKERS
+BATCH_CHUNK_SIZE = 5000  # Runs advanced in lockstep per shard with --batch
+
+# --- SEQUENTIAL STOPPING (--target-ci) ---
+CI_CONFIDENCE = 0.95           # Confidence level of the reported intervals
+MAX_SEQUENTIAL_RUNS = 1000000  # Give up on the targets after this many runs
+
+# --- CACHES ---
+MATCHUP_CACHE_SIZE = 16384  # Matchups kept by matchup_params(); the full bestiary reaches ~2k per config
+
+# --- CHECKPOINTS (--checkpoint / --resume) ---
+CHECKPOINT_SECONDS = 60   # Save progress at most this often
+
 # --- DUNGEON STRUCTURE ---
 FLOORS_TO_WIN = 3
 
@@ -45,40 +78,32 @@ PLAYER_BASE = {
 }
 
 # --- STARTER WEAPONS (all enabled for balance test) ---
+# Base stats (damage type, damage, speed, range) come from js/data; the
+# on-hit mechanics and stat scaling are the simulator's own
 STARTER_WEAPONS = {
-    'Rusty Sword': {
-        'damageType': 'blade',
-        'damage': 7,
-        'speed': 0.8,               # 560ms - very fast melee
-        'stat_scaling': 'str',
-        'bleed_chance': 0.20,       # 20% chance to inflict bleed (buffed)
-        'bleed_dot': 0.07,          # 7% of max HP per second (buffed)
-        'bleed_duration': 50        # 5 seconds (50 ticks)
-    },
-    'Iron Mace': {
-        'damageType': 'blunt',
-        'damage': 10.5,             # High damage per hit
-        'speed': 1.1,               # 770ms - slow but powerful
-        'stat_scaling': 'str',
-        'stun_chance': 0.20,        # 20% chance to stun
-        'stun_duration': 10         # 1 second (10 ticks)
-    },
-    'Wooden Spear': {
-        'damageType': 'pierce',
-        'damage': 7,
-        'speed': 1.1,               # 770ms - balanced
-        'stat_scaling': 'str',
-        'range': 2,                 # Can attack from 2 tiles
-        'crit_bonus': 0.05          # +5% crit chance (reduced)
-    },
-    'Short Bow': {
-        'damageType': 'pierce',
-        'damage': 5.0,
-        'speed': 0.92,              # 644ms - moderate speed
-        'stat_scaling': 'agi',
-        'ranged': True,
-        'range': 4
-    },
+    'Rusty Sword': game_data.weapon(
+        'rusty_sword',
+        stat_scaling='str',
+        bleed_chance=0.20,          # 20% chance to inflict bleed (buffed)
+        bleed_dot=0.07,             # 7% of max HP per second (buffed)
+        bleed_duration=50           # 5 seconds (50 ticks)
+    ),
+    'Iron Mace': game_data.weapon(
+        'iron_mace',
+        stat_scaling='str',
+        stun_chance=0.20,           # 20% chance to stun
+        stun_duration=10            # 1 second (10 ticks)
+    ),
+    'Wooden Spear': game_data.weapon(
+        'wooden_spear',
+        stat_scaling='str',
+        crit_bonus=0.05             # +5% crit chance (reduced)
+    ),
+    'Short Bow': game_data.weapon(
+        'shortbow',
+        stat_scaling='agi',
+        ranged=True
+    ),
 }
 
 # --- RANGE CONFIG ---
@@ -133,46 +158,9 @@ AGI_CONFIG = {
     'crit_multiplier': 3.0         # 300% damage on crit (was 1.5)
 }
 
-# --- WEAPON VS ARMOR MATRIX ---
+# --- WEAPON VS ARMOR MATRIX (js/data/weapon-armor-matrix.js) ---
 # Modifiers: +0.30 (strong), 0 (neutral), -0.30 (weak)
-WEAPON_ARMOR_MATRIX = {
-    'blade': {
-        'unarmored': 0.30,   # Blades excel vs unprotected flesh
-        'hide': 0.0,         # Neutral vs tough skin
-        'scaled': 0.0,       # Neutral vs natural plates
-        'armored': -0.30,    # Poor vs metal plate
-        'stone': -0.30,      # Poor vs rock
-        'bone': 0.0,         # Neutral vs skeletal
-        'ethereal': 0.0      # Neutral vs incorporeal
-    },
-    'blunt': {
-        'unarmored': 0.0,    # Neutral vs flesh
-        'hide': 0.0,         # Neutral vs tough skin
-        'scaled': 0.0,       # Neutral vs natural plates
-        'armored': 0.30,     # Excellent vs metal (dents/crushes)
-        'stone': 0.30,       # Excellent vs rock (shatters)
-        'bone': 0.30,        # Excellent vs skeletal (breaks)
-        'ethereal': -0.30    # Poor vs incorporeal
-    },
-    'pierce': {
-        'unarmored': 0.0,    # Neutral vs flesh
-        'hide': 0.30,        # Excellent vs tough skin (penetrates)
-        'scaled': 0.30,      # Excellent vs plates (finds gaps)
-        'armored': -0.30,    # Poor vs solid metal
-        'stone': -0.30,      # Poor vs solid rock
-        'bone': 0.0,         # Neutral vs skeletal
-        'ethereal': 0.30     # Excellent vs spirits (anchors)
-    },
-    'magic': {
-        'unarmored': 0.0,    # Magic ignores physical armor
-        'hide': 0.0,
-        'scaled': 0.0,
-        'armored': 0.0,      # Bypasses physical armor
-        'stone': 0.0,
-        'bone': 0.0,
-        'ethereal': 0.30     # Good vs spirits
-    }
-}
+WEAPON_ARMOR_MATRIX = game_data.weapon_armor_matrix()
 
 # --- ECONOMY ---
 DROP_CHANCE = 40  # 40% chance per kill
@@ -182,54 +170,238 @@ LOOT_TABLE = {
     'gear':   {'weight': 10, 'heal': 60}
 }
 
-# --- MONSTERS (balanced armor distribution: 33% each type) ---
-# Unarmored: 33% | Bone: 33% | Hide: 33%
-SPAWN_POOL = {
-    'Flame Bat':        {'weight': 11, 'xp': 15},   # unarmored
-    'Magma Slime':      {'weight': 11, 'xp': 25},   # unarmored
-    'Cave Bat':         {'weight': 11, 'xp': 10},   # unarmored
-    'Skeletal Warrior': {'weight': 33, 'xp': 28},   # bone
-    'Shadow Stalker':   {'weight': 33, 'xp': 42}    # hide
+# --- MONSTERS (js/data/monsters-data.js, the full bestiary) ---
+# Spawn weights are the game's relative spawnWeight, as in getRandomMonster().
+# moveSpeed: ticks to move 1 tile (lower = faster)
+SPAWN_POOL = game_data.spawn_pool()
+MONSTER_STATS = game_data.monster_stats()
+
+# --- TIERED SPAWNING (js/generation/enemy-spawner.js) ---
+# With TIERED_SPAWNS each room rolls its monsters the way selectMonsterForRoom()
+# does: a monster weighs its tier's share for the room's difficulty bracket,
+# shifted towards stronger tiers on deeper floors. Tiers are MONSTER_DATA's
+# own (see game_data.DEFAULT_TIER); none is set yet, so every monster is
+# TIER_3 like in the game, the tier shares cancel out and each room draws
+# uniformly from the bestiary (the spawner ignores spawnWeight too).
+# Deviations from the game: its room difficulty is the room's distance from
+# the entrance (blob.difficulty, 1-10), approximated here by the room's
+# position in the floor (1 at the first room, 10 at the last); rooms have no
+# element or theme here, so those multipliers are left out. Without
+# TIERED_SPAWNS every room draws from the SPAWN_POOL spawnWeights instead.
+TIERED_SPAWNS = True
+SPAWN_TIER_WEIGHTS = game_data.tier_weights()
+SPAWN_BRACKETS = {'near': 3, 'mid': 6, 'far': 10}  # Highest room difficulty of each bracket
+SPAWN_TIER_RULES = {
+    'floor_shift': 0.03,     # Weight moved off TIER_3 per floor past the first
+    'max_shift': 0.15,       # ...up to this much
+    'tier_1_share': 0.6,     # Share of the shift that goes to TIER_1 (the rest to ELITE)
+    'min_tier_3': 0.1,
+    'max_elite': 0.2,
+    'unweighted': 0.1        # Weight of a tier the bracket gives none (the spawner's `|| 0.1`)
 }
 
-MONSTER_STATS = {
-    # moveSpeed: ticks to move 1 tile (lower = faster)
-    # Bow attacks every 6 ticks, needs 3 tiles to close. For 1.5 free attacks: 9 ticks / 3 tiles = 3 ticks/tile
-    'Flame Bat':        {'hp': 40, 'str': 10, 'pDef': 4,  'atkSpeed': 1.2, 'armor': 'unarmored', 'moveSpeed': 3},   # Fast flyer
-    'Cave Bat':         {'hp': 25, 'str': 6,  'pDef': 2,  'atkSpeed': 1.0, 'armor': 'unarmored', 'moveSpeed': 3},   # Fast flyer
-    'Magma Slime':      {'hp': 60, 'str': 12, 'pDef': 15, 'atkSpeed': 2.5, 'armor': 'unarmored', 'moveSpeed': 5},   # Slow crawler (~2.5 free attacks)
-    'Skeletal Warrior': {'hp': 40, 'str': 11, 'pDef': 10, 'atkSpeed': 1.8, 'armor': 'bone', 'moveSpeed': 4},        # Medium (~2 free attacks)
-    'Shadow Stalker':   {'hp': 45, 'str': 15, 'pDef': 6,  'atkSpeed': 1.0, 'armor': 'hide', 'moveSpeed': 3}         # Fast predator (~1.5 free attacks)
-}
+# ==============================================================================
+# SIMULATION CONFIG
+# ==============================================================================
 
-WEAPON_MATRIX = {
-    'blade': {'unarmored': 1.3, 'hide': 1.0, 'bone': 1.0},
-    'pierce': {'unarmored': 1.0, 'hide': 1.3, 'bone': 1.0},
-    'blunt': {'unarmored': 1.0, 'hide': 1.0, 'bone': 1.3}
-}
+# The game constants above, in the order they're compiled into a SimConfig
+CONFIG_NAMES = (
+    'FLOORS_TO_WIN', 'FLOOR_CONFIG', 'ALTAR_INTERVAL', 'SKIP_COMBAT_CHANCE', 'SKIP_PENALTY_XP',
+    'NAV_TIME_PER_ROOM', 'TICK_DURATION', 'FLOOR_SCALING', 'FLOOR_SCALING_CAP', 'XP_THRESHOLDS',
+    'PLAYER_BASE', 'STARTER_WEAPONS', 'RANGE_CONFIG', 'STAT_STRATEGIES', 'STRATEGY_WEIGHTS',
+    'AGI_CONFIG', 'WEAPON_ARMOR_MATRIX', 'DROP_CHANCE', 'LOOT_TABLE', 'SPAWN_POOL',
+    'MONSTER_STATS', 'TIERED_SPAWNS', 'SPAWN_TIER_WEIGHTS', 'SPAWN_BRACKETS', 'SPAWN_TIER_RULES',
+)
+
+def config_constants():
+    """The constants a SimConfig is compiled from, by name"""
+    return {name: globals()[name] for name in CONFIG_NAMES}
+
+class SimConfig:
+    """
+    Immutable, precompiled simulation config.
+
+    Compiled from the constants above plus optional overrides (parsed
+    NAME.key=value pairs, see sim_engine.parse_override()). Every constant
+    is available as a lower-case attribute holding a frozen copy
+    (cfg.agi_config, cfg.monster_stats, ...), and the values the engine
+    would otherwise recompute on every call are derived once here: floor
+    scaling factors, weapon/armor modifiers, per-strategy level gains, alias
+    samplers for strategy and loot rolls, per-floor spawn tables, attack and
+    move tick intervals.
+
+    The engine functions take a config argument instead of reading the
+    module constants, so any number of configs can run side by side in one
+    process. Configs hash by identity, which is what the matchup caches key
+    on. They pickle as their overrides and are recompiled on the other side.
+    """
+
+    def __init__(self, overrides=()):
+        values = engine.override_values(config_constants(), overrides)
+        fields = {name.lower(): freeze(value) for name, value in values.items()}
+        fields['overrides'] = tuple(overrides)
+
+        # Floor multipliers for every floor a run can reach; see floor_multiplier()
+        last_floor = max(values['FLOORS_TO_WIN'], max(values['FLOOR_CONFIG']))
+        fields['floor_multipliers'] = tuple(
+            engine.floor_multiplier(floor, values['FLOOR_SCALING'], values['FLOOR_SCALING_CAP'])
+            for floor in range(last_floor + 1))
+        fields['floor_rooms'] = MappingProxyType({
+            floor: fields['floor_config'].get(floor, fields['floor_config'][max(values['FLOOR_CONFIG'])])
+            for floor in range(1, last_floor + 1)})
+
+        # Stat gains per level of each strategy, as sim_engine.check_level_up() takes them
+        fields['level_gains'] = MappingProxyType({
+            name: MappingProxyType({stat: strategy[stat] for stat in ('str', 'agi', 'pDef')})
+            for name, strategy in values['STAT_STRATEGIES'].items()})
+
+        fields['armor_mods'] = MappingProxyType({
+            (damage_type, armor): mod
+            for damage_type, mods in values['WEAPON_ARMOR_MATRIX'].items()
+            for armor, mod in mods.items()})
+
+        # Weighted rolls. Strategy weights are percentages with a fallback for
+        # whatever they leave of 100; spawn and loot weights are relative
+        fields['spawn_sampler'] = AliasSampler({n: d['weight'] for n, d in values['SPAWN_POOL'].items()})
+        fields['strategy_sampler'] = AliasSampler(percent_weights(values['STRATEGY_WEIGHTS'], 'split'))
+        fields['loot_sampler'] = AliasSampler({i: d['weight'] for i, d in values['LOOT_TABLE'].items()})
+        fields['spawn_xp'] = MappingProxyType({n: d['xp'] for n, d in values['SPAWN_POOL'].items()})
+
+        # Spawn tables: each floor's rooms point at the sampler of their
+        # difficulty bracket on that floor, built once per (floor, bracket)
+        samplers = {}
+        spawn_tables = {}
+        for floor, settings in fields['floor_rooms'].items():
+            rooms = []
+            for room in range(1, settings['rooms'] + 1):
+                bracket = spawn_bracket(room_difficulty(room, settings['rooms']), values['SPAWN_BRACKETS'])
+                if not values['TIERED_SPAWNS']:
+                    bracket = None
+                if (floor, bracket) not in samplers:
+                    samplers[(floor, bracket)] = fields['spawn_sampler'] if bracket is None else \
+                        AliasSampler(tiered_spawn_weights(values, bracket, floor))
+                rooms.append(samplers[(floor, bracket)])
+            spawn_tables[floor] = tuple(rooms)
+        fields['spawn_tables'] = MappingProxyType(spawn_tables)
+
+        # Attack and move intervals in ticks
+        range_config = values['RANGE_CONFIG']
+        fields['weapon_ticks'] = MappingProxyType({
+            w: int(7 * weapon.get('speed', 1.0)) for w, weapon in values['STARTER_WEAPONS'].items()})
+        fields['monster_ticks'] = MappingProxyType({
+            m: int(7 * stats['atkSpeed']) for m, stats in values['MONSTER_STATS'].items()})
+        fields['move_ticks'] = MappingProxyType({
+            m: stats.get('moveSpeed', range_config['default_move_speed'])
+            for m, stats in values['MONSTER_STATS'].items()})
+
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SimConfig is immutable; use with_overrides()")
+
+    def __reduce__(self):
+        return (compile_config, (self.overrides,))
+
+    def pooled(self, rng):
+        """
+        Copy of this config whose spawn, strategy and loot rolls come from
+        DrawPools on the NumPy Generator rng, one pool per sampler, for runs
+        advancing in lockstep (--batch). Not for pickling: it pickles as
+        the plain config.
+        """
+        pools = {}
+
+        def pool(sampler):
+            if id(sampler) not in pools:
+                pools[id(sampler)] = DrawPool(sampler, rng)
+            return pools[id(sampler)]
+
+        copy = object.__new__(SimConfig)
+        copy.__dict__.update(self.__dict__)
+        for name in ('spawn_sampler', 'strategy_sampler', 'loot_sampler'):
+            object.__setattr__(copy, name, pool(getattr(self, name)))
+        object.__setattr__(copy, 'spawn_tables', MappingProxyType({
+            floor: tuple(pool(sampler) for sampler in rooms) for floor, rooms in self.spawn_tables.items()}))
+        return copy
+
+    def with_overrides(self, overrides):
+        """A new config with further overrides applied on top of this one's"""
+        return compile_config(self.overrides + tuple(overrides))
+
+    def floor_multiplier(self, floor):
+        """Monster stat multiplier for a floor"""
+        if 0 <= floor < len(self.floor_multipliers):
+            return self.floor_multipliers[floor]
+        return engine.floor_multiplier(floor, self.floor_scaling, self.floor_scaling_cap)
+
+    def spawn_table(self, floor, room):
+        """Spawn sampler of a floor's room-th room (1-based); see spawn_enemy()"""
+        rooms = self.spawn_tables.get(floor) or self.spawn_tables[max(self.spawn_tables)]
+        return rooms[min(room, len(rooms)) - 1]
+
+    def floor_settings(self, floor):
+        """FLOOR_CONFIG entry of a floor; floors past the table reuse its last entry"""
+        if floor in self.floor_rooms:
+            return self.floor_rooms[floor]
+        return self.floor_config[max(self.floor_config)]
+
+def room_difficulty(room, rooms):
+    """
+    Difficulty (1-10) of the room-th of rooms rooms. The game sets it from
+    the room's distance from the entrance; rooms are visited in order here,
+    so their position stands in for the distance.
+    """
+    return 1 + 9 * (room - 1) // max(1, rooms - 1)
+
+def spawn_bracket(difficulty, brackets):
+    """The SPAWN_BRACKETS bracket a room difficulty falls in"""
+    for bracket, top in brackets.items():
+        if difficulty <= top:
+            return bracket
+    return bracket
+
+def floor_tier_weights(weights, floor, rules):
+    """A bracket's tier weights on a floor, as getTierWeightsForDifficulty() shifts them"""
+    if floor <= 1:
+        return dict(weights)
+    shift = min(rules['max_shift'], (floor - 1) * rules['floor_shift'])
+    return dict(weights,
+                TIER_3=max(rules['min_tier_3'], weights['TIER_3'] - shift),
+                TIER_1=weights['TIER_1'] + shift * rules['tier_1_share'],
+                ELITE=min(rules['max_elite'], weights['ELITE'] + shift * (1 - rules['tier_1_share'])))
+
+def tiered_spawn_weights(values, bracket, floor):
+    """Relative spawn weight of every monster in a bracket's rooms on a floor"""
+    rules = values['SPAWN_TIER_RULES']
+    tiers = floor_tier_weights(values['SPAWN_TIER_WEIGHTS'][bracket], floor, rules)
+    return {name: tiers.get(stats.get('tier', game_data.DEFAULT_TIER)) or rules['unweighted']
+            for name, stats in values['MONSTER_STATS'].items()}
+
+def compile_config(overrides=()):
+    """SimConfig for a set of overrides; the shared default when there are none"""
+    if not overrides:
+        return DEFAULT_CONFIG
+    return SimConfig(overrides)
+
+DEFAULT_CONFIG = SimConfig()
 
 # ==============================================================================
 # HELPER FUNCTIONS
 # ==============================================================================
 
-def apply_floor_scaling(base_stat, floor):
+def apply_floor_scaling(base_stat, floor, cfg=DEFAULT_CONFIG):
     """Apply floor scaling to a stat"""
-    return base_stat * min(FLOOR_SCALING_CAP, 1.0 + (floor - 1) * FLOOR_SCALING)
-
-def select_strategy():
-    """Select a stat allocation strategy based on weights"""
-    roll = random.uniform(0, 100)
-    cum = 0
-    for strat_name, weight in STRATEGY_WEIGHTS.items():
-        cum += weight
-        if roll <= cum:
-            return strat_name
-    return 'split'  # Default
-
-def create_player(weapon_name, strategy='split'):
+    return base_stat * cfg.floor_multiplier(floor)
+
+def select_strategy(cfg=DEFAULT_CONFIG):
+    """Select a stat allocation strategy based on weights (unassigned share goes to split)"""
+    return cfg.strategy_sampler.draw()
+
+def create_player(weapon_name, strategy='split', cfg=DEFAULT_CONFIG):
     """Create a new player with the specified weapon and stat strategy"""
-    player = PLAYER_BASE.copy()
-    weapon = STARTER_WEAPONS[weapon_name]
+    player = dict(cfg.player_base)
+    weapon = cfg.starter_weapons[weapon_name]
     player['weapon_name'] = weapon_name
     player['weapon'] = weapon
     player['agi'] = 8  # Base agility
@@ -237,29 +409,27 @@ def create_player(weapon_name, strategy='split'):
     player['arrows'] = 99  # Plenty of arrows for ranged weapons
     return player
 
-def get_weapon_armor_modifier(damage_type, armor_type):
+def get_weapon_armor_modifier(damage_type, armor_type, cfg=DEFAULT_CONFIG):
     """Get damage modifier from weapon vs armor matchup"""
-    if damage_type not in WEAPON_ARMOR_MATRIX:
-        return 0.0
-    return WEAPON_ARMOR_MATRIX[damage_type].get(armor_type, 0.0)
-
-def roll_hit(attacker_agi, defender_agi):
-    """Roll to hit based on AGI difference"""
-    hit_chance = AGI_CONFIG['base_hit_chance']
-    hit_chance += attacker_agi * AGI_CONFIG['hit_per_agi']
-    hit_chance -= defender_agi * AGI_CONFIG['evasion_per_agi']
-    hit_chance = max(AGI_CONFIG['min_hit_chance'], min(AGI_CONFIG['max_hit_chance'], hit_chance))
-    return random.random() < hit_chance
-
-def roll_crit(attacker_agi, crit_bonus=0):
-    """Roll for critical hit based on AGI + weapon bonus"""
-    crit_chance = AGI_CONFIG['base_crit_chance']
-    crit_chance += attacker_agi * AGI_CONFIG['crit_per_agi']
+    return cfg.armor_mods.get((damage_type, armor_type), 0.0)
+
+def get_hit_chance(attacker_agi, defender_agi, cfg=DEFAULT_CONFIG):
+    """Hit chance based on AGI difference"""
+    agi = cfg.agi_config
+    hit_chance = agi['base_hit_chance']
+    hit_chance += attacker_agi * agi['hit_per_agi']
+    hit_chance -= defender_agi * agi['evasion_per_agi']
+    return max(agi['min_hit_chance'], min(agi['max_hit_chance'], hit_chance))
+
+def get_crit_chance(attacker_agi, crit_bonus=0, cfg=DEFAULT_CONFIG):
+    """Crit chance based on AGI + weapon bonus"""
+    agi = cfg.agi_config
+    crit_chance = agi['base_crit_chance']
+    crit_chance += attacker_agi * agi['crit_per_agi']
     crit_chance += crit_bonus  # Weapon-specific crit bonus (e.g., pierce +10%)
-    crit_chance = min(AGI_CONFIG['max_crit_chance'], crit_chance)
-    return random.random() < crit_chance
+    return min(agi['max_crit_chance'], crit_chance)
 
-def get_damage(attacker, defender, is_player, floor=1):
+def get_damage(attacker, defender, is_player, floor=1, cfg=DEFAULT_CONFIG):
     """Calculate damage with floor scaling for monsters"""
     if is_player:
         weapon = attacker['weapon']
@@ -279,57 +449,24 @@ def get_damage(attacker, defender, is_player, floor=1):
             base += attacker.get('agi', 8) * 0.15
 
         # Apply weapon vs armor modifier
-        armor_mod = get_weapon_armor_modifier(weapon['damageType'], defender['armor'])
-        base *= (1.0 + armor_mod)
+        armor_mod = get_weapon_armor_modifier(weapon['damageType'], defender['armor'], cfg)
+        damage = engine.player_damage(base, 1.0 + armor_mod, defender['pDef'])
     else:
-        scaled_str = apply_floor_scaling(attacker['str'], floor)
-        base = (scaled_str * 0.5) + (scaled_str / 5.0)
-
-    def_val = min(defender['pDef'], 50)
-    def_mod = max(0.25, 1.0 - (def_val * 0.015))
-    return max(1, int(base * def_mod))  # No variance for exact damage
-
-def check_potion(p):
-    """Use potion if HP is low"""
-    if p['hp'] < 40 and p['potions'] > 0:
-        p['hp'] = min(p['max_hp'], p['hp'] + p['potion_heal'])
-        p['potions'] -= 1
-        return True
-    return False
-
-def check_level_up(p):
-    """Check and apply level up using player's stat strategy"""
-    leveled = False
-    strategy = STAT_STRATEGIES.get(p.get('strategy', 'split'), STAT_STRATEGIES['split'])
-
-    while True:
-        next_lvl = p['level'] + 1
-        if next_lvl in XP_THRESHOLDS and p['xp'] >= XP_THRESHOLDS[next_lvl]:
-            p['level'] = next_lvl
-            p['max_hp'] += 10
-            p['hp'] = p['max_hp']  # Full Heal
-            # Apply stat gains based on strategy
-            p['str'] += strategy['str']
-            p['agi'] += strategy['agi']
-            p['pDef'] += strategy['pDef']
-            leveled = True
-        else:
-            break
-    return leveled
-
-def spawn_enemy():
-    """Spawn a random enemy based on weights"""
-    roll = random.uniform(0, 100)
-    cum = 0
-    for name, data in SPAWN_POOL.items():
-        cum += data['weight']
-        if roll <= cum:
-            return name
-    return 'Flame Bat'
-
-def fight(p, m_name, floor=1):
+        damage = engine.monster_damage(attacker['str'], cfg.floor_multiplier(floor), defender['pDef'])
+    return max(1, int(damage))  # No variance for exact damage
+
+def check_level_up(p, cfg=DEFAULT_CONFIG):
+    """Check and apply level ups with the stat gains of the player's strategy"""
+    gains = cfg.level_gains.get(p.get('strategy', 'split'), cfg.level_gains['split'])
+    return engine.check_level_up(p, cfg.xp_thresholds, gains)
+
+def spawn_enemy(floor=1, room=1, cfg=DEFAULT_CONFIG):
+    """Spawn a random enemy for a room, from its tiered spawn table (see TIERED_SPAWNS)"""
+    return cfg.spawn_table(floor, room).draw()
+
+def fight(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
     """
-    Simulate a fight between player and monster with range mechanics.
+    Simulate a fight between player and monster with sim_engine.fight().
     Returns: (ticks, dmg_dealt, dmg_taken, won)
 
     Mechanics:
@@ -338,142 +475,76 @@ def fight(p, m_name, floor=1):
     - Bleed (blade): 15% chance to inflict 5% HP/sec DoT for 5 seconds
     - Crit bonus (pierce): +10% crit chance
     """
-    m_stats = MONSTER_STATS[m_name].copy()
-    m_hp = int(apply_floor_scaling(m_stats['hp'], floor))
-    m_max_hp = m_hp  # Store max HP for bleed calculation
-    m_stats['pDef'] = int(apply_floor_scaling(m_stats['pDef'], floor))
-    m_agi = m_stats.get('agi', 8)  # Monster AGI (default 8)
-
-    # Player attack speed based on weapon
-    weapon = p['weapon']
-    weapon_speed = weapon.get('speed', 1.0)
-    p_ticks = int(7 * weapon_speed)  # Lower = faster attacks
-    m_ticks = int(7 * m_stats['atkSpeed'])
-
-    # Range mechanics
-    distance = RANGE_CONFIG['starting_distance']
-    weapon_range = weapon.get('range', 1)  # Melee = 1, ranged = higher
-    m_move_ticks = m_stats.get('moveSpeed', RANGE_CONFIG['default_move_speed'])
-
-    # Status effects
-    stun_remaining = 0      # Ticks monster is stunned
-    bleed_remaining = 0     # Ticks of bleed remaining
-    bleed_dot = 0           # Damage per tick from bleed
-
-    tick = 0
-    total_dmg_dealt = 0
-    total_dmg_taken = 0
-
-    while p['hp'] > 0 and m_hp > 0:
-        tick += 1
-
-        # Apply bleed damage (every 10 ticks = 1 second)
-        if bleed_remaining > 0:
-            bleed_remaining -= 1
-            if tick % 10 == 0:  # Apply bleed damage once per second
-                bleed_dmg = int(m_max_hp * bleed_dot)
-                m_hp -= bleed_dmg
-                total_dmg_dealt += bleed_dmg
-
-        # Decrement stun
-        if stun_remaining > 0:
-            stun_remaining -= 1
-
-        # Monster movement (closes distance) - blocked by stun
-        if stun_remaining == 0 and distance > RANGE_CONFIG['melee_range'] and tick % m_move_ticks == 0:
-            distance -= 1
-
-        # Player attack (check range)
-        can_player_attack = distance <= weapon_range
-        if can_player_attack and tick % p_ticks == 0:
-            # Roll hit (player AGI vs monster AGI)
-            if roll_hit(p['agi'], m_agi):
-                dmg = get_damage(p, m_stats, True)
-                # Roll crit (with weapon crit bonus)
-                crit_bonus = weapon.get('crit_bonus', 0)
-                if roll_crit(p['agi'], crit_bonus):
-                    dmg = int(dmg * AGI_CONFIG['crit_multiplier'])
-                m_hp -= dmg
-                total_dmg_dealt += dmg
-
-                # Roll stun (blunt weapons)
-                if weapon.get('stun_chance', 0) > 0 and random.random() < weapon['stun_chance']:
-                    stun_remaining = weapon.get('stun_duration', 10)
-
-                # Roll bleed (blade weapons) - resets timer, doesn't stack
-                if weapon.get('bleed_chance', 0) > 0 and random.random() < weapon['bleed_chance']:
-                    bleed_remaining = weapon.get('bleed_duration', 50)
-                    bleed_dot = weapon.get('bleed_dot', 0.05)
-            # Miss: no damage dealt
-
-        # Monster attack (only in melee range, blocked by stun)
-        can_monster_attack = distance <= RANGE_CONFIG['melee_range'] and stun_remaining == 0
-        if m_hp > 0 and can_monster_attack and tick % m_ticks == 0:
-            # Roll hit (monster AGI vs player AGI)
-            if roll_hit(m_agi, p['agi']):
-                dmg = get_damage(m_stats, p, False, floor)
-                # Monsters cannot crit (player-only mechanic)
-                p['hp'] -= dmg
-                total_dmg_taken += dmg
-                check_potion(p)
-            # Miss: no damage taken
-
-    won = p['hp'] > 0
-    return (tick, total_dmg_dealt, total_dmg_taken, won)
-
-def drop_loot(inventory):
-    """Roll for loot drop"""
-    if random.uniform(0, 100) > DROP_CHANCE:
-        return None
-    roll = random.uniform(0, 100)
-    if roll < 60:
-        item = 'junk'
-    elif roll < 90:
-        item = 'trophy'
-    else:
-        item = 'gear'
-    inventory.append(item)
-    return item
-
-def visit_altar(p, inventory):
-    """Sacrifice items at altar for HP"""
-    if p['hp'] >= p['max_hp'] or not inventory:
-        return (0, 0)
-
-    sacrifices = 0
-    hp_restored = 0
-    inventory.sort(key=lambda x: LOOT_TABLE[x]['heal'])
-    items_to_remove = []
-
-    for item in inventory:
-        if p['hp'] >= p['max_hp']:
-            break
-        heal_val = LOOT_TABLE[item]['heal']
-        actual_heal = min(heal_val, p['max_hp'] - p['hp'])
-        p['hp'] = min(p['max_hp'], p['hp'] + heal_val)
-        items_to_remove.append(item)
-        sacrifices += 1
-        hp_restored += actual_heal
-
-    for item in items_to_remove:
-        inventory.remove(item)
-    return (sacrifices, hp_restored)
-
-def percentile(data, p):
-    """Get percentile value from sorted data"""
-    if not data:
-        return 0
-    idx = int(len(data) * p)
-    return data[min(idx, len(data) - 1)]
+    # Everything but HP is fixed for the whole fight (no damage variance),
+    # so the per-matchup constants come from the same cache the batch engine uses
+    return engine.fight(p, matchup_params(p['weapon_name'], p['str'], p['agi'], p['pDef'], m_name, floor, cfg))
+
+def fight_by_tick(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """Reference tick-by-tick version of fight(), see sim_engine.fight_by_tick()"""
+    return engine.fight_by_tick(p, matchup_params(p['weapon_name'], p['str'], p['agi'], p['pDef'],
+                                                  m_name, floor, cfg))
+
+def bound_fight(cfg=DEFAULT_CONFIG):
+    """fight() on one config, as the fight_fn the sim_engine run drivers take"""
+    if cfg is DEFAULT_CONFIG:
+        return fight
+    return functools.partial(fight, cfg=cfg)
+
+def fight_matchup(p, m_name, floor=1, cfg=DEFAULT_CONFIG):
+    """
+    The matchup fight() resolves, as batch_combat.drive_lockstep() takes it.
+    Damage has no variance here, so each hit's damage is fixed up front.
+    """
+    return matchup_params(p['weapon_name'], p['str'], p['agi'], p['pDef'], m_name, floor, cfg)
+
+@functools.lru_cache(maxsize=MATCHUP_CACHE_SIZE)
+def matchup_params(weapon_name, p_str, p_agi, p_pdef, m_name, floor, cfg=DEFAULT_CONFIG):
+    """
+    The part of a fight that only depends on stats, not on HP.
+    Player stats only move on level-ups, so the cache holds one entry per
+    (weapon, level stats, monster, floor) a run can reach.
+    """
+    m_stats = dict(cfg.monster_stats[m_name])
+    m_hp = int(apply_floor_scaling(m_stats['hp'], floor, cfg))
+    m_stats['pDef'] = int(apply_floor_scaling(m_stats['pDef'], floor, cfg))
+    m_agi = m_stats.get('agi', 8)
+    weapon = cfg.starter_weapons[weapon_name]
+    p = {'weapon': weapon, 'str': p_str, 'agi': p_agi, 'pDef': p_pdef}
+
+    return engine.matchup(
+        m_hp=m_hp,
+        p_raw=get_damage(p, m_stats, True, cfg=cfg),
+        m_raw=get_damage(m_stats, p, False, floor, cfg),
+        p_hit=get_hit_chance(p_agi, m_agi, cfg),
+        m_hit=get_hit_chance(m_agi, p_agi, cfg),
+        p_crit=get_crit_chance(p_agi, weapon.get('crit_bonus', 0), cfg),
+        crit_mult=cfg.agi_config['crit_multiplier'],
+        p_ticks=cfg.weapon_ticks[weapon_name],
+        m_ticks=cfg.monster_ticks[m_name],
+        move_ticks=cfg.move_ticks[m_name],
+        p_range=weapon.get('range', 1),
+        distance=cfg.range_config['starting_distance'],
+        melee_range=cfg.range_config['melee_range'],
+        stun_chance=weapon.get('stun_chance', 0),
+        stun_duration=weapon.get('stun_duration', 10),
+        bleed_chance=weapon.get('bleed_chance', 0),
+        bleed_duration=weapon.get('bleed_duration', 50),
+        bleed_pulse=int(m_hp * weapon.get('bleed_dot', 0.05)),
+        variance=0.0
+    )
 
 # ==============================================================================
 # FLOOR SIMULATION
 # ==============================================================================
 
-def run_floor(player, floor_num, inventory, analytics):
+def run_floor(player, floor_num, inventory, analytics, cfg=DEFAULT_CONFIG):
     """
     Simulate traversing a single floor to reach exit.
 
+    Generator: yields (player, enemy, floor) for every fight and expects the
+    fight() result tuple to be sent back, so fights can be resolved one at a
+    time (resolve_fights) or batched across many runs (batch_combat).
+
     Returns: {
         'result': 'exit_reached' | 'death',
         'room': room number where outcome occurred,
@@ -483,7 +554,10 @@ def run_floor(player, floor_num, inventory, analytics):
         'fights_skipped': number of fights player chose to skip
     }
     """
-    config = FLOOR_CONFIG.get(floor_num, FLOOR_CONFIG[max(FLOOR_CONFIG.keys())])
+    config = cfg.floor_settings(floor_num)
+    altar_interval = cfg.altar_interval
+    skip_chance = cfg.skip_combat_chance
+    spawn_xp = cfg.spawn_xp
 
     kills = 0
     fights_skipped = 0
@@ -493,7 +567,7 @@ def run_floor(player, floor_num, inventory, analytics):
         rooms_since_altar += 1
 
         # Check if this room has an altar (every ALTAR_INTERVAL rooms)
-        has_altar = (rooms_since_altar >= ALTAR_INTERVAL)
+        has_altar = (rooms_since_altar >= altar_interval)
 
         # Determine if room is empty
         is_empty = random.random() < config['empty_room_chance']
@@ -503,10 +577,10 @@ def run_floor(player, floor_num, inventory, analytics):
             enemy_count = random.randint(*config['enemies_per_room'])
 
             for enemy_idx in range(enemy_count):
-                enemy = spawn_enemy()
+                enemy = spawn_enemy(floor_num, room, cfg)
 
                 # Player might skip combat (configurable behavior)
-                if SKIP_COMBAT_CHANCE > 0 and random.random() < SKIP_COMBAT_CHANCE:
+                if skip_chance > 0 and random.random() < skip_chance:
                     fights_skipped += 1
                     continue
 
@@ -514,7 +588,7 @@ def run_floor(player, floor_num, inventory, analytics):
                 hp_before = player['hp']
 
                 # Fight!
-                ticks, dmg_dealt, dmg_taken, won = fight(player, enemy, floor_num)
+                ticks, dmg_dealt, dmg_taken, won = yield (player, enemy, floor_num)
 
                 # Update analytics
                 analytics['monster_fights'][enemy] += 1
@@ -539,15 +613,15 @@ def run_floor(player, floor_num, inventory, analytics):
                 analytics['monster_killed'][enemy] += 1
 
                 # Award XP and check level up
-                player['xp'] += SPAWN_POOL[enemy]['xp']
-                check_level_up(player)
+                player['xp'] += spawn_xp[enemy]
+                check_level_up(player, cfg)
 
                 # Drop loot
-                drop_loot(inventory)
+                engine.drop_loot(inventory, cfg.drop_chance, cfg.loot_sampler)
 
         # Visit altar if available
         if has_altar:
-            sacrificed, restored = visit_altar(player, inventory)
+            sacrificed, restored = engine.visit_altar(player, inventory, cfg.loot_table)
             if sacrificed > 0:
                 analytics['altar_visits'] += 1
                 analytics['total_sacrificed'] += sacrificed
@@ -555,7 +629,7 @@ def run_floor(player, floor_num, inventory, analytics):
             rooms_since_altar = 0
 
         # Track HP after room
-        analytics['hp_after_rooms'].append(player['hp'])
+        analytics['hp_after_rooms'].add(player['hp'])
 
         # Check for close call (low HP after room)
         if player['hp'] < player['max_hp'] * 0.2:
@@ -573,64 +647,623 @@ def run_floor(player, floor_num, inventory, analytics):
     }
 
 # ==============================================================================
-# MAIN SIMULATION
+# ANALYTIC RUN SOLVER
 # ==============================================================================
+#
+# A run is an absorbing Markov chain. Between fights the player is fully
+# described by (hp, xp, potions, inventory): level, stats and max HP follow
+# from xp and the strategy, and inventory is a (junk, trophy, gear) count. The
+# chain only moves forward through (floor, room, enemy), so the transient part
+# of the transition matrix is strictly block-triangular and (I - Q)^-1 reduces
+# to pushing the state distribution through one block at a time. Absorption
+# (death at a given floor/room/killer, or escape) is collected on the way.
+# HP and XP are kept on coarse grids and inventory counts are capped, so the
+# results are approximate; buckets of 1 and no caps give the exact chain but
+# are far too slow. The grids are sized so that all weapon/strategy pairs
+# solve in about twenty seconds on one core: finer HP and XP grids cost
+# minutes and move the victory rate by less than the noise of a 200k-run
+# Monte Carlo sample. --analytic solves a second time on ANALYTIC_CHECK_GRID
+# and prints the difference as the grid's error.
+#
+# Fight outcomes are solved exactly. The monster's side of a fight (its HP,
+# distance, stun and bleed) never looks at the player's HP, and the player's
+# side (HP and potions under monster hits) only depends on how many attacks
+# the monster gets in. The monster's side is a small DP; the player's side
+# is a sparse chain that every starting HP is pushed through at once, and
+# joining the two on the number of monster attack attempts gives the
+# outcome distribution.
+
+ANALYTIC_EPSILON = 1e-12   # Probability mass below this is dropped
+ANALYTIC_CACHE_SIZE = 65536
+
+# State grids for the run chain. HP and XP buckets should divide the level-up
+# steps (10 max HP, 100 XP) so full-HP and threshold states stay on the grid
+ANALYTIC_HP_BUCKET = 10
+ANALYTIC_XP_BUCKET = 50
+# Inventory is tracked as item counts; drops beyond the cap are not counted.
+# The caps matter more than the grids: 4/3/2 costs 0.2 pts of victory rate
+ANALYTIC_INVENTORY_CAPS = {'junk': 6, 'trophy': 4, 'gear': 3}
+ANALYTIC_CHECK_GRID = (10, 100)  # (HP, XP) buckets of the coarser solve the grid error is taken from
+
+@functools.lru_cache(maxsize=ANALYTIC_CACHE_SIZE)
+def monster_attempts(weapon_name, p_str, p_agi, p_pdef, m_name, floor, cfg=DEFAULT_CONFIG):
+    """
+    Distribution of the number of attacks the monster attempts before dying.
+    Walks fight()'s event ticks over states (m_hp, distance, stun_end,
+    bleed_end, attempts). Returns a tuple where entry n is the probability the
+    monster dies after exactly n attack attempts.
+    """
+    c = matchup_params(weapon_name, p_str, p_agi, p_pdef, m_name, floor, cfg)
+    p_ticks = c['p_ticks']
+    m_ticks = c['m_ticks']
+    m_move_ticks = c['move_ticks']
+    weapon_range = c['p_range']
+    melee_range = cfg.range_config['melee_range']
+    p_hit = c['p_hit']
+    m_hit_rolls = [(c['p_raw'], 1.0 - c['p_crit']), (int(c['p_raw'] * c['crit_mult']), c['p_crit'])]
+    stun_chance = c['stun_chance']
+    bleed_chance = c['bleed_chance']
+
+    # On-hit effect outcomes: (stunned, bled, prob)
+    effects = [(False, False, 1.0)]
+    if stun_chance > 0:
+        effects = [(True, b, q * stun_chance) for _, b, q in effects] + \
+                  [(False, b, q * (1 - stun_chance)) for _, b, q in effects]
+    if bleed_chance > 0:
+        effects = [(s, True, q * bleed_chance) for s, _, q in effects] + \
+                  [(s, False, q * (1 - bleed_chance)) for s, _, q in effects]
+
+    dead = defaultdict(float)
+    frontier = {0: {(c['m_hp'], c['distance'], 0, 0, 0): 1.0}}
+    while frontier:
+        tick = min(frontier)
+        for (m_hp, distance, stun_end, bleed_end, attempts), prob in frontier.pop(tick).items():
+            # Next tick where anything can happen, exactly as fight() picks it
+            monster_free = max(tick + 1, stun_end)
+            if distance > melee_range:
+                now = -(-monster_free // m_move_ticks) * m_move_ticks
+            else:
+                now = -(-monster_free // m_ticks) * m_ticks
+            if distance <= weapon_range:
+                now = min(now, (tick // p_ticks + 1) * p_ticks)
+            if bleed_end > tick:
+                pulse_tick = (tick // 10 + 1) * 10
+                if pulse_tick <= bleed_end:
+                    now = min(now, pulse_tick)
+
+            if now <= bleed_end and now % 10 == 0:
+                m_hp -= c['bleed_pulse']
+            if now >= stun_end and distance > melee_range and now % m_move_ticks == 0:
+                distance -= 1
+
+            # Branch on the player's attack
+            if distance <= weapon_range and now % p_ticks == 0:
+                branches = [(m_hp, stun_end, bleed_end, prob * (1 - p_hit))]
+                for dmg, q_dmg in m_hit_rolls:
+                    for stunned, bled, q_fx in effects:
+                        branches.append((m_hp - dmg,
+                                         now + c['stun_duration'] if stunned else stun_end,
+                                         now + c['bleed_duration'] if bled else bleed_end,
+                                         prob * p_hit * q_dmg * q_fx))
+            else:
+                branches = [(m_hp, stun_end, bleed_end, prob)]
 
-def run_simulation():
-    # ==========================================================================
-    # METRICS INITIALIZATION
-    # ==========================================================================
+            for b_hp, b_stun, b_bleed, b_prob in branches:
+                if b_prob < ANALYTIC_EPSILON:
+                    continue
+                if b_hp <= 0:
+                    dead[attempts] += b_prob
+                    continue
+                b_attempts = attempts
+                if distance <= melee_range and now >= b_stun and now % m_ticks == 0:
+                    b_attempts += 1
+                state = (b_hp, distance, b_stun if b_stun > now else 0,
+                         b_bleed if b_bleed > now else 0, b_attempts)
+                bucket = frontier.setdefault(now, {})
+                bucket[state] = bucket.get(state, 0.0) + b_prob
+
+    return tuple(dead.get(n, 0.0) for n in range(max(dead) + 1))
+
+def fight_outcomes(weapon_name, p_str, p_agi, p_pdef, max_hp, potions, m_name, floor, hp_bucket,
+                   cfg=DEFAULT_CONFIG):
+    """
+    Exact outcome of fight() for one matchup from every starting HP on the
+    hp_bucket grid (hp_bucket, 2 * hp_bucket, ... up to max_hp) and every
+    potion count.
+
+    The player's side is a chain over (hp, potions) that moves on monster
+    hits only, drinking potions the way check_potion() does. All starting
+    states are pushed through it together, one monster attack attempt at a
+    time, and joined with monster_attempts() on the number of attempts.
+    Returns (death, survived): death[h - 1, pots] is the probability of
+    dying from h buckets of HP, survived[h - 1, pots, end_hp, end_potions]
+    the probability of winning with that HP and potions left.
+    """
+    import numpy as np
+    import scipy.sparse
+
+    c = matchup_params(weapon_name, p_str, p_agi, p_pdef, m_name, floor, cfg)
+    attempts = monster_attempts(weapon_name, p_str, p_agi, p_pdef, m_name, floor, cfg)
+    m_hit = c['m_hit']
+
+    # Where a hit takes each (hp, potions) state, flattened as hp * pot_n + potions
+    pot_n = potions + 1
+    states = (max_hp + 1) * pot_n
+    hp, pots = np.divmod(np.arange(states), pot_n)
+    new_hp = hp - c['m_raw']
+    drink = (new_hp < engine.POTION_THRESHOLD) & (pots > 0)
+    new_hp = np.where(drink, np.minimum(max_hp, new_hp + cfg.player_base['potion_heal']), new_hp)
+    lives = new_hp > 0
+    dies = np.flatnonzero(~lives)
+    hit = scipy.sparse.csr_matrix(
+        (np.ones(np.count_nonzero(lives)), ((new_hp * pot_n + pots - drink)[lives], np.flatnonzero(lives))),
+        shape=(states, states))
+
+    # One column per starting state
+    starts = np.arange(hp_bucket, max_hp + 1, hp_bucket)
+    x = np.zeros((states, len(starts) * pot_n))
+    x[(starts[:, None] * pot_n + np.arange(pot_n)).ravel(), np.arange(x.shape[1])] = 1.0
+
+    # Monster alive for attempt k <=> it dies after k or more attempts
+    survived = attempts[0] * x
+    death = np.zeros(x.shape[1])
+    still_standing = sum(attempts) - attempts[0]
+    for q in attempts[1:]:
+        death += (m_hit * still_standing) * x[dies].sum(axis=0)
+        x = (1 - m_hit) * x + m_hit * (hit @ x)
+        survived += q * x
+        still_standing -= q
+    return (death.reshape(len(starts), pot_n),
+            survived.T.reshape(len(starts), pot_n, max_hp + 1, pot_n))
+
+def spawn_distribution(floor=1, room=1, cfg=DEFAULT_CONFIG):
+    """Exact probabilities of spawn_enemy() in a room"""
+    return {name: q for name, q in cfg.spawn_table(floor, room).probabilities.items() if q > 0}
+
+def strategy_distribution(cfg=DEFAULT_CONFIG):
+    """Exact probabilities of select_strategy(), including its split fallback"""
+    return {name: q for name, q in cfg.strategy_sampler.probabilities.items() if q > 0}
+
+@functools.lru_cache(maxsize=ANALYTIC_CACHE_SIZE)
+def player_at_xp(weapon_name, strategy, xp, cfg=DEFAULT_CONFIG):
+    """Player stats after earning xp from a fresh start, via check_level_up()"""
+    player = create_player(weapon_name, strategy, cfg)
+    player['xp'] = xp
+    check_level_up(player, cfg)
+    return player
 
-    # Victory tracking
-    victories = 0
-    victory_hp = []  # HP at final victory
-    victory_levels = []  # Level at victory
-    victory_times = []  # Time to complete all floors
+def snap(value, bucket):
+    """
+    Split a value between its two neighbouring grid points so the mean is
+    kept. Returns [(grid_index, weight)].
+    """
+    lo, rest = divmod(value, bucket)
+    if not rest:
+        return [(int(lo), 1.0)]
+    frac = rest / bucket
+    return [(int(lo), 1.0 - frac), (int(lo) + 1, frac)]
 
-    # Weapon-specific tracking
-    weapon_names = list(STARTER_WEAPONS.keys())
-    weapon_victories = {w: 0 for w in weapon_names}
-    weapon_deaths = {w: 0 for w in weapon_names}
-    weapon_kills = {w: 0 for w in weapon_names}
-    weapon_runs = {w: 0 for w in weapon_names}
+class RunChain:
+    """
+    Dense state distribution of one weapon/strategy run and the operators
+    that move it through rooms.
+
+    The distribution is an array indexed [xp, inventory, hp, potions]. XP and
+    HP live on grids (ANALYTIC_*_BUCKET); values between grid points are
+    split between the two neighbours, which keeps expectations unbiased.
+    The inventory axis enumerates (junk, trophy, gear) counts up to
+    ANALYTIC_INVENTORY_CAPS. grid overrides the (HP, XP) buckets.
+    """
 
-    # Strategy-specific tracking
-    strategy_names = list(STAT_STRATEGIES.keys())
-    strategy_victories = {s: 0 for s in strategy_names}
-    strategy_deaths = {s: 0 for s in strategy_names}
-    strategy_kills = {s: 0 for s in strategy_names}
-    strategy_runs = {s: 0 for s in strategy_names}
-    strategy_end_str = {s: [] for s in strategy_names}   # Final STR at victory/death
-    strategy_end_agi = {s: [] for s in strategy_names}   # Final AGI at victory/death
-
-    # Death tracking
-    deaths = 0
-    death_floor = []
-    death_room = []
-    death_room_pct = []  # How far through the floor (0-100%)
-    death_hp_before = []
-    death_level = []
-    death_str = []       # Player STR at death
-    death_agi = []       # Player AGI at death
-    death_pdef = []      # Player pDef at death
-    death_max_hp = []    # Player max HP at death
-    death_weapon = []    # Weapon used at death
-    death_strategy = []  # Strategy used at death
-    killers = []
-
-    # Floor completion tracking
-    floor_completions = {f: 0 for f in range(1, FLOORS_TO_WIN + 1)}
-    floor_completion_hp = {f: [] for f in range(1, FLOORS_TO_WIN + 1)}
-    floor_completion_level = {f: [] for f in range(1, FLOORS_TO_WIN + 1)}
-    floor_kills = {f: [] for f in range(1, FLOORS_TO_WIN + 1)}
-
-    # Per-run tracking
-    total_kills_per_run = []
-    total_rooms_per_run = []
-    fights_skipped_per_run = []
-
-    # Shared analytics (reset per run but aggregated)
-    global_analytics = {
+    def __init__(self, weapon_name, strategy, cfg=DEFAULT_CONFIG, grid=None):
+        import numpy as np
+        import scipy.sparse
+
+        self.np = np
+        self.sparse = scipy.sparse
+        self.cfg = cfg
+        self.weapon_name = weapon_name
+        self.strategy = strategy
+        self.max_xp = max(cfg.xp_thresholds.values())
+        top = player_at_xp(weapon_name, strategy, self.max_xp, cfg)
+
+        self.hp_bucket, self.xp_bucket = grid or (ANALYTIC_HP_BUCKET, ANALYTIC_XP_BUCKET)
+        self.items = list(ANALYTIC_INVENTORY_CAPS)
+        self.inv_shape = tuple(cap + 1 for cap in ANALYTIC_INVENTORY_CAPS.values())
+        inv_n = 1
+        for size in self.inv_shape:
+            inv_n *= size
+        self.shape = (self.max_xp // self.xp_bucket + 1, inv_n,
+                      top['max_hp'] // self.hp_bucket + 1, top['potions'] + 1)
+
+        # Player stats for every xp grid point, grouped into level bands
+        self.players = [player_at_xp(weapon_name, strategy, x * self.xp_bucket, cfg)
+                        for x in range(self.shape[0])]
+        self.bands = []
+        for x, player in enumerate(self.players):
+            if self.bands and self.bands[-1][2]['level'] == player['level']:
+                self.bands[-1][1] = x + 1
+            else:
+                self.bands.append([x, x + 1, player])
+
+        self.fights = {}
+        self.snaps = {}
+        self.mixes = {}
+        self.loot = self.loot_matrix()
+
+    def start(self):
+        """Distribution of a fresh player"""
+        player = self.players[0]
+        v = self.np.zeros(self.shape)
+        v[0, 0, player['hp'] // self.hp_bucket, player['potions']] = 1.0
+        return v
+
+    def fight_matrix(self, player, m_name, floor):
+        """
+        (H*P, H*P) transition matrix of one fight over (hp, potions) and the
+        per-state death probability. Built from fight_outcomes(), with the
+        end HP split onto the grid by snap(). The grid is small enough that
+        the matrix is kept dense.
+        """
+        key = (player['level'], m_name, floor)
+        if key in self.fights:
+            return self.fights[key]
+
+        np = self.np
+        hp_n, pot_n = self.shape[2:]
+        top = player['max_hp'] // self.hp_bucket + 1
+        dead, survived = fight_outcomes(
+            self.weapon_name, player['str'], player['agi'], player['pDef'], player['max_hp'],
+            pot_n - 1, m_name, floor, self.hp_bucket, self.cfg)
+        moved = np.tensordot(survived, self.snap_matrix(player['max_hp']), axes=([2], [0]))
+
+        # Grid rows h = 0 never hold mass: a run at 0 HP is dead
+        move = np.zeros((hp_n * pot_n, hp_n * pot_n))
+        move[pot_n:top * pot_n] = moved.transpose(0, 1, 3, 2).reshape((top - 1) * pot_n, -1)
+        death = np.zeros(hp_n * pot_n)
+        death[pot_n:top * pot_n] = dead.ravel()
+        self.fights[key] = (move, death)
+        return move, death
+
+    def snap_matrix(self, max_hp):
+        """(max_hp + 1, H) matrix taking exact HP to the grid with snap(); 0 HP goes to 1 bucket"""
+        if max_hp not in self.snaps:
+            snapped = self.np.zeros((max_hp + 1, self.shape[2]))
+            for end_hp in range(max_hp + 1):
+                for h_end, weight in snap(end_hp, self.hp_bucket):
+                    snapped[end_hp, max(1, h_end)] += weight
+            self.snaps[max_hp] = snapped
+        return self.snaps[max_hp]
+
+    def encounter(self, v, floor, spawns, killers):
+        """
+        One enemy encounter for the whole distribution v: fight, XP and
+        level-up, loot. Returns (next distribution, death mass, kill mass);
+        killers collects the death mass per monster.
+        """
+        np = self.np
+        xp_n, inv_n, hp_n, pot_n = self.shape
+        skip_chance = self.cfg.skip_combat_chance
+        total_death = 0.0
+
+        # Only the xp rows that hold mass take part
+        rows = np.flatnonzero(v.any(axis=(1, 2, 3)))
+        first, end = (rows[0], rows[-1] + 1) if rows.size else (0, 0)
+        out = np.zeros_like(v)
+        flat = v[first:end].reshape(end - first, inv_n, hp_n * pot_n)
+        if skip_chance:
+            out[first:end] = v[first:end] * skip_chance
+            flat = flat * (1 - skip_chance)
+
+        steps = {}
+        for lo, hi, player in self.bands:
+            lo, hi = max(lo, first), min(hi, end)
+            if lo >= hi:
+                continue
+            band = flat[lo - first:hi - first].reshape(-1, hp_n * pot_n)
+            names, death, moves = self.spawn_mix(player, floor, spawns)
+            dead = band.sum(axis=0) @ death
+            for m_name, q_dead in zip(names, dead):
+                killers[m_name] += q_dead
+            total_death += dead.sum()
+            for step, move in moves:
+                if step not in steps:
+                    steps[step] = np.zeros((end - first, inv_n, hp_n * pot_n))
+                steps[step][lo - first:hi - first] = (band @ move).reshape(hi - lo, inv_n, -1)
+
+        # Kills only land on the rows the fights started from and the steps above
+        reach = min(xp_n, end + max(steps, default=0))
+        won = np.zeros((reach - first,) + self.shape[1:])
+        for step, fought in steps.items():
+            self.gain_xp(fought, first, step, won, first)
+
+        kills = won.sum()
+        touched = out[first:reach]
+        touched += self.drop_loot(won)
+        touched[touched < ANALYTIC_EPSILON] = 0.0
+        return out, total_death, kills
+
+    def spawn_mix(self, player, floor, spawns):
+        """
+        One encounter's fights against a whole spawn table, mixed by spawn
+        probability. The XP a kill earns lands on at most two grid steps
+        (see snap()), so the fight matrices of every monster are summed per
+        step: an encounter costs a product per step, however many monsters
+        the table holds. Returns (names, death, [(step, move)]), death
+        being a (H*P, monsters) matrix of death probability per state.
+        """
+        key = (player['level'], floor, tuple(spawns.items()))
+        if key in self.mixes:
+            return self.mixes[key]
+
+        names = list(spawns)
+        death = self.np.zeros((self.shape[2] * self.shape[3], len(names)))
+        moves = {}
+        for j, (m_name, q_spawn) in enumerate(spawns.items()):
+            move, death[:, j] = self.fight_matrix(player, m_name, floor)
+            death[:, j] *= q_spawn
+            for step, weight in snap(self.cfg.spawn_xp[m_name], self.xp_bucket):
+                part = (q_spawn * weight) * move
+                moves[step] = moves[step] + part if step in moves else part
+        self.mixes[key] = (names, death, sorted(moves.items()))
+        return self.mixes[key]
+
+    def gain_xp(self, rows, first, step, out, base=0):
+        """
+        Move the xp rows starting at index first up step grid points and
+        accumulate them into out (whose first row is xp index base), fully
+        healing runs that level up.
+        """
+        hp_n, pot_n = self.shape[2:]
+        last = self.shape[0] - 1
+        rows = rows.reshape(len(rows), -1, hp_n, pot_n)
+        for band_lo, band_hi, _ in self.bands:
+            lo, hi = max(band_lo, first), min(band_hi, first + len(rows))
+            if lo >= hi:
+                continue
+            # Rows that stay in the level band move up as one block
+            split = max(lo, min(hi, band_hi - step))
+            out[lo + step - base:split + step - base] += rows[lo - first:split - first]
+            if band_hi > last:
+                # XP past the top grid point piles up on it
+                out[last - base] += rows[split - first:hi - first].sum(axis=0)
+                continue
+            for x in range(split, hi):
+                # check_level_up(): full heal to the new max HP
+                to = min(last, x + step)
+                out[to - base, :, self.players[to]['max_hp'] // self.hp_bucket] += rows[x - first].sum(axis=1)
+
+    def drop_loot(self, v):
+        """drop_loot() on the inventory axis of v, any number of xp rows of the distribution"""
+        xp_n, inv_n, hp_n, pot_n = v.shape
+        moved = self.loot @ v.transpose(1, 0, 2, 3).reshape(inv_n, -1)
+        return moved.reshape(inv_n, xp_n, hp_n, pot_n).transpose(1, 0, 2, 3)
+
+    def loot_matrix(self):
+        """
+        drop_loot() as a sparse (I, I) matrix over the inventory axis: a
+        drop adds one of an item, and a full slot keeps its count
+        """
+        np = self.np
+        drop = self.cfg.drop_chance / 100
+        shares = self.cfg.loot_sampler.probabilities
+        inv_n = self.shape[1]
+        sources = list(range(inv_n))
+        targets = list(range(inv_n))
+        weights = [1 - drop] * inv_n
+        for i, counts in enumerate(np.ndindex(*self.inv_shape)):
+            for axis, item in enumerate(self.items):
+                after = list(counts)
+                after[axis] = min(after[axis] + 1, self.inv_shape[axis] - 1)
+                sources.append(i)
+                targets.append(np.ravel_multi_index(after, self.inv_shape))
+                weights.append(drop * shares.get(item, 0.0))
+        return self.sparse.csr_matrix((weights, (targets, sources)), shape=(inv_n, inv_n))
+
+    def altar(self, v):
+        """visit_altar() on the (inventory, hp) axes"""
+        np = self.np
+        xp_n, inv_n, hp_n, pot_n = self.shape
+        out = np.zeros_like(v)
+        for lo, hi, player in self.bands:
+            band = v[lo:hi]
+            if not band.any():
+                continue
+            altar = altar_matrix(player['max_hp'], self.hp_bucket, hp_n, self.cfg)
+            grid = band.transpose(0, 3, 1, 2).reshape(-1, inv_n * hp_n)
+            out[lo:hi] = (grid @ altar).reshape(hi - lo, pot_n, inv_n, hp_n).transpose(0, 2, 3, 1)
+        return out
+
+    def heal(self, v):
+        """Full heal on reaching the floor exit"""
+        out = self.np.zeros_like(v)
+        for lo, hi, player in self.bands:
+            out[lo:hi, :, player['max_hp'] // self.hp_bucket] = v[lo:hi].sum(axis=2)
+        return out
+
+@functools.lru_cache(maxsize=ANALYTIC_CACHE_SIZE)
+def altar_matrix(max_hp, hp_bucket, hp_n, cfg=DEFAULT_CONFIG):
+    """
+    visit_altar() for a player with max_hp, as a sparse matrix over a
+    RunChain's flattened (inventory, hp) grid with hp_n HP points. The HP
+    an altar heals to is split between grid points by snap().
+    """
+    import numpy as np
+    import scipy.sparse
+
+    items = list(ANALYTIC_INVENTORY_CAPS)
+    inv_shape = tuple(cap + 1 for cap in ANALYTIC_INVENTORY_CAPS.values())
+    sources, targets, weights = [], [], []
+    for i, counts in enumerate(np.ndindex(*inv_shape)):
+        for h in range(hp_n):
+            player = {'hp': h * hp_bucket, 'max_hp': max_hp}
+            inventory = [item for item, count in zip(items, counts) for _ in range(count)]
+            engine.visit_altar(player, inventory, cfg.loot_table)
+            i_to = np.ravel_multi_index(tuple(inventory.count(item) for item in items), inv_shape)
+            if player['hp'] > max_hp or h * hp_bucket >= max_hp:
+                steps = [(h, 1.0)]
+            else:
+                steps = snap(player['hp'], hp_bucket)
+            for h_to, weight in steps:
+                sources.append(i * hp_n + h)
+                targets.append(i_to * hp_n + h_to)
+                weights.append(weight)
+    size = int(np.prod(inv_shape)) * hp_n
+    return scipy.sparse.csr_matrix((weights, (sources, targets)), shape=(size, size))
+
+def solve_run(weapon_name, strategy, cfg=DEFAULT_CONFIG, grid=None):
+    """
+    Absorption probabilities and expected kills of one weapon/strategy run.
+
+    The transient states of a floor only lead to later rooms, so the chain's
+    fundamental matrix never has to be formed: pushing the distribution
+    through the block-triangular transitions room by room is the same
+    forward substitution, and the mass leaving at each step is absorbed.
+
+    Returns a dict with 'victory', 'floor_clear' {floor: prob},
+    'death' {(floor, room): prob}, 'killers' {name: prob}, 'kills' and
+    'victory_level' (expected level of the runs that escape). grid is the
+    chain's (HP, XP) buckets (see RunChain).
+    """
+    chain = RunChain(weapon_name, strategy, cfg, grid)
+    v = chain.start()
+    result = {'floor_clear': {}, 'death': defaultdict(float), 'killers': defaultdict(float),
+              'kills': 0.0}
+
+    for floor_num in range(1, cfg.floors_to_win + 1):
+        config = cfg.floor_settings(floor_num)
+        lo, hi = config['enemies_per_room']
+        count_probs = defaultdict(float, {0: config['empty_room_chance']})
+        for count in range(lo, hi + 1):
+            count_probs[count] += (1 - config['empty_room_chance']) / (hi - lo + 1)
+
+        for room in range(1, config['rooms'] + 1):
+            spawns = spawn_distribution(floor_num, room, cfg)
+            # Fight slot by slot; runs whose room has fewer enemies leave early
+            done = v * count_probs[0]
+            fighting = v * (1 - count_probs[0])
+            remaining = 1 - count_probs[0]
+            for slot in range(1, hi + 1):
+                fighting, dead, kills = chain.encounter(fighting, floor_num, spawns, result['killers'])
+                result['death'][(floor_num, room)] += dead
+                result['kills'] += kills
+                leaving = count_probs[slot] / remaining if remaining else 1.0
+                done += fighting * leaving
+                fighting *= 1 - leaving
+                remaining -= count_probs[slot]
+            v = done
+
+            # Altar every altar_interval rooms, counted from the floor start
+            if room % cfg.altar_interval == 0:
+                v = chain.altar(v)
+
+        result['floor_clear'][floor_num] = float(v.sum())
+        v = chain.heal(v)
+
+    result['victory'] = float(v.sum())
+    by_xp = v.sum(axis=(1, 2, 3))
+    result['victory_level'] = (sum(q * chain.players[x]['level'] for x, q in enumerate(by_xp))
+                               / result['victory'] if result['victory'] else 0.0)
+    result['death'] = {key: float(q) for key, q in result['death'].items()}
+    result['killers'] = {name: float(q) for name, q in result['killers'].items()}
+    result['kills'] = float(result['kills'])
+    return result
+
+def solve_run_task(task):
+    """Pool entry point for solve_run(); task is (weapon_name, strategy, cfg, grid)"""
+    return task[:2], solve_run(*task)
+
+def solve_all(workers=WORKERS, cfg=DEFAULT_CONFIG, grid=None):
+    """
+    solve_run() for every weapon/strategy pair, weighted the way
+    simulate_run() picks them. Returns [(weapon, strategy, weight, result)].
+    """
+    weapon_names = list(cfg.starter_weapons.keys())
+    strategies = strategy_distribution(cfg)
+    tasks = [(w, s, cfg, grid) for w in weapon_names for s in strategies]
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        solved = map(solve_run_task, tasks)
+        return [(w, s, strategies[s] / len(weapon_names), r) for (w, s), r in solved]
+    with multiprocessing.Pool(workers) as pool:
+        solved = pool.map(solve_run_task, tasks)
+    return [(w, s, strategies[s] / len(weapon_names), r) for (w, s), r in solved]
+
+# ==============================================================================
+# MAIN SIMULATION
+# ==============================================================================
+
+def new_metrics(cfg=DEFAULT_CONFIG, store=False):
+    """
+    Create an empty set of aggregated run metrics. With store=True it also
+    keeps every run as a row of a RunTable under 'run_table'.
+    """
+    weapon_names = list(cfg.starter_weapons.keys())
+    strategy_names = list(cfg.stat_strategies.keys())
+    floors = range(1, cfg.floors_to_win + 1)
+
+    metrics = {
+        'runs': 0,
+
+        # Victory tracking
+        'victories': 0,
+        'victory_hp': Summary(quantiles=True, edges=[30]),   # HP at final victory
+        'victory_levels': RunningStats(),   # Level at victory
+        'victory_times': RunningStats(),    # Time to complete all floors
+
+        # Weapon-specific tracking
+        'weapon_victories': {w: 0 for w in weapon_names},
+        'weapon_deaths': {w: 0 for w in weapon_names},
+        'weapon_kills': {w: 0 for w in weapon_names},
+        'weapon_runs': {w: 0 for w in weapon_names},
+
+        # Strategy-specific tracking
+        'strategy_victories': {s: 0 for s in strategy_names},
+        'strategy_deaths': {s: 0 for s in strategy_names},
+        'strategy_kills': {s: 0 for s in strategy_names},
+        'strategy_runs': {s: 0 for s in strategy_names},
+        'strategy_end_str': {s: RunningStats() for s in strategy_names},   # Final STR at victory/death
+        'strategy_end_agi': {s: RunningStats() for s in strategy_names},   # Final AGI at victory/death
+
+        # Death tracking
+        'deaths': 0,
+        'death_floor': Counter(),
+        'death_room': RunningStats(),
+        'death_room_pct': Histogram([33, 66], right=True),   # How far through the floor (0-100%)
+        'death_hp_before': Summary(quantiles=True, edges=[40, 60]),
+        'death_level': Counter(),
+        'death_str': RunningStats(),        # Player STR at death
+        'death_agi': RunningStats(),        # Player AGI at death
+        'death_pdef': RunningStats(),       # Player pDef at death
+        'death_max_hp': RunningStats(),     # Player max HP at death
+        'death_weapon': Counter(),          # Weapon used at death
+        'death_strategy': Counter(),        # Strategy used at death
+        'killers': Counter(),
+
+        # Floor completion tracking
+        'floor_completions': {f: 0 for f in floors},
+        'floor_completion_hp': {f: RunningStats() for f in floors},
+        'floor_completion_level': {f: RunningStats() for f in floors},
+        'floor_kills': {f: RunningStats() for f in floors},
+
+        # Per-run tracking
+        'total_kills_per_run': RunningStats(),
+        'total_rooms_per_run': RunningStats(),
+        'fights_skipped_per_run': RunningStats(),
+
+        # Shared analytics (reset per run but aggregated)
+        'global_analytics': new_analytics(),
+    }
+    if store:
+        metrics['run_table'] = RunTable()
+    return metrics
+
+def new_analytics():
+    """Create an empty per-run analytics record"""
+    return {
         'monster_fights': Counter(),
         'monster_killed': Counter(),
         'monster_kills_player': Counter(),
@@ -639,143 +1272,686 @@ def run_simulation():
         'altar_visits': 0,
         'total_sacrificed': 0,
         'total_hp_restored': 0,
-        'hp_after_rooms': [],
+        'hp_after_rooms': RunningStats(),
         'close_calls': 0
     }
 
-    print(f"Running {SIMULATIONS} Dungeon Run Simulations...")
+def merge_metrics(total, part):
+    """
+    Fold one metrics record into another, in place.
+
+    Counts are summed, Counters added and streaming accumulators merged, so
+    merging chunk results in chunk order reproduces the serial aggregation
+    (exactly, except for quantile sketches, which stay within their error
+    bound).
+    """
+    for key, value in part.items():
+        if hasattr(value, 'merge'):
+            total[key].merge(value)
+        elif isinstance(value, dict):
+            if isinstance(value, Counter):
+                total[key].update(value)
+            else:
+                merge_metrics(total[key], value)
+        elif isinstance(value, list):
+            total[key].extend(value)
+        else:
+            total[key] += value
+    return total
+
+def simulate_run(metrics, cfg=DEFAULT_CONFIG):
+    """
+    Simulate one full dungeon run and record it into metrics.
+    Generator over fight requests, like run_floor().
+    """
+    weapon_names = list(cfg.starter_weapons.keys())
+
+    # Randomly select weapon and strategy for this run
+    weapon_choice = random.choice(weapon_names)
+    strategy_choice = select_strategy(cfg)
+    player = create_player(weapon_choice, strategy_choice, cfg)
+    metrics['runs'] += 1
+    metrics['weapon_runs'][weapon_choice] += 1
+    metrics['strategy_runs'][strategy_choice] += 1
+
+    inventory = []
+    run_kills = 0
+    run_rooms = 0
+    run_skipped = 0
+
+    # Per-run analytics
+    analytics = new_analytics()
+
+    run_success = True
+    death = None
+    cleared = []
+    minutes = float('nan')
+
+    for floor_num in range(1, cfg.floors_to_win + 1):
+        result = yield from run_floor(player, floor_num, inventory, analytics, cfg)
+
+        run_kills += result['kills']
+        run_rooms += result['rooms_cleared']
+        run_skipped += result['fights_skipped']
+
+        if result['result'] == 'death':
+            # Player died
+            metrics['deaths'] += 1
+            metrics['weapon_deaths'][weapon_choice] += 1
+            metrics['strategy_deaths'][strategy_choice] += 1
+            metrics['death_floor'][floor_num] += 1
+            metrics['death_room'].add(result['room'])
+
+            # Calculate how far through the floor
+            floor_total_rooms = cfg.floor_settings(floor_num)['rooms']
+            pct = (result['room'] / floor_total_rooms) * 100
+            metrics['death_room_pct'].add(pct)
+
+            metrics['death_hp_before'].add(result.get('hp_before_death', 0))
+            metrics['death_level'][player['level']] += 1
+            metrics['death_str'].add(player['str'])
+            metrics['death_agi'].add(player['agi'])
+            metrics['death_pdef'].add(player['pDef'])
+            metrics['death_max_hp'].add(player['max_hp'])
+            metrics['death_weapon'][weapon_choice] += 1
+            metrics['death_strategy'][strategy_choice] += 1
+            metrics['killers'][result['killer']] += 1
+
+            # Track final stats by strategy
+            metrics['strategy_end_str'][strategy_choice].add(player['str'])
+            metrics['strategy_end_agi'][strategy_choice].add(player['agi'])
+
+            run_success = False
+            death = (result, pct)
+            break
+
+        else:
+            # Floor completed
+            metrics['floor_completions'][floor_num] += 1
+            metrics['floor_completion_hp'][floor_num].add(result['hp_at_exit'])
+            metrics['floor_completion_level'][floor_num].add(player['level'])
+            metrics['floor_kills'][floor_num].add(result['kills'])
+            cleared.append((result['hp_at_exit'], player['level'], result['kills']))
+
+            # Full heal when reaching floor exit
+            player['hp'] = player['max_hp']
+
+    # Aggregate analytics
+    merge_metrics(metrics['global_analytics'], analytics)
+
+    # Record run results
+    metrics['total_kills_per_run'].add(run_kills)
+    metrics['total_rooms_per_run'].add(run_rooms)
+    metrics['fights_skipped_per_run'].add(run_skipped)
+
+    # Track weapon and strategy kills for this run
+    metrics['weapon_kills'][weapon_choice] += run_kills
+    metrics['strategy_kills'][strategy_choice] += run_kills
+
+    if run_success:
+        metrics['victories'] += 1
+        metrics['weapon_victories'][weapon_choice] += 1
+        metrics['strategy_victories'][strategy_choice] += 1
+        metrics['victory_hp'].add(player['hp'])
+
+        # Track final stats by strategy
+        metrics['strategy_end_str'][strategy_choice].add(player['str'])
+        metrics['strategy_end_agi'][strategy_choice].add(player['agi'])
+        metrics['victory_levels'].add(player['level'])
+
+        # Calculate run time (simplified)
+        total_rooms = sum(cfg.floor_settings(f)['rooms'] for f in range(1, cfg.floors_to_win + 1))
+        combat_time = analytics['total_fights'] * 3.0  # Rough avg fight time
+        nav_time = total_rooms * cfg.nav_time_per_room
+        minutes = (combat_time + nav_time) / 60
+        metrics['victory_times'].add(minutes)
+
+    if 'run_table' in metrics:
+        metrics['run_table'].add(run_row(weapon_choice, strategy_choice, player, floor_num, death, cleared,
+                                         run_kills, run_rooms, run_skipped, minutes, analytics, cfg))
+
+def run_row(weapon, strategy, player, floor_num, death, cleared, kills, rooms, skipped, minutes,
+            analytics, cfg=DEFAULT_CONFIG):
+    """
+    One run as a row of the per-run table. Floor columns hold -1 past the
+    last cleared floor, and minutes is NaN for deaths; the HP trajectory is
+    kept as the RunningStats parts of the HP after every room.
+    """
+    missing = [(-1, -1, -1)] * (cfg.floors_to_win - len(cleared))
+    floor_hp, floor_level, floor_kills = zip(*(cleared + missing))
+    monsters = list(cfg.monster_stats)
+    return {
+        'weapon': weapon,
+        'strategy': strategy,
+        'won': death is None,
+        'floor': floor_num,
+        'death_room': death[0]['room'] if death else -1,
+        'death_room_pct': death[1] if death else float('nan'),
+        'hp_before_death': death[0].get('hp_before_death', 0) if death else -1,
+        'killer': death[0]['killer'] if death else None,
+        'hp': player['hp'],
+        'level': player['level'],
+        'str': player['str'],
+        'agi': player['agi'],
+        'pdef': player['pDef'],
+        'max_hp': player['max_hp'],
+        'kills': kills,
+        'rooms': rooms,
+        'fights_skipped': skipped,
+        'minutes': minutes,
+        'floor_hp': floor_hp,
+        'floor_level': floor_level,
+        'floor_kills': floor_kills,
+        'monster_fights': [analytics['monster_fights'][m] for m in monsters],
+        'monster_killed': [analytics['monster_killed'][m] for m in monsters],
+        'monster_kills_player': [analytics['monster_kills_player'][m] for m in monsters],
+        'monster_dmg_taken': [analytics['monster_dmg_taken'][m] for m in monsters],
+        'fights': analytics['total_fights'],
+        'altar_visits': analytics['altar_visits'],
+        'sacrificed': analytics['total_sacrificed'],
+        'hp_restored': analytics['total_hp_restored'],
+        'close_calls': analytics['close_calls'],
+        'hp_after_rooms': analytics['hp_after_rooms'].parts(),
+    }
+
+def simulate_chunk(task):
+    """
+    Simulate one shard of runs.
+
+    task: (seed, chunk_index, run_count, batch, cfg, store). Every run is
+    played on its own run_stream(), so a chunk produces the same metrics
+    whichever worker process picks it up. In batch mode all runs of the
+    chunk advance in lockstep and their fights go through
+    batch_combat.drive_lockstep(), so the chunk shares one stream derived from
+    the master seed and the chunk index instead, and its spawn, strategy and
+    loot rolls are pre-drawn in bulk (SimConfig.pooled()). With store the chunk's runs
+    come back as rows of metrics['run_table'] too.
+    """
+    seed, chunk_index, run_count, batch, cfg, store = task
+
+    metrics = new_metrics(cfg, store)
+    if batch:
+        import numpy as np
+        import batch_combat
+
+        random.seed(f"{seed}:{chunk_index}")
+        rng = np.random.default_rng([seed, chunk_index])
+        pooled = cfg.pooled(rng)
+        runs = [simulate_run(metrics, pooled) for _ in range(run_count)]
+        batch_combat.drive_lockstep(runs, functools.partial(fight_matchup, cfg=cfg), rng)
+    else:
+        first_run = chunk_index * CHUNK_SIZE
+        for run_index in range(first_run, first_run + run_count):
+            random.seed(run_stream(seed, run_index))
+            resolve_fights(simulate_run(metrics, cfg), bound_fight(cfg))
+    return metrics
+
+def plan_chunks(simulations, seed, batch=False, cfg=DEFAULT_CONFIG, store=False):
+    """Split a batch of runs into fixed-size, independently seeded chunks"""
+    chunk_size = BATCH_CHUNK_SIZE if batch else CHUNK_SIZE
+    tasks = []
+    for chunk_index, start in enumerate(range(0, simulations, chunk_size)):
+        tasks.append((seed, chunk_index, min(chunk_size, simulations - start), batch, cfg, store))
+    return tasks
+
+def collect_metrics(simulations=SIMULATIONS, workers=WORKERS, seed=None, batch=False,
+                    cfg=DEFAULT_CONFIG, store=False, checkpoint=None):
+    """
+    Run a batch of simulations and return the merged metrics.
+
+    Chunks are farmed out to a process pool when workers > 1 and merged back
+    in chunk order, so the result for a given seed does not depend on the
+    worker count. With a Checkpoint, progress is saved as chunks are merged
+    and a loaded one picks up at the first chunk it hadn't merged.
+    """
+    tasks = plan_chunks(simulations, seed, batch, cfg, store)
+    metrics = new_metrics(cfg, store)
+    done = 0
+    if checkpoint and checkpoint.metrics is not None:
+        metrics, done = checkpoint.metrics, checkpoint.next_chunk
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks) - done)
+
+    if workers <= 1:
+        parts = map(simulate_chunk, tasks[done:])
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        parts = pool.imap(simulate_chunk, tasks[done:])
+    try:
+        for chunk_index, part in enumerate(parts, done + 1):
+            merge_metrics(metrics, part)
+            if checkpoint:
+                checkpoint.update(metrics, chunk_index)
+    finally:
+        if pool:
+            # Every result has been merged by now; on an interrupt, close()
+            # would let the workers finish the whole queue first
+            pool.terminate()
+            pool.join()
+    if checkpoint:
+        checkpoint.save(metrics, len(tasks))
+    return metrics
+
+def interval_targets(metrics):
+    """The proportions --target-ci has to pin down: (label, successes, trials)"""
+    targets = [('Victory rate', metrics['victories'], metrics['runs'])]
+    for w, runs in metrics['weapon_runs'].items():
+        targets.append((f"Win% {w}", metrics['weapon_victories'][w], runs))
+    for f, clears in metrics['floor_completions'].items():
+        targets.append((f"Floor {f} clear", clears, metrics['runs']))
+    return targets
+
+def collect_until(target, confidence=CI_CONFIDENCE, max_runs=MAX_SEQUENTIAL_RUNS, relative=False,
+                  workers=WORKERS, seed=None, batch=False, cfg=DEFAULT_CONFIG, store=False,
+                  checkpoint=None):
+    """
+    Run chunks until every interval target has a half-width of at most
+    target (or max_runs is reached; see sim_engine.collect_until()) and
+    return the merged metrics.
+
+    Chunks are the same ones collect_metrics() would run, in the same order,
+    so stopping after n runs gives exactly the metrics of a fixed n-run batch.
+    Each round runs one chunk per worker before the targets are checked.
+    A Checkpoint is saved between rounds, like in collect_metrics().
+    """
+    chunk_size = BATCH_CHUNK_SIZE if batch else CHUNK_SIZE
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    metrics = new_metrics(cfg, store)
+    chunk_index = 0
+    if checkpoint and checkpoint.metrics is not None:
+        metrics, chunk_index = checkpoint.metrics, checkpoint.next_chunk
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+
+    def advance(metrics):
+        nonlocal chunk_index
+        tasks = []
+        planned = metrics['runs']
+        for _ in range(workers):
+            if planned >= max_runs:
+                break
+            count = min(chunk_size, max_runs - planned)
+            tasks.append((seed, chunk_index, count, batch, cfg, store))
+            chunk_index += 1
+            planned += count
+
+        parts = pool.imap(simulate_chunk, tasks) if pool else map(simulate_chunk, tasks)
+        for part in parts:
+            merge_metrics(metrics, part)
+        if checkpoint:
+            checkpoint.update(metrics, chunk_index)
+
+    try:
+        engine.collect_until(sys.modules[__name__], metrics, advance, target, confidence, max_runs, relative)
+    finally:
+        if pool:
+            # Every result has been merged by now; on an interrupt, close()
+            # would let the workers finish the whole queue first
+            pool.terminate()
+            pool.join()
+    if checkpoint:
+        checkpoint.save(metrics, chunk_index)
+    return metrics
+
+# ==============================================================================
+# CHECKPOINTS
+# ==============================================================================
+#
+# A batch is a fixed sequence of chunks, each seeded from the master seed and
+# its own index, merged in order. So the merged metrics plus the index of the
+# next chunk are the whole state of a batch: resuming from them runs exactly
+# the chunks an uninterrupted batch would have run next, and merges them into
+# the same accumulators, and the final report comes out identical.
+
+class Checkpoint:
+    """
+    Progress of one run_simulation() batch, pickled to path.
+
+    settings are run_simulation()'s arguments, so a batch can be resumed
+    from the file alone. metrics is None until something has been merged.
+    """
+
+    def __init__(self, path, settings, interval=CHECKPOINT_SECONDS):
+        self.path = path
+        self.settings = settings
+        self.interval = interval
+        self.metrics = None
+        self.next_chunk = 0
+        self.saved_at = time.monotonic()
+
+    @classmethod
+    def load(cls, path, interval=CHECKPOINT_SECONDS):
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        checkpoint = cls(path, state['settings'], interval)
+        checkpoint.metrics = state['metrics']
+        checkpoint.next_chunk = state['next_chunk']
+        return checkpoint
+
+    def update(self, metrics, next_chunk):
+        """Save if the last save is more than interval seconds old"""
+        if time.monotonic() - self.saved_at >= self.interval:
+            self.save(metrics, next_chunk)
+
+    def save(self, metrics, next_chunk):
+        """Write the state atomically, so an interrupted save keeps the previous one"""
+        self.metrics, self.next_chunk = metrics, next_chunk
+        state = {'settings': self.settings, 'next_chunk': next_chunk, 'metrics': metrics}
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + '.tmp', self.path)
+        self.saved_at = time.monotonic()
+
+def run_simulation(simulations=SIMULATIONS, workers=WORKERS, seed=None, batch=False,
+                   target_ci=None, confidence=CI_CONFIDENCE, max_runs=MAX_SEQUENTIAL_RUNS,
+                   relative=False, store=None, checkpoint=None):
+    """
+    Simulate a batch and print its report. checkpoint is either a path to
+    save progress to or a loaded Checkpoint to resume (see
+    resume_simulation()).
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    if isinstance(checkpoint, str):
+        checkpoint = Checkpoint(checkpoint, {
+            'simulations': simulations, 'workers': workers, 'seed': seed, 'batch': batch,
+            'target_ci': target_ci, 'confidence': confidence, 'max_runs': max_runs,
+            'relative': relative, 'store': store})
+
+    if target_ci:
+        print(f"Running Dungeon Run Simulations until every {confidence*100:.0f}% CI is within "
+              + (f"±{target_ci*100:.1f}% of the rate" if relative else f"±{target_ci*100:.2f}%")
+              + f" (max {max_runs} runs)...")
+    else:
+        print(f"Running {simulations} Dungeon Run Simulations...")
     print(f"Goal: Complete {FLOORS_TO_WIN} floors to escape")
     print(f"Config: {FLOOR_CONFIG[1]['rooms']}/{FLOOR_CONFIG[2]['rooms']}/{FLOOR_CONFIG[3]['rooms']} rooms per floor")
     print(f"        Altar every {ALTAR_INTERVAL} rooms | Floor scaling: {FLOOR_SCALING*100:.0f}%")
-    print(f"        Full heal on floor exit: YES")
-    print(f"Weapon: {', '.join(weapon_names)} (random selection)")
+    print("        Full heal on floor exit: YES")
+    print(f"Weapon: {', '.join(STARTER_WEAPONS.keys())} (random selection)")
     print(f"Range: Start={RANGE_CONFIG['starting_distance']} tiles | Bow range={STARTER_WEAPONS['Short Bow']['range']}")
-    print(f"Stat Strategies: 25% All STR | 25% All AGI | 50% STR/AGI Split")
+    print(f"Spawns: {len(MONSTER_STATS)} monsters, "
+          f"{'tiered by room difficulty and floor' if TIERED_SPAWNS else 'flat SPAWN_POOL weights'}")
+    print("Stat Strategies: 25% All STR | 25% All AGI | 50% STR/AGI Split")
     print(f"AGI Buff: +50% (hit={AGI_CONFIG['hit_per_agi']*100:.1f}%/pt, crit={AGI_CONFIG['crit_per_agi']*100:.2f}%/pt)")
+    print(f"Seed: {seed}" + (" | Batch combat engine" if batch else ""))
+    if checkpoint:
+        print(f"Checkpoint: {checkpoint.path}"
+              + (f" | resuming after {checkpoint.metrics['runs']} runs" if checkpoint.metrics else ""))
     print("-" * 60)
 
-    # ==========================================================================
-    # SIMULATION LOOP
-    # ==========================================================================
-
-    for sim in range(SIMULATIONS):
-        # Randomly select weapon and strategy for this run
-        weapon_choice = random.choice(weapon_names)
-        strategy_choice = select_strategy()
-        player = create_player(weapon_choice, strategy_choice)
-        weapon_runs[weapon_choice] += 1
-        strategy_runs[strategy_choice] += 1
-
-        inventory = []
-        run_kills = 0
-        run_rooms = 0
-        run_skipped = 0
-        run_start_time = 0
-
-        # Per-run analytics
-        analytics = {
-            'monster_fights': Counter(),
-            'monster_killed': Counter(),
-            'monster_kills_player': Counter(),
-            'monster_dmg_taken': Counter(),
-            'total_fights': 0,
-            'altar_visits': 0,
-            'total_sacrificed': 0,
-            'total_hp_restored': 0,
-            'hp_after_rooms': [],
-            'close_calls': 0
-        }
-
-        run_success = True
-
-        for floor_num in range(1, FLOORS_TO_WIN + 1):
-            result = run_floor(player, floor_num, inventory, analytics)
-
-            run_kills += result['kills']
-            run_rooms += result['rooms_cleared']
-            run_skipped += result['fights_skipped']
-
-            if result['result'] == 'death':
-                # Player died
-                deaths += 1
-                weapon_deaths[weapon_choice] += 1
-                strategy_deaths[strategy_choice] += 1
-                death_floor.append(floor_num)
-                death_room.append(result['room'])
-
-                # Calculate how far through the floor
-                floor_total_rooms = FLOOR_CONFIG.get(floor_num, FLOOR_CONFIG[3])['rooms']
-                pct = (result['room'] / floor_total_rooms) * 100
-                death_room_pct.append(pct)
-
-                death_hp_before.append(result.get('hp_before_death', 0))
-                death_level.append(player['level'])
-                death_str.append(player['str'])
-                death_agi.append(player['agi'])
-                death_pdef.append(player['pDef'])
-                death_max_hp.append(player['max_hp'])
-                death_weapon.append(weapon_choice)
-                death_strategy.append(strategy_choice)
-                killers.append(result['killer'])
-
-                # Track final stats by strategy
-                strategy_end_str[strategy_choice].append(player['str'])
-                strategy_end_agi[strategy_choice].append(player['agi'])
-
-                run_success = False
-                break
+    if target_ci:
+        metrics = collect_until(target_ci, confidence, max_runs, relative, workers, seed, batch,
+                                store=bool(store), checkpoint=checkpoint)
+    else:
+        metrics = collect_metrics(simulations, workers, seed, batch, store=bool(store),
+                                  checkpoint=checkpoint)
+    if store:
+        engine.store_runs(metrics, store, {'simulator': 'dungeon_run_simulator', 'seed': seed,
+                                           'batch': batch, 'overrides': [], 'monsters': list(MONSTER_STATS)})
+    print_report(metrics)
+    if target_ci:
+        print_intervals(metrics, target_ci, confidence, relative)
+
+def resume_simulation(path):
+    """Continue the batch saved in a checkpoint file with its original settings"""
+    try:
+        checkpoint = Checkpoint.load(path)
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+        sys.exit(f"Can't resume from {path}: {e}")
+    run_simulation(**checkpoint.settings, checkpoint=checkpoint)
+
+def run_analytic(workers=WORKERS):
+    """
+    Solve the run chain on the configured grid and on ANALYTIC_CHECK_GRID,
+    and report the first with the difference between the two as its error
+    """
+    print("Solving Dungeon Runs as an Absorbing Markov Chain (approximate, offline)...")
+    print(f"Goal: Complete {FLOORS_TO_WIN} floors to escape")
+    print(f"Config: {FLOOR_CONFIG[1]['rooms']}/{FLOOR_CONFIG[2]['rooms']}/{FLOOR_CONFIG[3]['rooms']} rooms per floor")
+    print(f"        Altar every {ALTAR_INTERVAL} rooms | Floor scaling: {FLOOR_SCALING*100:.0f}%")
+    print(f"Grid: HP/{ANALYTIC_HP_BUCKET} | XP/{ANALYTIC_XP_BUCKET} | "
+          f"Inventory caps {'/'.join(str(c) for c in ANALYTIC_INVENTORY_CAPS.values())}")
+    print("-" * 60)
 
-            else:
-                # Floor completed
-                floor_completions[floor_num] += 1
-                floor_completion_hp[floor_num].append(result['hp_at_exit'])
-                floor_completion_level[floor_num].append(player['level'])
-                floor_kills[floor_num].append(result['kills'])
-
-                # Full heal when reaching floor exit
-                player['hp'] = player['max_hp']
-
-        # Aggregate analytics
-        for key in ['monster_fights', 'monster_killed', 'monster_kills_player', 'monster_dmg_taken']:
-            global_analytics[key] += analytics[key]
-        global_analytics['total_fights'] += analytics['total_fights']
-        global_analytics['altar_visits'] += analytics['altar_visits']
-        global_analytics['total_sacrificed'] += analytics['total_sacrificed']
-        global_analytics['total_hp_restored'] += analytics['total_hp_restored']
-        global_analytics['hp_after_rooms'].extend(analytics['hp_after_rooms'])
-        global_analytics['close_calls'] += analytics['close_calls']
-
-        # Record run results
-        total_kills_per_run.append(run_kills)
-        total_rooms_per_run.append(run_rooms)
-        fights_skipped_per_run.append(run_skipped)
-
-        # Track weapon and strategy kills for this run
-        weapon_kills[weapon_choice] += run_kills
-        strategy_kills[strategy_choice] += run_kills
-
-        if run_success:
-            victories += 1
-            weapon_victories[weapon_choice] += 1
-            strategy_victories[strategy_choice] += 1
-            victory_hp.append(player['hp'])
+    start = time.perf_counter()
+    solved = solve_all(workers)
+    elapsed = time.perf_counter() - start
+    check = solve_all(workers, grid=ANALYTIC_CHECK_GRID)
+    print_analytic_report(solved, check)
+    print(f"Solved in {elapsed:.0f}s (check grid {time.perf_counter() - start - elapsed:.0f}s)")
 
-            # Track final stats by strategy
-            strategy_end_str[strategy_choice].append(player['str'])
-            strategy_end_agi[strategy_choice].append(player['agi'])
-            victory_levels.append(player['level'])
+# ==============================================================================
+# STORED RUNS
+# ==============================================================================
+#
+# --store keeps every run as a row of a columnar .npz table (run_store);
+# --report rebuilds the aggregated metrics from such a table with vectorized
+# group-bys and prints the same report, without simulating anything.
+
+def metrics_from_runs(runs):
+    """Rebuild the merged metrics of a stored run table"""
+    import numpy as np
+
+    metrics = new_metrics()
+    won = runs['won']
+    dead = ~won
+    kills = runs['kills']
+    metrics['runs'] = len(runs)
+
+    metrics['victories'] = int(won.sum())
+    metrics['victory_hp'] = Summary.from_array(runs['hp'][won], quantiles=True, edges=[30])
+    metrics['victory_levels'] = RunningStats.from_array(runs['level'][won])
+    metrics['victory_times'] = RunningStats.from_array(runs['minutes'][won])
+
+    for group in ('weapon', 'strategy'):
+        metrics[f'{group}_runs'].update(runs.counts(group))
+        metrics[f'{group}_victories'].update(runs.counts(group, won))
+        metrics[f'{group}_deaths'].update(runs.counts(group, dead))
+        metrics[f'{group}_kills'].update(runs.sums(group, kills))
+    for s in metrics['strategy_runs']:
+        played = runs.mask('strategy', s)
+        metrics['strategy_end_str'][s] = RunningStats.from_array(runs['str'][played])
+        metrics['strategy_end_agi'][s] = RunningStats.from_array(runs['agi'][played])
+
+    metrics['deaths'] = int(dead.sum())
+    metrics['death_floor'] = value_counts(runs['floor'][dead])
+    metrics['death_room'] = RunningStats.from_array(runs['death_room'][dead])
+    metrics['death_room_pct'] = Histogram.from_array(runs['death_room_pct'][dead], [33, 66], right=True)
+    metrics['death_hp_before'] = Summary.from_array(runs['hp_before_death'][dead], quantiles=True, edges=[40, 60])
+    metrics['death_level'] = value_counts(runs['level'][dead])
+    for stat in ('str', 'agi', 'pdef', 'max_hp'):
+        metrics[f'death_{stat}'] = RunningStats.from_array(runs[stat][dead])
+    metrics['death_weapon'] = runs.counts('weapon', dead)
+    metrics['death_strategy'] = runs.counts('strategy', dead)
+    metrics['killers'] = runs.counts('killer', dead)
+
+    for f in metrics['floor_completions']:
+        cleared = runs['floor_hp'][:, f - 1] >= 0
+        metrics['floor_completions'][f] = int(cleared.sum())
+        metrics['floor_completion_hp'][f] = RunningStats.from_array(runs['floor_hp'][cleared, f - 1])
+        metrics['floor_completion_level'][f] = RunningStats.from_array(runs['floor_level'][cleared, f - 1])
+        metrics['floor_kills'][f] = RunningStats.from_array(runs['floor_kills'][cleared, f - 1])
+
+    metrics['total_kills_per_run'] = RunningStats.from_array(kills)
+    metrics['total_rooms_per_run'] = RunningStats.from_array(runs['rooms'])
+    metrics['fights_skipped_per_run'] = RunningStats.from_array(runs['fights_skipped'])
+
+    analytics = metrics['global_analytics']
+    monsters = runs.meta['monsters']
+    for key in ('monster_fights', 'monster_killed', 'monster_kills_player', 'monster_dmg_taken'):
+        analytics[key] = Counter(dict(zip(monsters, runs[key].sum(axis=0).tolist())))
+    for key, column in (('total_fights', 'fights'), ('altar_visits', 'altar_visits'),
+                        ('total_sacrificed', 'sacrificed'), ('total_hp_restored', 'hp_restored'),
+                        ('close_calls', 'close_calls')):
+        analytics[key] = int(np.sum(runs[column]))
+    analytics['hp_after_rooms'] = RunningStats.from_parts(runs['hp_after_rooms'])
+    return metrics
 
-            # Calculate run time (simplified)
-            total_rooms = sum(FLOOR_CONFIG[f]['rooms'] for f in range(1, FLOORS_TO_WIN + 1))
-            combat_time = analytics['total_fights'] * 3.0  # Rough avg fight time
-            nav_time = total_rooms * NAV_TIME_PER_ROOM
-            victory_times.append((combat_time + nav_time) / 60)  # Minutes
+# ==============================================================================
+# REPLAY
+# ==============================================================================
+#
+# Every run of a seeded batch plays on its own run_stream(), so one run can be
+# re-simulated alone, fight by fight, without rerunning the batch. Run
+# indices are row numbers of a --store table, which is the way to find e.g.
+# "the 3rd death to Shadow Stalker on floor 2".
+
+def print_run(row):
+    """Summary of one replayed run from its run table row, after sim_engine.replay_run()'s trace"""
+    print(f"  {row['weapon']} | {STAT_STRATEGIES[row['strategy']]['name']}")
+    if row['won']:
+        print(f"  Victory with {row['hp']}/{row['max_hp']} HP after {row['minutes']:.1f} minutes")
+    else:
+        print(f"  Died on floor {row['floor']}, room {row['death_room']}, to {row['killer']} "
+              f"(HP {row['hp_before_death']} before the fight)")
+    print(f"  Level {row['level']} | STR {row['str']} AGI {row['agi']} pDef {row['pdef']} | "
+          f"{row['kills']} kills, {row['rooms']} rooms, {row['fights_skipped']} fights skipped")
+    cleared = [f"F{f} HP {hp}" for f, hp in enumerate(row['floor_hp'], 1) if hp >= 0]
+    if cleared:
+        print(f"  Floor exits: {', '.join(cleared)}")
 
-    # ==========================================================================
-    # REPORTING
-    # ==========================================================================
+# ==============================================================================
+# A/B COMPARISON
+# ==============================================================================
 
-    win_rate = (victories / SIMULATIONS) * 100
+# Baseline and variant are simulated on common random numbers: every run has
+# its own stream for weapon, strategy, spawn, loot and room rolls, and every
+# fight within the run is resolved on a stream of its own. Both arms therefore
+# see the same dungeon and the same hit/crit uniforms up to the point where
+# the change makes them diverge, and the per-run differences carry far less
+# noise than two independent batches.
+
+def paired_result(metrics):
+    """
+    What an A/B comparison compares of one run (see sim_engine.paired_run()).
+    Returns: (weapon, won, kills, floors_cleared)
+    """
+    weapon = next(w for w, runs in metrics['weapon_runs'].items() if runs)
+    floors_cleared = sum(metrics['floor_completions'].values())
+    return (weapon, metrics['victories'], metrics['total_kills_per_run'].total, floors_cleared)
+
+def compare_chunk(task):
+    """
+    Simulate one shard of runs under both configs.
+
+    task: (seed, first_run, run_count, baseline_cfg, variant_cfg). Returns
+    the baseline and variant results of paired_result(), in run order.
+    """
+    seed, first_run, run_count, baseline_cfg, variant_cfg = task
+    streams = [run_stream(seed, run) for run in range(first_run, first_run + run_count)]
+
+    sim = sys.modules[__name__]
+    baseline = [engine.paired_run(sim, stream, bound_fight(baseline_cfg), baseline_cfg) for stream in streams]
+    variant = [engine.paired_run(sim, stream, bound_fight(variant_cfg), variant_cfg) for stream in streams]
+    return baseline, variant
+
+def collect_pairs(simulations, variant_cfg, workers=WORKERS, seed=None, baseline_cfg=DEFAULT_CONFIG):
+    """Run both arms of an A/B comparison and return (baseline, variant) results"""
+    tasks = [(seed, start, min(CHUNK_SIZE, simulations - start), baseline_cfg, variant_cfg)
+             for start in range(0, simulations, CHUNK_SIZE)]
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    baseline, variant = [], []
+    if workers <= 1:
+        parts = map(compare_chunk, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        parts = pool.imap(compare_chunk, tasks)
+    try:
+        for base_part, variant_part in parts:
+            baseline.extend(base_part)
+            variant.extend(variant_part)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    return baseline, variant
+
+def paired_metrics(baseline, variant):
+    """
+    [(label, a_values, b_values)] for every compared metric. Win rates per
+    weapon only cover the runs that drew that weapon, which is the same set
+    of runs in both arms.
+    """
+    rows = [
+        ('Victory rate', [r[1] for r in baseline], [r[1] for r in variant]),
+    ]
+    for w in STARTER_WEAPONS:
+        picked = [i for i, r in enumerate(baseline) if r[0] == w]
+        rows.append((f"Win% {w}", [baseline[i][1] for i in picked], [variant[i][1] for i in picked]))
+    for f in range(1, FLOORS_TO_WIN):  # Clearing the last floor is the victory rate
+        rows.append((f"Floor {f} clear",
+                     [int(r[3] >= f) for r in baseline], [int(r[3] >= f) for r in variant]))
+    rows.append(('Kills per run', [r[2] for r in baseline], [r[2] for r in variant]))
+    return rows
+
+def run_comparison(simulations, overrides, workers=WORKERS, seed=None, confidence=CI_CONFIDENCE):
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+
+    print(f"Running {simulations} Paired Dungeon Runs (common random numbers)...")
+    print(f"Variant: {' | '.join(format_override(o) for o in overrides)}")
+    print(f"Seed: {seed}")
+    print("-" * 60)
+
+    baseline, variant = collect_pairs(simulations, SimConfig(overrides), workers, seed)
+    print_comparison(baseline, variant, confidence)
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+
+def print_report(metrics):
+    """Print the full dungeon run report for a set of merged metrics"""
+    simulations = metrics['runs']
+    weapon_names = list(STARTER_WEAPONS.keys())
+    strategy_names = list(STAT_STRATEGIES.keys())
+
+    victories = metrics['victories']
+    victory_hp = metrics['victory_hp']
+    victory_levels = metrics['victory_levels']
+    victory_times = metrics['victory_times']
+
+    weapon_victories = metrics['weapon_victories']
+    weapon_kills = metrics['weapon_kills']
+    weapon_runs = metrics['weapon_runs']
+
+    strategy_victories = metrics['strategy_victories']
+    strategy_kills = metrics['strategy_kills']
+    strategy_runs = metrics['strategy_runs']
+    strategy_end_str = metrics['strategy_end_str']
+    strategy_end_agi = metrics['strategy_end_agi']
+
+    deaths = metrics['deaths']
+    death_floor = metrics['death_floor']
+    death_room_pct = metrics['death_room_pct']
+    death_hp_before = metrics['death_hp_before']
+    death_level = metrics['death_level']
+    death_str = metrics['death_str']
+    death_agi = metrics['death_agi']
+    death_pdef = metrics['death_pdef']
+    death_max_hp = metrics['death_max_hp']
+    death_weapon = metrics['death_weapon']
+    death_strategy = metrics['death_strategy']
+    killers = metrics['killers']
+
+    floor_completions = metrics['floor_completions']
+    floor_completion_hp = metrics['floor_completion_hp']
+    floor_completion_level = metrics['floor_completion_level']
+    floor_kills = metrics['floor_kills']
+
+    total_kills_per_run = metrics['total_kills_per_run']
+    total_rooms_per_run = metrics['total_rooms_per_run']
+
+    global_analytics = metrics['global_analytics']
+
+    win_rate = (victories / simulations) * 100
 
     print("\n" + "=" * 60)
     print("                    DUNGEON RUN REPORT")
@@ -786,22 +1962,21 @@ def run_simulation():
     print("                      VICTORY ANALYSIS")
     print("-" * 60)
 
-    print(f"\n  🏆 VICTORY RATE: {win_rate:.1f}% ({victories}/{SIMULATIONS})")
+    print(f"\n  🏆 VICTORY RATE: {win_rate:.1f}% ({victories}/{simulations})")
 
     if victories > 0:
-        print(f"\n  Avg HP at Victory:     {statistics.mean(victory_hp):.1f}")
-        print(f"  Avg Level at Victory:  {statistics.mean(victory_levels):.1f}")
-        print(f"  Avg Time to Complete:  {statistics.mean(victory_times):.1f} minutes")
+        print(f"\n  Avg HP at Victory:     {victory_hp.stats.mean:.1f}")
+        print(f"  Avg Level at Victory:  {victory_levels.mean:.1f}")
+        print(f"  Avg Time to Complete:  {victory_times.mean:.1f} minutes")
 
         # Victory HP distribution
-        victory_hp_sorted = sorted(victory_hp)
-        print(f"\n  Victory HP Distribution:")
-        print(f"    Min:   {min(victory_hp)}")
-        print(f"    25th%: {percentile(victory_hp_sorted, 0.25)}")
-        print(f"    50th%: {percentile(victory_hp_sorted, 0.50)}")
-        print(f"    Max:   {max(victory_hp)}")
-
-        close_victories = len([hp for hp in victory_hp if hp < 30])
+        print("\n  Victory HP Distribution:")
+        print(f"    Min:   {victory_hp.stats.min}")
+        print(f"    25th%: {victory_hp.quantile(0.25)}")
+        print(f"    50th%: {victory_hp.quantile(0.50)}")
+        print(f"    Max:   {victory_hp.stats.max}")
+
+        close_victories = victory_hp.hist.below(30)
         print(f"\n  Close Victories (HP<30): {(close_victories/victories)*100:.1f}%")
 
     # --- WEAPON PERFORMANCE ---
@@ -835,7 +2010,7 @@ def run_simulation():
         print(f"    └─ {dmg_type} damage | {bar}")
 
     # Show damage type summary
-    print(f"\n  Win Rate by Damage Type:")
+    print("\n  Win Rate by Damage Type:")
     dmg_type_stats = {}
     for w in weapon_names:
         dmg_type = STARTER_WEAPONS[w]['damageType']
@@ -882,13 +2057,13 @@ def run_simulation():
         print(f"    └─ {bar}")
 
         # Show average ending stats for this strategy
-        if strategy_end_str[s]:
-            avg_str = statistics.mean(strategy_end_str[s])
-            avg_agi = statistics.mean(strategy_end_agi[s])
+        if strategy_end_str[s].count:
+            avg_str = strategy_end_str[s].mean
+            avg_agi = strategy_end_agi[s].mean
             print(f"    └─ Final Stats: STR={avg_str:.1f}  AGI={avg_agi:.1f}")
 
     # Summary comparison
-    print(f"\n  Strategy Win Rate Summary:")
+    print("\n  Strategy Win Rate Summary:")
     for s, runs, s_win_rate, kills, avg_kills in strat_stats:
         strat_name = STAT_STRATEGIES[s]['name']
         bar = "█" * int(s_win_rate / 5) + "░" * (20 - int(s_win_rate / 5))
@@ -903,10 +2078,10 @@ def run_simulation():
     print("  " + "-" * 44)
 
     for f in range(1, FLOORS_TO_WIN + 1):
-        clear_pct = (floor_completions[f] / SIMULATIONS) * 100
-        avg_hp = statistics.mean(floor_completion_hp[f]) if floor_completion_hp[f] else 0
-        avg_lvl = statistics.mean(floor_completion_level[f]) if floor_completion_level[f] else 0
-        avg_kills = statistics.mean(floor_kills[f]) if floor_kills[f] else 0
+        clear_pct = (floor_completions[f] / simulations) * 100
+        avg_hp = floor_completion_hp[f].mean
+        avg_lvl = floor_completion_level[f].mean
+        avg_kills = floor_kills[f].mean
 
         bar = "█" * int(clear_pct / 5) + "░" * (20 - int(clear_pct / 5))
         print(f"  Floor {f}  {clear_pct:>6.1f}%  {avg_hp:>7.1f}  {avg_lvl:>7.1f}  {avg_kills:>9.1f}")
@@ -917,68 +2092,62 @@ def run_simulation():
     print("-" * 60)
 
     if deaths > 0:
-        print(f"\n  Total Deaths: {deaths} ({(deaths/SIMULATIONS)*100:.1f}%)")
+        print(f"\n  Total Deaths: {deaths} ({(deaths/simulations)*100:.1f}%)")
 
-        print(f"\n  Deaths by Floor:")
-        floor_death_counts = Counter(death_floor)
+        print("\n  Deaths by Floor:")
         for f in range(1, FLOORS_TO_WIN + 1):
-            count = floor_death_counts.get(f, 0)
+            count = death_floor.get(f, 0)
             pct = (count / deaths) * 100 if deaths > 0 else 0
             bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
             print(f"    Floor {f}: {bar} {pct:5.1f}%")
 
-        print(f"\n  Death Location (% through floor):")
-        death_room_pct_sorted = sorted(death_room_pct)
-        print(f"    Early (0-33%):  {len([x for x in death_room_pct if x <= 33])/deaths*100:.1f}%")
-        print(f"    Mid (34-66%):   {len([x for x in death_room_pct if 33 < x <= 66])/deaths*100:.1f}%")
-        print(f"    Late (67-100%): {len([x for x in death_room_pct if x > 66])/deaths*100:.1f}%")
-
-        print(f"\n  HP Before Fatal Fight:")
-        death_hp_sorted = sorted(death_hp_before)
-        print(f"    Min:   {min(death_hp_before)}")
-        print(f"    25th%: {percentile(death_hp_sorted, 0.25)}")
-        print(f"    50th%: {percentile(death_hp_sorted, 0.50)}")
-        print(f"    Max:   {max(death_hp_before)}")
-
-        burst = len([hp for hp in death_hp_before if hp >= 60])
-        attrition = len([hp for hp in death_hp_before if hp < 40])
+        print("\n  Death Location (% through floor):")
+        early, mid, late = death_room_pct.counts
+        print(f"    Early (0-33%):  {early/deaths*100:.1f}%")
+        print(f"    Mid (34-66%):   {mid/deaths*100:.1f}%")
+        print(f"    Late (67-100%): {late/deaths*100:.1f}%")
+
+        print("\n  HP Before Fatal Fight:")
+        print(f"    Min:   {death_hp_before.stats.min}")
+        print(f"    25th%: {death_hp_before.quantile(0.25)}")
+        print(f"    50th%: {death_hp_before.quantile(0.50)}")
+        print(f"    Max:   {death_hp_before.stats.max}")
+
+        burst = death_hp_before.hist.above(60)
+        attrition = death_hp_before.hist.below(40)
         print(f"\n    Burst Deaths (HP>=60):    {(burst/deaths)*100:.1f}%")
         print(f"    Attrition Deaths (HP<40): {(attrition/deaths)*100:.1f}%")
 
-        print(f"\n  Level at Death:")
-        level_death_counts = Counter(death_level)
-        for lvl in sorted(level_death_counts.keys()):
-            count = level_death_counts[lvl]
+        print("\n  Level at Death:")
+        for lvl in sorted(death_level.keys()):
+            count = death_level[lvl]
             pct = (count / deaths) * 100
             bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
             print(f"    Level {lvl}: {bar} {pct:5.1f}%")
 
-        print(f"\n  Player Stats at Death:")
-        print(f"    STR:    Min={min(death_str):>3}  Avg={statistics.mean(death_str):>5.1f}  Max={max(death_str):>3}")
-        print(f"    AGI:    Min={min(death_agi):>3}  Avg={statistics.mean(death_agi):>5.1f}  Max={max(death_agi):>3}")
-        print(f"    pDef:   Min={min(death_pdef):>3}  Avg={statistics.mean(death_pdef):>5.1f}  Max={max(death_pdef):>3}")
-        print(f"    Max HP: Min={min(death_max_hp):>3}  Avg={statistics.mean(death_max_hp):>5.1f}  Max={max(death_max_hp):>3}")
+        print("\n  Player Stats at Death:")
+        print(f"    STR:    Min={death_str.min:>3}  Avg={death_str.mean:>5.1f}  Max={death_str.max:>3}")
+        print(f"    AGI:    Min={death_agi.min:>3}  Avg={death_agi.mean:>5.1f}  Max={death_agi.max:>3}")
+        print(f"    pDef:   Min={death_pdef.min:>3}  Avg={death_pdef.mean:>5.1f}  Max={death_pdef.max:>3}")
+        print(f"    Max HP: Min={death_max_hp.min:>3}  Avg={death_max_hp.mean:>5.1f}  Max={death_max_hp.max:>3}")
 
         # Deaths by strategy
-        print(f"\n  Deaths by Stat Strategy:")
-        strategy_death_counts = Counter(death_strategy)
-        for strat, count in strategy_death_counts.most_common():
+        print("\n  Deaths by Stat Strategy:")
+        for strat, count in ranked(death_strategy):
             strat_total_runs = strategy_runs[strat]
             death_rate = (count / strat_total_runs) * 100 if strat_total_runs > 0 else 0
             strat_name = STAT_STRATEGIES[strat]['name']
             print(f"    {strat_name:<20} {count:>4} deaths ({death_rate:>5.1f}% of runs)")
 
         # Deaths by weapon type
-        print(f"\n  Deaths by Weapon:")
-        weapon_death_counts = Counter(death_weapon)
-        for weapon, count in weapon_death_counts.most_common():
+        print("\n  Deaths by Weapon:")
+        for weapon, count in ranked(death_weapon):
             weapon_total_runs = weapon_runs[weapon]
             death_rate = (count / weapon_total_runs) * 100 if weapon_total_runs > 0 else 0
             print(f"    {weapon:<20} {count:>4} deaths ({death_rate:>5.1f}% of runs)")
 
-        print(f"\n  Top Killers:")
-        killer_counts = Counter(killers)
-        for name, count in killer_counts.most_common(5):
+        print("\n  Top Killers:")
+        for name, count in ranked(killers, 5):
             pct = (count / deaths) * 100
             bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
             print(f"    {name:<20} {bar} {pct:5.1f}%")
@@ -1016,8 +2185,8 @@ def run_simulation():
     print("                      ECONOMY REPORT")
     print("-" * 60)
 
-    avg_kills = statistics.mean(total_kills_per_run)
-    avg_rooms = statistics.mean(total_rooms_per_run)
+    avg_kills = total_kills_per_run.mean
+    avg_rooms = total_rooms_per_run.mean
 
     print(f"\n  Avg Kills per Run:   {avg_kills:.1f}")
     print(f"  Avg Rooms Cleared:   {avg_rooms:.1f}")
@@ -1027,7 +2196,8 @@ def run_simulation():
         print(f"  Avg HP/Visit:        {global_analytics['total_hp_restored']/global_analytics['altar_visits']:.1f}")
         print(f"  Avg Items/Visit:     {global_analytics['total_sacrificed']/global_analytics['altar_visits']:.1f}")
 
-    close_call_rate = (global_analytics['close_calls'] / len(global_analytics['hp_after_rooms'])) * 100 if global_analytics['hp_after_rooms'] else 0
+    rooms_survived = global_analytics['hp_after_rooms'].count
+    close_call_rate = (global_analytics['close_calls'] / rooms_survived) * 100 if rooms_survived else 0
     print(f"\n  Close Calls (<20% HP after room): {close_call_rate:.1f}%")
 
     # --- RECOMMENDATIONS ---
@@ -1047,8 +2217,8 @@ def run_simulation():
 
     # Floor-specific issues
     for f in range(1, FLOORS_TO_WIN + 1):
-        clear_pct = (floor_completions[f] / SIMULATIONS) * 100
-        prev_clear = (floor_completions[f-1] / SIMULATIONS) * 100 if f > 1 else 100
+        clear_pct = (floor_completions[f] / simulations) * 100
+        prev_clear = (floor_completions[f-1] / simulations) * 100 if f > 1 else 100
         drop = prev_clear - clear_pct
 
         if drop > 40:
@@ -1062,7 +2232,7 @@ def run_simulation():
 
         # Check killer concentration
         if killers:
-            top_killer, top_count = killer_counts.most_common(1)[0]
+            top_killer, top_count = ranked(killers, 1)[0]
             if (top_count / deaths) * 100 > 35:
                 recommendations.append(f"- {top_killer} causes {(top_count/deaths)*100:.0f}% of deaths. Consider nerfs.")
 
@@ -1088,9 +2258,258 @@ def run_simulation():
 
     print("\n" + "=" * 60)
 
+def print_intervals(metrics, target, confidence=CI_CONFIDENCE, relative=False):
+    """Print the confidence intervals a --target-ci run stopped at"""
+    print("\n" + "=" * 60)
+    print(f"               {confidence*100:.0f}% CONFIDENCE INTERVALS")
+    print("=" * 60)
+
+    print(f"\n  Runs: {metrics['runs']} | Target half-width: ±{target*100:.2f}%" + (" of the rate" if relative else ""))
+    print(f"\n  {'Metric':<24} {'Rate':>7} {'Low':>7} {'High':>7} {'±':>6}")
+    print("  " + "-" * 55)
+    for label, rate, low, high in engine.confidence_intervals(interval_targets(metrics), confidence):
+        half = (high - low) / 2
+        flag = "" if target_met(rate, low, high, target, relative) else "  (not met)"
+        print(f"  {label:<24} {rate*100:>6.2f}% {low*100:>6.2f}% {high*100:>6.2f}% {half*100:>5.2f}%{flag}")
+
+    print("\n" + "=" * 60)
+
+def print_comparison(baseline, variant, confidence=CI_CONFIDENCE):
+    """Print paired deltas from collect_pairs() results"""
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    print("\n" + "=" * 60)
+    print("                  A/B PAIRED COMPARISON")
+    print("=" * 60)
+
+    print(f"\n  Runs: {len(baseline)}")
+    print(f"\n  {'Metric':<20} {'Base':>7} {'Variant':>7} {'Delta':>7} {'SE':>6} {'z':>6} {'VR':>6}")
+    print("  " + "-" * 65)
+    for label, a, b in paired_metrics(baseline, variant):
+        mean_a, mean_b, delta, se, se_ind = paired_delta(a, b)
+        score = delta / se if se > 0 else 0.0
+        reduction = f"{(se_ind / se) ** 2:>5.1f}x" if se > 0 else f"{'-':>6}"
+        if label == 'Kills per run':
+            print(f"  {label:<20} {mean_a:>7.2f} {mean_b:>7.2f} {delta:>+7.2f} {se:>6.3f} {score:>+6.1f} {reduction}")
+        else:
+            print(f"  {label:<20} {mean_a*100:>6.2f}% {mean_b*100:>6.2f}% {delta*100:>+6.2f}% "
+                  f"{se*100:>5.2f}% {score:>+6.1f} {reduction}")
+
+    # Runs needed to pin the victory-rate delta to ±1 point
+    _, a, b = paired_metrics(baseline, variant)[0]
+    _, _, _, se, se_ind = paired_delta(a, b)
+    n = len(a)
+    print("\n  SE: paired standard error | VR: variance reduction vs. independent batches")
+    print(f"  Runs for a ±1.00% victory-rate delta at {confidence*100:.0f}%: "
+          f"{math.ceil(n * (z * se / 0.01) ** 2)} paired vs. "
+          f"{math.ceil(n * (z * se_ind / 0.01) ** 2)} independent")
+
+    print("\n" + "=" * 60)
+
+def print_analytic_report(solved, check=None):
+    """
+    Print outcome probabilities from solve_all() results. With check (the
+    same solve on a coarser grid) the victory rate comes with the difference
+    between the two, an estimate of the grid's error.
+    """
+    weapon_names = list(STARTER_WEAPONS.keys())
+    strategy_names = list(STAT_STRATEGIES.keys())
+
+    def mix(pick, rows=solved):
+        weight = sum(w for _, _, w, _ in rows)
+        return sum(w * pick(r) for _, _, w, r in rows) / weight if weight else 0.0
+
+    victory = mix(lambda r: r['victory'])
+    death_total = 1.0 - victory
+
+    print("\n" + "=" * 60)
+    print("                 ANALYTIC DUNGEON RUN REPORT")
+    print("=" * 60)
+
+    print(f"\n  🏆 VICTORY RATE: {victory*100:.2f}%")
+    if check:
+        coarse = mix(lambda r: r['victory'], check)
+        print(f"     Grid error: ±{abs(victory - coarse)*100:.2f} pts "
+              f"(HP/{ANALYTIC_CHECK_GRID[0]} | XP/{ANALYTIC_CHECK_GRID[1]} gives {coarse*100:.2f}%)")
+    print(f"  Expected Kills per Run: {mix(lambda r: r['kills']):.2f}")
+    print(f"  Avg Level at Victory:   {mix(lambda r: r['victory'] * r['victory_level']) / victory:.2f}"
+          if victory else "  Avg Level at Victory:   -")
+
+    print("\n" + "-" * 60)
+    print("                   WEAPON PERFORMANCE")
+    print("-" * 60)
+    print(f"\n  {'Weapon':<20} {'Win%':>8} {'Avg Kills':>10}")
+    print("  " + "-" * 40)
+    for w in weapon_names:
+        rows = [row for row in solved if row[0] == w]
+        win_rate = mix(lambda r: r['victory'], rows) * 100
+        bar = "█" * int(win_rate / 5) + "░" * (20 - int(win_rate / 5))
+        print(f"  {w:<20} {win_rate:>7.2f}% {mix(lambda r: r['kills'], rows):>10.2f}")
+        print(f"    └─ {STARTER_WEAPONS[w]['damageType']} damage | {bar}")
+
+    print("\n" + "-" * 60)
+    print("                 STAT STRATEGY PERFORMANCE")
+    print("-" * 60)
+    print(f"\n  {'Strategy':<20} {'Win%':>8} {'Avg Kills':>10}")
+    print("  " + "-" * 40)
+    for s in strategy_names:
+        rows = [row for row in solved if row[1] == s]
+        if not rows:
+            continue
+        win_rate = mix(lambda r: r['victory'], rows) * 100
+        print(f"  {STAT_STRATEGIES[s]['name']:<20} {win_rate:>7.2f}% {mix(lambda r: r['kills'], rows):>10.2f}")
+
+    print("\n" + "-" * 60)
+    print("                    FLOOR PROGRESSION")
+    print("-" * 60)
+    for f in range(1, FLOORS_TO_WIN + 1):
+        clear_pct = mix(lambda r: r['floor_clear'][f]) * 100
+        bar = "█" * int(clear_pct / 5) + "░" * (20 - int(clear_pct / 5))
+        print(f"  Floor {f}  {bar} {clear_pct:6.2f}%")
+
+    if death_total > 0:
+        print("\n" + "-" * 60)
+        print("                      DEATH ANALYSIS")
+        print("-" * 60)
+
+        print("\n  Deaths by Floor:")
+        for f in range(1, FLOORS_TO_WIN + 1):
+            pct = mix(lambda r: sum(q for (fl, _), q in r['death'].items() if fl == f)) / death_total * 100
+            bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
+            print(f"    Floor {f}: {bar} {pct:5.1f}%")
+
+        print("\n  Death Location (% through floor):")
+        def location(r, lo, hi):
+            return sum(q for (fl, room), q in r['death'].items()
+                       if lo < room / FLOOR_CONFIG.get(fl, FLOOR_CONFIG[3])['rooms'] * 100 <= hi)
+        print(f"    Early (0-33%):  {mix(lambda r: location(r, -1, 33)) / death_total * 100:.1f}%")
+        print(f"    Mid (34-66%):   {mix(lambda r: location(r, 33, 66)) / death_total * 100:.1f}%")
+        print(f"    Late (67-100%): {mix(lambda r: location(r, 66, 100)) / death_total * 100:.1f}%")
+
+        print("\n  Killers:")
+        killers = {name: mix(lambda r: r['killers'].get(name, 0.0)) for name in MONSTER_STATS}
+        for name, q in sorted(killers.items(), key=lambda item: item[1], reverse=True):
+            pct = q / death_total * 100
+            bar = "█" * int(pct / 5) + "░" * (20 - int(pct / 5))
+            print(f"    {name:<20} {bar} {pct:5.1f}%")
+
+    print("\n" + "=" * 60)
+
+# ==============================================================================
+# PROFILING
+# ==============================================================================
+#
+# What --profile times (see sim_profile). Phases are looked up on this module
+# at call time, which is why run_floor() rolls spawns through spawn_enemy().
+
+def profile_phases():
+    """(phase, owner, attribute) of every callable --profile times"""
+    import batch_combat
+    import run_store
+    import streaming_stats
+
+    module = sys.modules[__name__]
+    phases = [
+        ('spawn rolls', module, 'spawn_enemy'),
+        ('fight()', module, 'fight'),
+        ('fight()', batch_combat, 'resolve_batch'),
+        ('fight columns', batch_combat, 'stack_fights'),
+        ('matchups', module, 'matchup_params'),
+        ('get_damage()', module, 'get_damage'),
+        ('level-ups', module, 'check_level_up'),
+        ('loot', engine, 'drop_loot'),
+        ('altars', engine, 'visit_altar'),
+        ('analytics', module, 'run_row'),
+        ('analytics', module, 'merge_metrics'),
+        ('analytics', run_store.RunTable, 'add'),
+    ]
+    for cls in (streaming_stats.RunningStats, streaming_stats.Summary,
+                streaming_stats.QuantileSketch, streaming_stats.Histogram):
+        phases.append(('analytics', cls, 'add'))
+    return phases
+
+def profile_counters():
+    """(label, owner, attribute, size) of the runs and fights --profile counts"""
+    import batch_combat
+
+    module = sys.modules[__name__]
+    return [
+        ('runs', module, 'simulate_run', None),
+        ('fights', engine, 'fight', None),
+        ('fights', batch_combat, 'resolve_batch', lambda S, F, rng: S.shape[1]),
+    ]
+
 # ==============================================================================
 # ENTRY POINT
 # ==============================================================================
 
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo dungeon run simulator")
+    parser.add_argument('--runs', type=int, default=SIMULATIONS, help="number of runs to simulate")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes (0 = all cores)")
+    parser.add_argument('--seed', type=int, default=None, help="master seed (random if omitted)")
+    parser.add_argument('--target-ci', type=float, default=None,
+                        help="run until every key rate's CI half-width is at most this (e.g. 0.01)")
+    parser.add_argument('--confidence', type=float, default=CI_CONFIDENCE, help="confidence level for --target-ci")
+    parser.add_argument('--max-runs', type=int, default=MAX_SEQUENTIAL_RUNS, help="run cap for --target-ci")
+    parser.add_argument('--relative', action='store_true', help="--target-ci is a fraction of each rate")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true', help="resolve fights with the NumPy batch engine (10-20%% faster from a few thousand runs)")
+    mode.add_argument('--analytic', action='store_true',
+                        help="approximate offline solver: outcome probabilities of a Markov chain on "
+                             "coarse HP/XP grids, with the grid error printed (about half a minute)")
+    parser.add_argument('--variant', type=functools.partial(parse_override, constants=config_constants()),
+                        action='append', metavar='NAME.key=value',
+                        help="compare against this config change on common random numbers (repeatable)")
+    parser.add_argument('--store', metavar='PATH', default=None,
+                        help="also write every run as a row of a columnar .npz table")
+    parser.add_argument('--report', metavar='PATH', default=None,
+                        help="print the report for a table written by --store instead of simulating")
+    parser.add_argument('--replay', type=int, default=None, metavar='RUN',
+                        help="re-simulate run RUN of the --seed batch alone, with a fight-by-fight trace")
+    parser.add_argument('--checkpoint', metavar='PATH', default=None,
+                        help=f"save progress to this file every {CHECKPOINT_SECONDS}s")
+    parser.add_argument('--resume', metavar='PATH', default=None,
+                        help="continue the batch saved in a --checkpoint file, with its settings")
+    sim_profile.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.store and (args.variant or args.analytic or args.report):
+        parser.error("--store can't be combined with --variant, --analytic or --report")
+    if (args.checkpoint or args.resume) and (args.variant or args.analytic or args.report):
+        parser.error("--checkpoint and --resume can't be combined with --variant, --analytic or --report")
+    if args.replay is not None:
+        if args.seed is None:
+            parser.error("--replay needs the --seed of the batch")
+        if args.batch or args.analytic or args.variant:
+            parser.error("--replay can't be combined with --batch, --analytic or --variant")
+    if args.variant and (args.batch or args.analytic or args.target_ci):
+        parser.error("--variant can't be combined with --batch, --analytic or --target-ci")
+    if sim_profile.requested(args):
+        if args.resume or args.report:
+            parser.error("--profile, --profile-out and --flamegraph can't be combined with --resume or --report")
+        # The instrumentation only sees this process
+        args.workers = 1
+
+    with sim_profile.profiling(args, profile_phases, profile_counters):
+        dispatch(args)
+
+def dispatch(args):
+    """Run whichever mode the command line asked for"""
+    if args.replay is not None:
+        engine.replay_run(sys.modules[__name__], args.seed, args.replay, fight, DEFAULT_CONFIG)
+    elif args.resume:
+        resume_simulation(args.resume)
+    elif args.report:
+        engine.run_report(sys.modules[__name__], args.report, 'dungeon_run_simulator')
+    elif args.variant:
+        run_comparison(args.runs, args.variant, args.workers, args.seed, args.confidence)
+    elif args.analytic:
+        run_analytic(args.workers)
+    else:
+        run_simulation(args.runs, args.workers, args.seed, args.batch,
+                       args.target_ci, args.confidence, args.max_runs, args.relative, args.store,
+                       args.checkpoint)
+
 if __name__ == "__main__":
-    run_simulation()
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import ast
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+import dungeon_run_simulator as sim
+from sim_engine import parse_override, wilson_interval
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+RUNS_PER_POINT = 2000
+WORKERS = 0          # Worker processes (0 = one per CPU core)
+CONFIDENCE = 0.95    # Confidence level of the reported intervals
+OUTPUT = 'sweep_results.csv'
+
+# ==============================================================================
+# PARAMETER SPACE
+# ==============================================================================
+
+# A parameter is given as NAME.key=spec, using the same paths as the
+# simulator's --variant. The spec is one of
+#   [a, b, c]    explicit values
+#   lo:hi:n      n evenly spaced values from lo to hi (ints stay ints)
+#   lo:hi        a range; random search only, uniform (randint for ints)
+#   value        a single fixed value
+# Every point runs on the same master seed, so points are compared on common
+# random numbers.
+
+def parse_param(text):
+    """Parse a --param spec into (keys, choices, span); one of the last two is None"""
+    keys, value = parse_override(text, sim.config_constants())
+    if isinstance(value, list):
+        if not value:
+            raise argparse.ArgumentTypeError(f"no values given for {text!r}")
+        return (keys, value, None)
+    if isinstance(value, str) and ':' in value:
+        try:
+            bounds = [ast.literal_eval(part.strip()) for part in value.split(':')]
+        except (ValueError, SyntaxError):
+            raise argparse.ArgumentTypeError(f"bad range {value!r}, expected lo:hi or lo:hi:n")
+        if len(bounds) not in (2, 3) or not all(isinstance(b, (int, float)) for b in bounds):
+            raise argparse.ArgumentTypeError(f"bad range {value!r}, expected lo:hi or lo:hi:n")
+        if len(bounds) == 3 and (not isinstance(bounds[2], int) or bounds[2] < 1):
+            raise argparse.ArgumentTypeError(f"bad point count in {value!r}")
+        return (keys, None, tuple(bounds) if len(bounds) == 3 else (bounds[0], bounds[1], None))
+    return (keys, [value], None)
+
+def param_name(param):
+    """Column name of a parameter, e.g. FLOOR_CONFIG.1.rooms"""
+    return '.'.join(str(k) for k in param[0])
+
+def linspace(lo, hi, n):
+    """n evenly spaced values from lo to hi; integral when lo, hi and the step are"""
+    if n == 1:
+        return [lo]
+    step = (hi - lo) / (n - 1)
+    if isinstance(lo, int) and isinstance(hi, int) and step == int(step):
+        return [lo + i * int(step) for i in range(n)]
+    return [round(lo + i * step, 10) for i in range(n)]
+
+def grid_points(params):
+    """Every combination of the parameters' values, as lists of overrides"""
+    axes = []
+    for keys, choices, span in params:
+        if choices is None:
+            lo, hi, n = span
+            if n is None:
+                raise ValueError(f"{'.'.join(str(k) for k in keys)}: grid search needs lo:hi:n")
+            choices = linspace(lo, hi, n)
+        axes.append([(keys, value) for value in choices])
+    return [list(point) for point in itertools.product(*axes)]
+
+def random_points(params, samples, seed=None):
+    """samples points drawn independently and uniformly from each parameter's values or range"""
+    rng = random.Random(seed)
+    points = []
+    for _ in range(samples):
+        point = []
+        for keys, choices, span in params:
+            if choices is not None:
+                value = rng.choice(choices)
+            else:
+                lo, hi, n = span
+                if n is not None:
+                    value = rng.choice(linspace(lo, hi, n))
+                elif isinstance(lo, int) and isinstance(hi, int):
+                    value = rng.randint(lo, hi)
+                else:
+                    value = rng.uniform(lo, hi)
+            point.append((keys, value))
+        points.append(point)
+    return points
+
+# ==============================================================================
+# EXECUTION
+# ==============================================================================
+
+def point_metrics(metrics, confidence=CONFIDENCE):
+    """[(metric, value, low, high, trials)] for one point's merged run metrics"""
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    rows = []
+    for label, successes, trials in sim.interval_targets(metrics):
+        low, high = wilson_interval(successes, trials, z)
+        rows.append((label, successes / trials if trials else 0.0, low, high, trials))
+
+    kills = metrics['total_kills_per_run']
+    half = z * kills.stdev / math.sqrt(kills.count) if kills.count > 1 else 0.0
+    rows.append(('Kills per run', kills.mean, kills.mean - half, kills.mean + half, kills.count))
+    return rows
+
+def run_point(task):
+    """
+    Simulate one parameter point: compile its overrides into a config and
+    run the same chunks collect_metrics() would.
+
+    task: (point_index, overrides, runs, seed, confidence)
+    Returns: (point_index, [(metric, value, low, high, trials)])
+    """
+    point_index, overrides, runs, seed, confidence = task
+    cfg = sim.SimConfig(overrides)
+    metrics = sim.new_metrics(cfg)
+    for chunk in sim.plan_chunks(runs, seed, cfg=cfg):
+        sim.merge_metrics(metrics, sim.simulate_chunk(chunk))
+    return (point_index, point_metrics(metrics, confidence))
+
+def run_sweep(params, points, runs=RUNS_PER_POINT, workers=WORKERS, seed=None,
+              confidence=CONFIDENCE, output=OUTPUT):
+    """
+    Run every point and write a tidy table to output, one row per
+    (point, metric). Rows are written as points finish, so a long sweep
+    that gets interrupted keeps what it has.
+
+    Points are farmed out to a process pool whose workers stay alive for the
+    whole sweep, so interpreter start-up and module import happen once per
+    worker rather than once per point.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(points)))
+
+    names = [param_name(p) for p in params]
+    tasks = [(i, point, runs, seed, confidence) for i, point in enumerate(points)]
+
+    print(f"Sweeping {len(points)} points x {runs} runs over {', '.join(names)}")
+    print(f"Workers: {workers} | Seed: {seed} | Output: {output}")
+    print("-" * 60)
+
+    start = time.perf_counter()
+    with open(output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['point'] + names + ['metric', 'value', 'low', 'high', 'trials'])
+
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            results = pool.imap_unordered(run_point, tasks) if pool else map(run_point, tasks)
+            for done, (index, rows) in enumerate(results, 1):
+                values = [value for _, value in points[index]]
+                for metric, value, low, high, trials in rows:
+                    writer.writerow([index] + values + [metric, f"{value:.6g}", f"{low:.6g}",
+                                                         f"{high:.6g}", trials])
+                f.flush()
+
+                victory = rows[0][1]
+                label = ' '.join(f"{n}={v:.6g}" if isinstance(v, float) else f"{n}={v!r}"
+                                 for n, v in zip(names, values))
+                elapsed = time.perf_counter() - start
+                print(f"  [{done}/{len(points)}] {label} -> victory {victory*100:.2f}% ({elapsed:.0f}s)")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    print("-" * 60)
+    print(f"Wrote {len(points)} points to {output} in {time.perf_counter() - start:.0f}s")
+
+# ==============================================================================
+# ENTRY POINT
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep over dungeon_run_simulator config constants")
+    parser.add_argument('--param', type=parse_param, action='append', required=True, metavar='NAME.key=spec',
+                        help="parameter to sweep: [a, b], lo:hi:n, lo:hi (random search) or a fixed value")
+    parser.add_argument('--random', type=int, default=None, metavar='N',
+                        help="draw N random points instead of the full grid")
+    parser.add_argument('--runs', type=int, default=RUNS_PER_POINT, help="runs per point")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes (0 = all cores)")
+    parser.add_argument('--seed', type=int, default=None, help="master seed shared by every point")
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE, help="confidence level of the intervals")
+    parser.add_argument('--out', default=OUTPUT, help="CSV file for the results table")
+    args = parser.parse_args()
+
+    # One seed for both the random points and the runs, so a printed seed
+    # reproduces the whole sweep
+    if args.seed is None:
+        args.seed = random.SystemRandom().randrange(2**32)
+
+    if args.random is not None:
+        points = random_points(args.param, args.random, args.seed)
+    else:
+        try:
+            points = grid_points(args.param)
+        except ValueError as e:
+            parser.error(str(e))
+    if not points:
+        sys.exit("Nothing to sweep")
+
+    run_sweep(args.param, points, args.runs, args.workers, args.seed, args.confidence, args.out)
+
+if __name__ == "__main__":
+    main()
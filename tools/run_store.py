@@ -0,0 +1,129 @@
+import json
+from collections import Counter
+
+# ==============================================================================
+# PER-RUN RESULT STORE
+# ==============================================================================
+#
+# Every simulated run can be kept as one row of a columnar table and written
+# to a NumPy .npz archive, one array per column:
+#   numbers and flags   1-D arrays (int32 / float64 / bool)
+#   names               categorical: int16 codes (-1 for None) plus a
+#                       '<column>.levels' array of the names
+#   fixed-length lists  2-D arrays, e.g. one column per floor or monster
+# A JSON 'meta' entry records which simulator wrote the file and how. The
+# archive loads without pickle, and reports are rebuilt from it with
+# vectorized group-bys instead of rerunning the simulation.
+
+class RunTable:
+    """
+    Per-run rows, held column-wise while a batch runs.
+
+    Like the streaming accumulators it has add() and merge(), so chunk
+    tables fold together in chunk order through merge_metrics().
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.count = 0
+
+    def add(self, row):
+        for name, value in row.items():
+            self.columns.setdefault(name, [None] * self.count).append(value)
+        self.count += 1
+
+    def merge(self, other):
+        for name in other.columns.keys() - self.columns.keys():
+            self.columns[name] = [None] * self.count
+        for name, values in self.columns.items():
+            values.extend(other.columns.get(name, [None] * other.count))
+        self.count += other.count
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def save(self, path, meta=None):
+        """Write the table to path as a compressed .npz archive"""
+        import numpy as np
+
+        arrays = {}
+        for name, values in self.columns.items():
+            sample = next((v for v in values if v is not None), None)
+            if sample is None or isinstance(sample, str):
+                levels = sorted({v for v in values if v is not None})
+                index = {level: code for code, level in enumerate(levels)}
+                arrays[name] = np.array([index.get(v, -1) for v in values], dtype=np.int16)
+                arrays[f"{name}.levels"] = np.array(levels, dtype=str)
+            elif isinstance(sample, bool):
+                arrays[name] = np.array(values, dtype=bool)
+            else:
+                array = np.array(values)
+                arrays[name] = array.astype(np.int32 if array.dtype.kind == 'i' else np.float64)
+        arrays['meta'] = np.array(json.dumps(dict(meta or {}, runs=self.count)))
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+class RunData:
+    """
+    A stored run table loaded back as NumPy columns.
+
+    data[name] is a column's array (codes for categorical columns);
+    counts() and sums() are the group-bys the reports are built from.
+    """
+
+    def __init__(self, arrays):
+        self.meta = json.loads(str(arrays['meta']))
+        self.levels = {name[:-len('.levels')]: tuple(arrays[name].tolist())
+                       for name in arrays if name.endswith('.levels')}
+        self.columns = {name: arrays[name] for name in arrays
+                        if name != 'meta' and not name.endswith('.levels')}
+        self.count = self.meta['runs']
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def mask(self, name, level):
+        """Boolean mask of the runs whose categorical column is level"""
+        import numpy as np
+
+        if level not in self.levels[name]:
+            return np.zeros(self.count, dtype=bool)
+        return self.columns[name] == self.levels[name].index(level)
+
+    def counts(self, name, where=None):
+        """Counter of runs per level of a categorical column"""
+        return self.sums(name, None, where)
+
+    def sums(self, name, values=None, where=None):
+        """Counter of values (or of runs, when values is None) summed per level"""
+        import numpy as np
+
+        codes = self.columns[name]
+        if where is not None:
+            codes = codes[where]
+            values = values[where] if values is not None else None
+        present = codes >= 0
+        totals = np.bincount(codes[present], weights=None if values is None else values[present],
+                             minlength=len(self.levels[name]))
+        if values is None or values.dtype.kind in 'iub':
+            totals = totals.astype(np.int64)
+        return Counter({level: totals[code].item() for code, level in enumerate(self.levels[name])
+                        if totals[code]})
+
+def value_counts(values):
+    """Counter of how often each value occurs in a NumPy array"""
+    import numpy as np
+
+    found, counts = np.unique(values, return_counts=True)
+    return Counter(dict(zip(found.tolist(), counts.tolist())))
+
+def load_runs(path):
+    """Load a table written by RunTable.save()"""
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as arrays:
+        return RunData({name: arrays[name] for name in arrays.files})
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import dungeon_run_simulator as sim
+import parameter_sweep
+from sim_engine import parse_override, resolve_fights
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+BENCH_SEED = 20240601
+REPEATS = 3            # Timed passes per workload; the fastest one is reported
+THRESHOLD = 0.10       # Slowdown (or memory growth) over the baseline that counts as a regression
+OUTPUT = 'benchmark_results.json'
+FORMAT_VERSION = 1
+
+# --- WORKLOADS ---
+# Each sized to take over a second per pass, so timer and scheduler noise
+# stays far below THRESHOLD
+FIGHTS_PER_PAIR = 2500  # Fights of a fresh player per monster/weapon pair
+FLOOR_RUNS = 6000       # Fresh players sent through floor 1
+FULL_RUNS = 3000        # Full runs, as run_simulation() collects them
+SWEEP_RUNS = 3500       # Runs of the sweep point
+SWEEP_POINT = ('ALTAR_INTERVAL=4', 'FLOOR_SCALING=0.15')
+
+# ==============================================================================
+# WORKLOADS
+# ==============================================================================
+#
+# Fixed work on fixed seeds: every pass of a workload simulates exactly the
+# same fights, so passes, machines and commits can be compared on time alone.
+# Each workload returns (runs, fights) of what it simulated (None where it
+# doesn't apply). Caches are cleared first so every pass starts cold.
+
+def bench_fights():
+    """One fight of a fresh floor-1 player for every monster/weapon pair, FIGHTS_PER_PAIR times"""
+    random.seed(BENCH_SEED)
+    players = [sim.create_player(weapon) for weapon in sim.STARTER_WEAPONS]
+    fights = 0
+    for _ in range(FIGHTS_PER_PAIR):
+        for m_name in sim.MONSTER_STATS:
+            for player in players:
+                sim.fight(dict(player), m_name, 1)
+                fights += 1
+    return None, fights
+
+def bench_floor():
+    """FLOOR_RUNS fresh players (round-robin over the starter weapons) through run_floor() on floor 1"""
+    weapons = list(sim.STARTER_WEAPONS)
+    fights = 0
+    for run_index in range(FLOOR_RUNS):
+        random.seed(sim.run_stream(BENCH_SEED, run_index))
+        player = sim.create_player(weapons[run_index % len(weapons)])
+        analytics = sim.new_analytics()
+        resolve_fights(sim.run_floor(player, 1, [], analytics), sim.fight)
+        fights += analytics['total_fights']
+    return FLOOR_RUNS, fights
+
+def bench_runs():
+    """FULL_RUNS full runs through collect_metrics(), in-process"""
+    metrics = sim.collect_metrics(FULL_RUNS, workers=1, seed=BENCH_SEED)
+    return metrics['runs'], metrics['global_analytics']['total_fights']
+
+def bench_sweep():
+    """One parameter_sweep point of SWEEP_RUNS runs on SWEEP_POINT's overrides"""
+    overrides = [parse_override(text, sim.config_constants()) for text in SWEEP_POINT]
+    parameter_sweep.run_point((0, overrides, SWEEP_RUNS, BENCH_SEED, parameter_sweep.CONFIDENCE))
+    return SWEEP_RUNS, None
+
+WORKLOADS = {
+    'fights': bench_fights,
+    'floor': bench_floor,
+    'runs': bench_runs,
+    'sweep': bench_sweep,
+}
+
+# ==============================================================================
+# MEASUREMENT
+# ==============================================================================
+
+def clear_caches():
+    sim.matchup_params.cache_clear()
+
+def measure(workload, repeats=REPEATS, memory=True):
+    """
+    Time a workload repeats times and, with memory, trace one more pass for
+    its peak Python heap use (tracemalloc slows the code down, so that pass
+    isn't timed). Returns the workload's result record.
+    """
+    times = []
+    for _ in range(repeats):
+        clear_caches()
+        start = time.perf_counter()
+        runs, fights = workload()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        clear_caches()
+        tracemalloc.start()
+        try:
+            workload()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'seconds': best,
+        'times': times,
+        'runs': runs,
+        'fights': fights,
+        'runs_per_sec': runs / best if runs else None,
+        'fights_per_sec': fights / best if fights else None,
+        'peak_memory': peak,
+    }
+
+def run_benchmarks(names, repeats=REPEATS, memory=True):
+    """Measure the named workloads and return the results document"""
+    results = {
+        'version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': BENCH_SEED,
+        'repeats': repeats,
+        'workloads': {},
+    }
+    for name in names:
+        record = measure(WORKLOADS[name], repeats, memory)
+        results['workloads'][name] = record
+        print_record(name, record)
+    return results
+
+# ==============================================================================
+# BASELINE COMPARISON
+# ==============================================================================
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    [(workload, measure, baseline, current, change, regressed)] for every
+    workload in both documents. Time and peak memory regress when they grow
+    by more than threshold. A workload whose run or fight count differs from
+    the baseline's simulated something else (the simulator's behaviour
+    changed), so it is reported with measure 'workload changed' instead.
+    """
+    rows = []
+    for name, record in results['workloads'].items():
+        base = baseline.get('workloads', {}).get(name)
+        if base is None:
+            continue
+        if (base['runs'], base['fights']) != (record['runs'], record['fights']):
+            rows.append((name, 'workload changed', base['fights'] or base['runs'],
+                         record['fights'] or record['runs'], None, False))
+            continue
+        for measure_name in ('seconds', 'peak_memory'):
+            old, new = base.get(measure_name), record.get(measure_name)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            rows.append((name, measure_name, old, new, change, change > threshold))
+    return rows
+
+def load_results(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: results format {results.get('version')}, expected {FORMAT_VERSION}")
+    return results
+
+def save_results(results, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, path)
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+
+def format_bytes(n):
+    if n < 1024:
+        return f"{n} B"
+    for unit in ('KiB', 'MiB', 'GiB'):
+        n /= 1024
+        if n < 1024 or unit == 'GiB':
+            return f"{n:.1f} {unit}"
+
+def print_record(name, record):
+    rates = []
+    if record['runs_per_sec']:
+        rates.append(f"{record['runs_per_sec']:,.0f} runs/sec")
+    if record['fights_per_sec']:
+        rates.append(f"{record['fights_per_sec']:,.0f} fights/sec")
+    memory = f" | peak {format_bytes(record['peak_memory'])}" if record['peak_memory'] is not None else ""
+    print(f"  {name:<8} {record['seconds']:>7.3f}s  {' | '.join(rates)}{memory}")
+
+def print_comparison(rows, threshold=THRESHOLD):
+    print("-" * 60)
+    print(f"  Against baseline (regression threshold +{threshold*100:.0f}%):")
+    for name, measure_name, old, new, change, regressed in rows:
+        if change is None:
+            print(f"  {name:<8} workload changed ({old} -> {new} simulated), not compared")
+            continue
+        if measure_name == 'seconds':
+            values = f"{old:.3f}s -> {new:.3f}s"
+        else:
+            values = f"{format_bytes(old)} -> {format_bytes(new)}"
+        flag = "REGRESSION" if regressed else "ok"
+        print(f"  {name:<8} {measure_name:<12} {values:<26} {change*100:+6.1f}%  {flag}")
+
+# ==============================================================================
+# ENTRY POINT
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-workload throughput benchmarks for dungeon_run_simulator")
+    parser.add_argument('--only', choices=list(WORKLOADS), action='append', default=None,
+                        help="run only this workload (repeatable)")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="timed passes per workload")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced pass for peak memory")
+    parser.add_argument('--out', default=OUTPUT, help="JSON file for the results")
+    parser.add_argument('--baseline', metavar='PATH', default=None,
+                        help="compare against the results in this JSON file; exit 1 on a regression")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="fractional slowdown or memory growth that counts as a regression")
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = load_results(args.baseline)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Can't read baseline {args.baseline}: {e}")
+
+    names = args.only or list(WORKLOADS)
+    print(f"Benchmarking {', '.join(names)} | {args.repeats} passes each | Seed: {BENCH_SEED}")
+    print("-" * 60)
+    results = run_benchmarks(names, args.repeats, not args.no_memory)
+    save_results(results, args.out)
+
+    regressed = False
+    if baseline:
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        regressed = any(row[-1] for row in rows)
+    print("-" * 60)
+    print(f"Results written to {args.out}")
+    if regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
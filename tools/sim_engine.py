@@ -0,0 +1,634 @@
+import argparse
+import ast
+import copy
+import math
+import random
+import statistics
+import sys
+from types import MappingProxyType
+
+from run_store import load_runs
+
+# ==============================================================================
+# SIMULATION ENGINE
+# ==============================================================================
+#
+# The combat and run mechanics both simulators share. balance_simulator runs
+# it in kill-count mode (one endless run of single fights, a new floor every
+# few kills, damage rolled with spread) and dungeon_run_simulator in
+# floor/room mode (starter weapons, AGI hit and crit rolls, range, stun and
+# bleed, fixed damage). Both are configurations of the same core: each
+# simulator turns its player and monster stats into a matchup dict (see
+# matchup()), the same parameters batch_combat.fight_batch() takes, and
+# everything downstream of that - the fight itself, potions, level-ups,
+# loot, altars, the run drivers and config overrides - lives here once.
+
+MELEE_RANGE = 1          # Distance at which monsters can attack
+POTION_THRESHOLD = 40    # Player drinks a potion below this HP
+BLEED_INTERVAL = 10      # Bleed pulses once per second (10 ticks)
+DEFENSE_CAP = 50         # pDef past this stops reducing damage
+
+# Matchup parameters a simulator may leave out: a plain melee fight with
+# certain hits, no crits and no on-hit effects
+PARAM_DEFAULTS = {
+    'potions': 0, 'potion_heal': 0,
+    'move_ticks': 7, 'p_range': 1, 'distance': MELEE_RANGE, 'melee_range': MELEE_RANGE,
+    'stun_duration': 0, 'bleed_duration': 0, 'bleed_pulse': 0,
+    'p_hit': 1.0, 'm_hit': 1.0, 'p_crit': 0.0, 'crit_mult': 1.0,
+    'stun_chance': 0.0, 'bleed_chance': 0.0, 'variance': 0.0
+}
+
+# ==============================================================================
+# DAMAGE
+# ==============================================================================
+
+def floor_multiplier(floor, scaling, cap):
+    """Monster stat multiplier on a floor: +scaling per floor past the first, up to cap"""
+    return min(cap, 1.0 + (floor - 1) * scaling)
+
+def defense_modifier(p_def):
+    """Share of a hit that gets through pDef (at most 75% is blocked)"""
+    return max(0.25, 1.0 - (min(p_def, DEFENSE_CAP) * 0.015))
+
+def player_damage(base, armor_mult, defender_pdef):
+    """Player damage per hit before the spread roll: base * weapon/armor multiplier * defense"""
+    return base * armor_mult * defense_modifier(defender_pdef)
+
+def monster_damage(m_str, floor_mult, defender_pdef):
+    """Monster damage per hit before the spread roll, from floor-scaled STR"""
+    scaled_str = m_str * floor_mult
+    base = (scaled_str * 0.5) + (scaled_str / 5.0)
+    return base * defense_modifier(defender_pdef)
+
+# ==============================================================================
+# COMBAT
+# ==============================================================================
+
+# Per-fight constants of a matchup, in the order of its 'constants' tuple.
+# fight() unpacks them in one go instead of hashing a dozen keys, with the
+# fixed per-hit damage and the spread bounds already worked out
+FIGHT_CONSTANTS = (
+    'm_hp', 'p_ticks', 'm_ticks', 'move_ticks', 'p_range', 'distance', 'melee_range',
+    'p_hit', 'm_hit', 'p_crit', 'crit_mult', 'p_raw', 'm_raw', 'p_dmg', 'm_dmg',
+    'stun_chance', 'stun_duration', 'bleed_chance', 'bleed_duration', 'bleed_pulse',
+    'variance', 'lo', 'span'
+)
+
+def matchup(**params):
+    """
+    Matchup parameters with PARAM_DEFAULTS filled in. Per fight:
+      m_hp               - monster HP (already floor-scaled)
+      p_raw, m_raw       - damage per hit before the spread roll
+      p_ticks, m_ticks   - attack intervals in ticks
+      p_hit, m_hit       - hit chances
+      p_crit, crit_mult  - player crit chance and multiplier
+      move_ticks, distance, p_range, melee_range - range mechanics
+      stun_chance, stun_duration, bleed_chance, bleed_duration,
+      bleed_pulse        - on-hit effects (bleed_pulse = damage per pulse)
+      variance           - damage roll spread (0.1 = uniform(0.9, 1.1))
+    fight_params() adds the player's p_hp, p_max_hp, potions, potion_heal.
+    The 'plain' flag (see is_plain()) and the 'constants' tuple (see
+    FIGHT_CONSTANTS) are worked out here, once per matchup, so a matchup
+    must not be edited afterwards.
+    """
+    c = dict(PARAM_DEFAULTS, **params)
+    c['plain'] = is_plain(c)
+    spread = c['variance']
+    derived = {
+        'p_dmg': max(1, int(c['p_raw'])),
+        'm_dmg': max(1, int(c['m_raw'])),
+        'lo': 1.0 - spread,
+        'span': (1.0 + spread) - (1.0 - spread),
+    }
+    c['constants'] = tuple(derived[k] if k in derived else c[k] for k in FIGHT_CONSTANTS)
+    return c
+
+def is_plain(c):
+    """Whether a matchup is a plain melee trade, with nothing rolled but damage spread"""
+    return (c['distance'] <= c['melee_range'] and c['p_hit'] >= 1.0 and c['m_hit'] >= 1.0
+            and not c['p_crit'] and not c['stun_chance'] and not c['bleed_chance'])
+
+def check_potion(p):
+    """Use potion if HP is low"""
+    if p['hp'] < POTION_THRESHOLD and p['potions'] > 0:
+        p['hp'] = min(p['max_hp'], p['hp'] + p['potion_heal'])
+        p['potions'] -= 1
+        return True
+    return False
+
+def fight(p, c):
+    """
+    Simulate a fight between player p and matchup c (see matchup()). The
+    player's hp and potions are updated in place.
+    Returns: (ticks, dmg_dealt, dmg_taken, won)
+
+    Event-driven: jumps straight from one tick where something can happen
+    (an attack, a movement step, a bleed pulse) to the next instead of
+    visiting every tick, and draws the same random numbers in the same order
+    as fight_by_tick(), so results are identical for a given seed. Plain
+    melee matchups are resolved right here; anything with range, hit rolls
+    or on-hit effects goes to full_fight().
+
+    The player's HP and potions live in locals for the whole fight (the
+    potion check is check_potion() inlined) and are written back once at
+    the end, so the loop does no dict lookups and allocates nothing.
+    Damage spread is drawn as lo + span * random(), which is what
+    random.uniform(lo, hi) computes, minus a Python call per hit.
+    """
+    if not c['plain']:
+        return full_fight(p, c)
+
+    (m_hp, p_ticks, m_ticks, _, _, _, _, _, _, _, _, p_raw, m_raw, p_dmg, m_dmg,
+     _, _, _, _, _, spread, lo, span) = c['constants']
+    hp = p['hp']
+    potions = p['potions']
+    max_hp = p['max_hp']
+    heal = p['potion_heal']
+
+    tick = 0
+    total_dmg_dealt = 0
+    total_dmg_taken = 0
+    rand = random.random
+
+    if spread:
+        while hp > 0 and m_hp > 0:
+            tick = min((tick // p_ticks + 1) * p_ticks, (tick // m_ticks + 1) * m_ticks)
+            if tick % p_ticks == 0:
+                dmg = max(1, int(p_raw * (lo + span * rand())))
+                m_hp -= dmg
+                total_dmg_dealt += dmg
+            if m_hp > 0 and tick % m_ticks == 0:
+                dmg = max(1, int(m_raw * (lo + span * rand())))
+                hp -= dmg
+                total_dmg_taken += dmg
+                if hp < POTION_THRESHOLD and potions > 0:
+                    hp = min(max_hp, hp + heal)
+                    potions -= 1
+    else:
+        while hp > 0 and m_hp > 0:
+            tick = min((tick // p_ticks + 1) * p_ticks, (tick // m_ticks + 1) * m_ticks)
+            if tick % p_ticks == 0:
+                m_hp -= p_dmg
+                total_dmg_dealt += p_dmg
+            if m_hp > 0 and tick % m_ticks == 0:
+                hp -= m_dmg
+                total_dmg_taken += m_dmg
+                if hp < POTION_THRESHOLD and potions > 0:
+                    hp = min(max_hp, hp + heal)
+                    potions -= 1
+
+    p['hp'] = hp
+    p['potions'] = potions
+    return (tick, total_dmg_dealt, total_dmg_taken, hp > 0)
+
+def full_fight(p, c):
+    """fight() with range, hit and crit rolls, stun and bleed"""
+    (m_hp, p_ticks, m_ticks, m_move_ticks, weapon_range, distance, melee_range,
+     p_hit, m_hit, p_crit, crit_mult, p_raw, m_raw, p_dmg, m_dmg,
+     stun_chance, stun_duration, bleed_chance, bleed_duration, bleed_dmg,
+     spread, lo, span) = c['constants']
+    hp = p['hp']
+    potions = p['potions']
+    max_hp = p['max_hp']
+    heal = p['potion_heal']
+
+    # Status effects
+    stun_end = 0   # Monster is stunned while tick < stun_end
+    bleed_end = 0  # Bleed pulses on every 10th tick up to bleed_end
+
+    tick = 0
+    total_dmg_dealt = 0
+    total_dmg_taken = 0
+    rand = random.random
+
+    while hp > 0 and m_hp > 0:
+        # Next tick where anything can happen
+        monster_free = max(tick + 1, stun_end)
+        if distance > melee_range:
+            next_tick = -(-monster_free // m_move_ticks) * m_move_ticks
+        else:
+            next_tick = -(-monster_free // m_ticks) * m_ticks
+        if distance <= weapon_range:
+            next_tick = min(next_tick, (tick // p_ticks + 1) * p_ticks)
+        if bleed_end > tick:
+            pulse_tick = (tick // BLEED_INTERVAL + 1) * BLEED_INTERVAL
+            if pulse_tick <= bleed_end:
+                next_tick = min(next_tick, pulse_tick)
+        tick = next_tick
+
+        # Apply bleed damage (every 10 ticks = 1 second)
+        if tick <= bleed_end and tick % BLEED_INTERVAL == 0:
+            m_hp -= bleed_dmg
+            total_dmg_dealt += bleed_dmg
+
+        # Monster movement (closes distance) - blocked by stun
+        if tick >= stun_end and distance > melee_range and tick % m_move_ticks == 0:
+            distance -= 1
+
+        # Player attack (check range)
+        if distance <= weapon_range and tick % p_ticks == 0:
+            if p_hit >= 1.0 or rand() < p_hit:
+                dmg = max(1, int(p_raw * (lo + span * rand()))) if spread else p_dmg
+                if p_crit and rand() < p_crit:
+                    dmg = int(dmg * crit_mult)
+                m_hp -= dmg
+                total_dmg_dealt += dmg
+
+                # Roll stun (blunt weapons)
+                if stun_chance > 0 and rand() < stun_chance:
+                    stun_end = tick + stun_duration
+
+                # Roll bleed (blade weapons) - resets timer, doesn't stack
+                if bleed_chance > 0 and rand() < bleed_chance:
+                    bleed_end = tick + bleed_duration
+
+        # Monster attack (only in melee range, blocked by stun)
+        if m_hp > 0 and distance <= melee_range and tick >= stun_end and tick % m_ticks == 0:
+            if m_hit >= 1.0 or rand() < m_hit:
+                # Monsters cannot crit (player-only mechanic)
+                dmg = max(1, int(m_raw * (lo + span * rand()))) if spread else m_dmg
+                hp -= dmg
+                total_dmg_taken += dmg
+                if hp < POTION_THRESHOLD and potions > 0:
+                    hp = min(max_hp, hp + heal)
+                    potions -= 1
+
+    p['hp'] = hp
+    p['potions'] = potions
+    return (tick, total_dmg_dealt, total_dmg_taken, hp > 0)
+
+def fight_by_tick(p, c):
+    """
+    Reference tick-by-tick version of fight(). Visits every tick and keeps
+    stun and bleed as countdowns; kept to check the event-driven resolver
+    against.
+    Returns: (ticks, dmg_dealt, dmg_taken, won)
+    """
+    m_hp = c['m_hp']
+    distance = c['distance']
+    melee_range = c['melee_range']
+    spread = c['variance']
+
+    stun_remaining = 0      # Ticks monster is stunned
+    bleed_remaining = 0     # Ticks of bleed remaining
+
+    tick = 0
+    total_dmg_dealt = 0
+    total_dmg_taken = 0
+
+    while p['hp'] > 0 and m_hp > 0:
+        tick += 1
+
+        # Apply bleed damage (every 10 ticks = 1 second)
+        if bleed_remaining > 0:
+            bleed_remaining -= 1
+            if tick % BLEED_INTERVAL == 0:
+                m_hp -= c['bleed_pulse']
+                total_dmg_dealt += c['bleed_pulse']
+
+        # Decrement stun
+        if stun_remaining > 0:
+            stun_remaining -= 1
+
+        # Monster movement (closes distance) - blocked by stun
+        if stun_remaining == 0 and distance > melee_range and tick % c['move_ticks'] == 0:
+            distance -= 1
+
+        # Player attack (check range)
+        if distance <= c['p_range'] and tick % c['p_ticks'] == 0:
+            if c['p_hit'] >= 1.0 or random.random() < c['p_hit']:
+                if spread:
+                    dmg = max(1, int(c['p_raw'] * random.uniform(1.0 - spread, 1.0 + spread)))
+                else:
+                    dmg = max(1, int(c['p_raw']))
+                if c['p_crit'] and random.random() < c['p_crit']:
+                    dmg = int(dmg * c['crit_mult'])
+                m_hp -= dmg
+                total_dmg_dealt += dmg
+
+                if c['stun_chance'] > 0 and random.random() < c['stun_chance']:
+                    stun_remaining = c['stun_duration']
+                if c['bleed_chance'] > 0 and random.random() < c['bleed_chance']:
+                    bleed_remaining = c['bleed_duration']
+
+        # Monster attack (only in melee range, blocked by stun)
+        if m_hp > 0 and distance <= melee_range and stun_remaining == 0 and tick % c['m_ticks'] == 0:
+            if c['m_hit'] >= 1.0 or random.random() < c['m_hit']:
+                if spread:
+                    dmg = max(1, int(c['m_raw'] * random.uniform(1.0 - spread, 1.0 + spread)))
+                else:
+                    dmg = max(1, int(c['m_raw']))
+                p['hp'] -= dmg
+                total_dmg_taken += dmg
+                check_potion(p)
+
+    won = p['hp'] > 0
+    return (tick, total_dmg_dealt, total_dmg_taken, won)
+
+# ==============================================================================
+# PROGRESSION AND ITEMS
+# ==============================================================================
+
+def check_level_up(p, thresholds, gains):
+    """
+    Apply every level-up the player's XP has earned: +10 max HP, a full heal
+    and the stat gains ({stat: amount}) per level.
+    """
+    leveled = False
+    while True:
+        next_lvl = p['level'] + 1
+        if next_lvl in thresholds and p['xp'] >= thresholds[next_lvl]:
+            p['level'] = next_lvl
+            p['max_hp'] += 10
+            p['hp'] = p['max_hp']  # Full Heal
+            for stat, amount in gains.items():
+                p[stat] += amount
+            leveled = True
+        else:
+            break
+    return leveled
+
+def drop_loot(inventory, drop_chance, sampler):
+    """Roll for a loot drop (drop_chance in percent), drawing the item from sampler"""
+    if random.uniform(0, 100) > drop_chance:
+        return None
+    item = sampler.draw()
+    inventory.append(item)
+    return item
+
+def visit_altar(p, inventory, loot_table):
+    """Sacrifice items at altar for HP, smallest heals first"""
+    if p['hp'] >= p['max_hp'] or not inventory:
+        return (0, 0)
+
+    sacrifices = 0
+    hp_restored = 0
+    inventory.sort(key=lambda x: loot_table[x]['heal'])
+    items_to_remove = []
+
+    for item in inventory:
+        if p['hp'] >= p['max_hp']:
+            break
+        heal_val = loot_table[item]['heal']
+        actual_heal = min(heal_val, p['max_hp'] - p['hp'])
+        p['hp'] = min(p['max_hp'], p['hp'] + heal_val)
+        items_to_remove.append(item)
+        sacrifices += 1
+        hp_restored += actual_heal
+
+    for item in items_to_remove:
+        inventory.remove(item)
+    return (sacrifices, hp_restored)
+
+# ==============================================================================
+# RUN DRIVERS
+# ==============================================================================
+#
+# A run is a generator that yields (player, monster_name, floor) whenever it
+# needs a fight and expects the (ticks, dmg_dealt, dmg_taken, won) tuple sent
+# back. The drivers here resolve its fights one at a time with a simulator's
+# fight_fn(player, monster_name, floor); batch_combat.drive_lockstep() is the
+# batched counterpart.
+#
+# The drivers that play whole runs or batches take the simulator module itself
+# (sim), as batch_combat.compare_with_scalar() does, and a config it compiled
+# (cfg). Both simulators expose the same hooks for them: new_metrics(cfg,
+# store), simulate_run(metrics, cfg), interval_targets(metrics),
+# paired_result(metrics), print_run(row), metrics_from_runs(runs) and
+# print_report(metrics).
+
+def run_stream(seed, run_index):
+    """
+    Seed of one run's own RNG stream, derived from the master seed and the
+    run's index in the batch only, so any run can be re-simulated alone.
+    """
+    return f"{seed}:run:{run_index}"
+
+def resolve_fights(steps, fight_fn):
+    """Drive a run generator, resolving each fight it asks for with fight_fn"""
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(fight_fn(*request))
+    except StopIteration as stop:
+        return stop.value
+
+def resolve_fights_crn(steps, stream, fight_fn):
+    """
+    Like resolve_fights(), but each fight draws from its own stream seeded
+    from the run stream and the fight's index. The run's own stream is put
+    back afterwards, so rolls between fights don't depend on how many
+    numbers a fight used.
+    """
+    fight_index = 0
+    try:
+        request = next(steps)
+        while True:
+            state = random.getstate()
+            random.seed(f"{stream}:{fight_index}")
+            result = fight_fn(*request)
+            random.setstate(state)
+            fight_index += 1
+            request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+def trace_fights(steps, fight_fn):
+    """resolve_fights(), printing every fight as it is resolved"""
+    fight_index = 0
+    try:
+        request = next(steps)
+        while True:
+            player, m_name, floor = request
+            hp, potions, level = player['hp'], player['potions'], player['level']
+            result = fight_fn(*request)
+            ticks, dealt, taken, won = result
+            fight_index += 1
+            outcome = "won " if won else "DIED"
+            print(f"  #{fight_index:<3} F{floor} Lv{level:<2} HP {hp:>3}/{player['max_hp']:<3} vs {m_name:<18} "
+                  f"{outcome} {ticks:>4} ticks  dealt {dealt:>4}  took {taken:>4}  "
+                  f"potions {potions - player['potions']}  -> HP {player['hp']}")
+            request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+def replay_run(sim, seed, run_index, fight_fn, cfg, label=""):
+    """
+    Re-simulate run run_index of the batch with this master seed alone,
+    with a fight trace, and close with the simulator's print_run() summary
+    of its run table row
+    """
+    print(f"Replaying run {run_index} of seed {seed}" + label)
+    print("-" * 60)
+    random.seed(run_stream(seed, run_index))
+    metrics = sim.new_metrics(cfg, store=True)
+    trace_fights(sim.simulate_run(metrics, cfg), fight_fn)
+
+    row = {name: values[0] for name, values in metrics['run_table'].columns.items()}
+    print("-" * 60)
+    sim.print_run(row)
+
+def paired_run(sim, stream, fight_fn, cfg):
+    """
+    Simulate one run of an A/B comparison on the given stream, with
+    resolve_fights_crn(), and return the simulator's paired_result() of it
+    """
+    random.seed(stream)
+    metrics = sim.new_metrics(cfg)
+    resolve_fights_crn(sim.simulate_run(metrics, cfg), stream, fight_fn)
+    return sim.paired_result(metrics)
+
+# ==============================================================================
+# INTERVALS
+# ==============================================================================
+
+def wilson_interval(successes, trials, z):
+    """Wilson score interval for a proportion; stays sane for rare events"""
+    if trials == 0:
+        return (0.0, 1.0)
+    rate = successes / trials
+    denom = 1 + z * z / trials
+    centre = (rate + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denom
+    return (max(0.0, centre - half), min(1.0, centre + half))
+
+def target_met(rate, low, high, target, relative=False):
+    """Whether an interval is narrow enough; relative targets scale with the rate"""
+    return (high - low) / 2 <= (target * rate if relative else target)
+
+def confidence_intervals(targets, confidence):
+    """[(label, rate, low, high)] for every (label, successes, trials) target"""
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    intervals = []
+    for label, successes, trials in targets:
+        low, high = wilson_interval(successes, trials, z)
+        intervals.append((label, successes / trials if trials else 0.0, low, high))
+    return intervals
+
+def collect_until(sim, metrics, advance, target, confidence, max_runs, relative=False):
+    """
+    Sequential stopping for --target-ci: call advance(metrics) to add a round
+    of runs until every one of the simulator's interval_targets() has a
+    half-width of at most target, or max_runs runs are in. Returns metrics.
+    """
+    while metrics['runs'] < max_runs:
+        advance(metrics)
+        if all(target_met(rate, low, high, target, relative)
+               for _, rate, low, high in confidence_intervals(sim.interval_targets(metrics), confidence)):
+            break
+    return metrics
+
+def paired_delta(a, b):
+    """
+    Mean delta of variant over baseline with its paired standard error, and
+    the standard error two independent batches of the same size would have.
+    Returns: (mean_a, mean_b, delta, se_paired, se_independent)
+    """
+    n = len(a)
+    if n < 2:
+        return (statistics.fmean(a) if a else 0.0, statistics.fmean(b) if b else 0.0, 0.0, 0.0, 0.0)
+    diffs = [y - x for x, y in zip(a, b)]
+    se_paired = math.sqrt(statistics.variance(diffs) / n)
+    se_independent = math.sqrt((statistics.variance(a) + statistics.variance(b)) / n)
+    return (statistics.fmean(a), statistics.fmean(b), statistics.fmean(diffs), se_paired, se_independent)
+
+# ==============================================================================
+# REPORTS
+# ==============================================================================
+
+def ranked(counts, n=None):
+    """
+    counts.most_common(n) with ties broken by key, so a report ranks them the
+    same whether its counts come from live runs, merged shards or a stored
+    run table.
+    """
+    ranking = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return ranking if n is None else ranking[:n]
+
+def mode_label(batch=False, exact=False):
+    """' | ...' naming the fight engine in a report header, if not the default one"""
+    return " | Batch combat engine" if batch else " | Exact fight distributions" if exact else ""
+
+def store_runs(metrics, path, meta):
+    """Write the run table collected in metrics to path, with meta on how it was made"""
+    table = metrics.pop('run_table')
+    table.save(path, meta)
+    print(f"Stored {len(table)} runs in {path}")
+
+def run_report(sim, path, simulator):
+    """Print the report for a run table the simulator stored under the name simulator"""
+    runs = load_runs(path)
+    if runs.meta.get('simulator') != simulator:
+        sys.exit(f"{path} was not written by {simulator}")
+    print(f"Report for {len(runs)} stored runs from {path}")
+    print(f"Seed: {runs.meta['seed']}" + mode_label(runs.meta['batch'], runs.meta.get('exact', False)))
+    print("-" * 60)
+    sim.print_report(sim.metrics_from_runs(runs))
+
+# ==============================================================================
+# CONFIG OVERRIDES
+# ==============================================================================
+#
+# Each simulator compiles its game constants (the names in its CONFIG_NAMES)
+# into an immutable SimConfig that the engine functions take as cfg. A
+# variant is the same constants with overrides on top: parsed
+# 'NAME.key.key=value' pairs, held as (keys, value).
+
+def parse_override(text, constants):
+    """
+    Parse an override 'NAME.key.key=value' into (keys, value). NAME and the
+    keys are checked against constants ({NAME: value}); the value is a Python
+    literal, or a plain string if it doesn't parse as one.
+    """
+    path, sep, raw = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME.key=value, got {text!r}")
+    keys = [k.strip() for k in path.split('.')]
+    if keys[0] not in constants:
+        raise argparse.ArgumentTypeError(f"unknown config constant {keys[0]!r}")
+
+    target = constants[keys[0]]
+    for i, key in enumerate(keys[1:], 1):
+        if not isinstance(target, dict):
+            raise argparse.ArgumentTypeError(f"{'.'.join(keys[:i])} has no keys")
+        if key not in target:
+            try:
+                key = ast.literal_eval(key)
+            except (ValueError, SyntaxError):
+                pass
+        if key not in target:
+            raise argparse.ArgumentTypeError(f"unknown key {key!r} in {'.'.join(keys[:i])}")
+        keys[i] = key
+        target = target[key]
+
+    try:
+        value = ast.literal_eval(raw.strip())
+    except (ValueError, SyntaxError):
+        value = raw.strip()
+    return (tuple(keys), value)
+
+def format_override(override):
+    """'NAME.key=value' label for a parsed override"""
+    keys, value = override
+    return f"{'.'.join(str(k) for k in keys)}={value!r}"
+
+def override_values(constants, overrides):
+    """Deep copy of constants ({NAME: value}) with the overrides applied"""
+    values = {name: copy.deepcopy(value) for name, value in constants.items()}
+    for keys, value in overrides:
+        if len(keys) == 1:
+            values[keys[0]] = copy.deepcopy(value)
+        else:
+            target = values[keys[0]]
+            for key in keys[1:-1]:
+                target = target[key]
+            target[keys[-1]] = copy.deepcopy(value)
+    return values
+
+def freeze(value):
+    """Read-only copy of a config value: dicts become mappingproxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
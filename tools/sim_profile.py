@@ -0,0 +1,214 @@
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# ==============================================================================
+# PROFILING
+# ==============================================================================
+#
+# Opt-in instrumentation for the simulators, behind --profile, --profile-out
+# and --flamegraph. Nothing here is imported or installed unless one of
+# those flags is given. The phase timers are wrappers swapped in over module
+# attributes for the length of the run and swapped back out afterwards, so
+# the normal hot paths carry no checks or counters at all.
+#
+# Instrumentation only sees the process it was installed in, so the
+# simulators run profiled batches in-process (one worker).
+
+SAMPLE_INTERVAL = 0.001   # Seconds between flamegraph stack samples
+
+class PhaseProfiler:
+    """
+    Exclusive wall time and call counts per phase of a simulation.
+
+    phases: [(label, owner, attribute)] of the callables to time. owner is a
+    module or a class; several callables can share a label. Time spent in a
+    phase nested inside another is taken out of the outer one, so the
+    phases add up to at most the wall time. A call into the phase that is
+    already running (Summary.add calling RunningStats.add, both
+    'analytics') is part of that call and isn't counted again.
+
+    counters: [(label, owner, attribute, size)] of callables that are only
+    counted, not timed. size(*args, **kwargs) gives how many items a call
+    stands for (one when size is None), e.g. the fights in a batch.
+    """
+
+    def __init__(self, phases, counters=()):
+        self.phases = list(phases)
+        self.counters = list(counters)
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.counts = Counter()
+        self.stack = []
+        self.saved = []
+        self.wall = 0.0
+
+    def timed(self, label, func):
+        stack = self.stack
+        calls = self.calls
+        seconds = self.seconds
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if stack and stack[-1][0] == label:
+                return func(*args, **kwargs)
+            frame = [label, 0.0]
+            stack.append(frame)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stack.pop()
+                calls[label] += 1
+                seconds[label] += elapsed - frame[1]
+                if stack:
+                    stack[-1][1] += elapsed
+        return wrapper
+
+    def counted(self, label, func, size=None):
+        counts = self.counts
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counts[label] += 1 if size is None else size(*args, **kwargs)
+            return func(*args, **kwargs)
+        return wrapper
+
+    def patch(self, owner, attribute, wrapper):
+        # Read the raw attribute so methods go back exactly as they were
+        original = vars(owner)[attribute]
+        self.saved.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper(getattr(owner, attribute)))
+
+    def __enter__(self):
+        for label, owner, attribute in self.phases:
+            self.patch(owner, attribute, functools.partial(self.timed, label))
+        for label, owner, attribute, size in self.counters:
+            self.patch(owner, attribute, functools.partial(self.counted, label, size=size))
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall += time.perf_counter() - self.started
+        while self.saved:
+            owner, attribute, original = self.saved.pop()
+            setattr(owner, attribute, original)
+        return False
+
+    def report(self, out=sys.stdout):
+        wall = self.wall or 1e-9
+        print("\n" + "=" * 60, file=out)
+        print(f"{'PROFILE':^60}", file=out)
+        print("=" * 60, file=out)
+        rates = [f"Wall time: {self.wall:.2f}s"]
+        for label, count in self.counts.items():
+            rates.append(f"{count:,} {label} ({count / wall:,.0f} {label}/sec)")
+        print("  " + " | ".join(rates), file=out)
+        print(file=out)
+        print(f"  {'Phase':<16} {'Calls':>11} {'Time':>9} {'Share':>7} {'Per call':>10}", file=out)
+        labels = list(dict.fromkeys(label for label, _, _ in self.phases))
+        for label in labels:
+            calls = self.calls[label]
+            if not calls:
+                continue
+            per_call = f"{self.seconds[label] / calls * 1e6:.1f} µs"
+            print(f"  {label:<16} {calls:>11,} {self.seconds[label]:>8.2f}s "
+                  f"{self.seconds[label] / wall:>6.1%} {per_call:>10}", file=out)
+        other = max(0.0, self.wall - sum(self.seconds.values()))
+        print(f"  {'everything else':<16} {'':>11} {other:>8.2f}s {other / wall:>6.1%}", file=out)
+        print("  (Phase times include the timers' own overhead of about a microsecond a call)", file=out)
+
+class StackSampler:
+    """
+    Sampling profiler for flamegraphs: a background thread records the
+    calling thread's Python stack every interval seconds (as often as the
+    GIL lets it) and save() writes them as collapsed stacks, one
+    "outer;...;inner count" line per distinct stack, the input format of
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        own = os.path.abspath(__file__)
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                # The phase timers' wrappers would only clutter the graph
+                if os.path.abspath(code.co_filename) != own:
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+def add_arguments(parser):
+    """The profiling flags both simulators take"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true',
+                       help="time the main phases and report runs/sec and fights/sec (runs in-process)")
+    group.add_argument('--profile-out', metavar='PATH', default=None,
+                       help="write a cProfile stats file (python -m pstats PATH)")
+    group.add_argument('--flamegraph', metavar='PATH', default=None,
+                       help="write sampled stacks in collapsed format for flamegraph.pl/speedscope")
+
+def requested(args):
+    return bool(args.profile or args.profile_out or args.flamegraph)
+
+@contextlib.contextmanager
+def profiling(args, phases, counters=()):
+    """
+    Profile the body as args asks: phase timers and a report for
+    --profile, cProfile for --profile-out, stack sampling for --flamegraph.
+    phases and counters are callables returning PhaseProfiler's lists, so
+    nothing is looked up unless profiling was asked for.
+    """
+    if not requested(args):
+        yield
+        return
+
+    with contextlib.ExitStack() as stack:
+        timer = stack.enter_context(PhaseProfiler(phases(), counters())) if args.profile else None
+        sampler = stack.enter_context(StackSampler()) if args.flamegraph else None
+        profiler = None
+        if args.profile_out:
+            import cProfile
+            profiler = cProfile.Profile()
+            stack.callback(profiler.disable)
+            profiler.enable()
+        yield
+
+    if timer:
+        timer.report()
+    if profiler:
+        profiler.dump_stats(args.profile_out)
+        print(f"cProfile stats written to {args.profile_out}")
+    if sampler:
+        sampler.save(args.flamegraph)
+        print(f"{sum(sampler.stacks.values())} stack samples written to {args.flamegraph}")
@@ -0,0 +1,291 @@
+import bisect
+import math
+
+# ==============================================================================
+# STREAMING METRICS
+# ==============================================================================
+#
+# Accumulators for per-run values whose memory does not grow with the number
+# of runs. Each one has add() for a single value and merge() to fold in
+# another accumulator of the same shape, so shards simulated apart (chunks,
+# worker processes, resumed batches) combine into the totals one long serial
+# run would have produced. None of them touch the global random module, so
+# recording a metric never shifts the simulation's RNG stream.
+
+class RunningStats:
+    """
+    Count, mean, variance, min, max and exact total of a stream of numbers.
+
+    Mean and variance are kept with Welford's update and combined across
+    shards with Chan's parallel formula.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def from_array(cls, values):
+        """The stats of a whole NumPy array of values at once"""
+        stats = cls()
+        if len(values):
+            stats.count = len(values)
+            stats.total = values.sum().item()
+            stats.m2 = float(((values - stats.mean) ** 2).sum())
+            stats.min = values.min().item()
+            stats.max = values.max().item()
+        return stats
+
+    @classmethod
+    def from_parts(cls, parts):
+        """
+        Merge of many RunningStats given as an (n, 5) array of their parts()
+        rows, combined in one vectorized pass.
+        """
+        import numpy as np
+
+        stats = cls()
+        parts = parts[parts[:, 0] > 0]
+        if len(parts):
+            count, total, m2, lo, hi = parts.T
+            stats.count = int(count.sum())
+            stats.total = float(total.sum())
+            stats.m2 = float(m2.sum() + (count * (total / count - stats.mean) ** 2).sum())
+            stats.min = float(np.min(lo))
+            stats.max = float(np.max(hi))
+        return stats
+
+    def parts(self):
+        """(count, total, m2, min, max), with NaN bounds while empty"""
+        nan = float('nan')
+        return (self.count, self.total, self.m2,
+                nan if self.min is None else self.min, nan if self.max is None else self.max)
+
+    def add(self, x):
+        old_mean = self.mean
+        self.count += 1
+        self.total += x
+        self.m2 += (x - old_mean) * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if self.count:
+            delta = other.mean - self.mean
+            n = self.count + other.count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / n
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        else:
+            self.m2 = other.m2
+            self.min, self.max = other.min, other.max
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        """Sample variance, like statistics.variance()"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: a stack of compactors, where level h holds items
+    standing for 2**h values each. A full level is sorted and every other
+    item is promoted a level up, halving it. Levels shrink geometrically
+    towards the bottom, so the sketch holds O(k) items however many values
+    go in, and rank error is about 1.7/k of the count.
+
+    Until k values have been added nothing is compacted and quantiles are
+    exact. Which half of a level is promoted is decided by a small private
+    LCG rather than the random module, so the sketch is deterministic for a
+    given order of adds and merges.
+    """
+
+    def __init__(self, k=200):
+        self.k = k
+        self.count = 0
+        self.levels = [[]]
+        self.coin = 0
+
+    @classmethod
+    def from_array(cls, values, k=200, size=1 << 16):
+        """
+        A sketch of a whole NumPy array at once. The values are sorted and
+        every 2**h-th one kept at level h, with h the smallest height that
+        keeps at most size items, so the rank error is under 2**h and
+        arrays of up to size values stay exact.
+        """
+        import numpy as np
+
+        sketch = cls(k)
+        ordered = np.sort(values)
+        n = len(ordered)
+        height = max(0, math.ceil(math.log2(n / size))) if n else 0
+        step = 1 << height
+        full = n - n % step
+        sketch.levels = [[] for _ in range(height + 1)]
+        # The last value of each block stands for the block, so the kept
+        # items sit at their exact ranks; the leftover tail stays at level 0
+        sketch.levels[height] = ordered[step - 1:full:step].tolist()
+        sketch.levels[0] += ordered[full:].tolist()
+        sketch.count = n
+        return sketch
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def add(self, x):
+        self.count += 1
+        self.levels[0].append(x)
+        if len(self.levels[0]) >= self.capacity(0):
+            self.compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.compress()
+        return self
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # An odd item out stays behind at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                self.coin = (self.coin * 6364136223846793005 + 1442695040888963407) % 2**64
+                self.levels[level + 1].extend(items[self.coin >> 63::2])
+                self.levels[level] = keep
+            level += 1
+
+    def __len__(self):
+        return self.count
+
+    def quantile(self, p):
+        """
+        The value at rank int(count * p), i.e. sorted(values)[int(count * p)]
+        while the sketch is still exact. Returns 0 when empty.
+        """
+        weighted = sorted((x, 1 << level) for level, items in enumerate(self.levels) for x in items)
+        if not weighted:
+            return 0
+        rank = self.count * p
+        seen = 0
+        for x, weight in weighted:
+            seen += weight
+            if seen > rank:
+                return x
+        return weighted[-1][0]
+
+class Histogram:
+    """
+    Counts over fixed bins split at the given edges: len(edges) + 1 bins.
+    Bins are closed on the left ([lo, hi)) by default, on the right
+    ((lo, hi]) with right=True.
+    """
+
+    def __init__(self, edges, right=False):
+        self.edges = tuple(edges)
+        self.right = right
+        self.counts = [0] * (len(self.edges) + 1)
+
+    @classmethod
+    def from_array(cls, values, edges, right=False):
+        """The histogram of a whole NumPy array of values at once"""
+        import numpy as np
+
+        hist = cls(edges, right)
+        bins = np.searchsorted(hist.edges, values, side='left' if right else 'right')
+        hist.counts = np.bincount(bins, minlength=len(hist.counts)).tolist()
+        return hist
+
+    def add(self, x):
+        find = bisect.bisect_left if self.right else bisect.bisect_right
+        self.counts[find(self.edges, x)] += 1
+
+    def merge(self, other):
+        if other.edges != self.edges or other.right != self.right:
+            raise ValueError("cannot merge histograms with different bins")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        return self
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def below(self, edge):
+        """How many values fell in the bins under edge (which must be one of the edges)"""
+        return sum(self.counts[:self.edges.index(edge) + 1])
+
+    def above(self, edge):
+        """How many values fell in the bins over edge (which must be one of the edges)"""
+        return sum(self.counts[self.edges.index(edge) + 1:])
+
+class Summary:
+    """
+    RunningStats plus, optionally, a QuantileSketch and a Histogram over the
+    same stream, for metrics a report shows as a distribution.
+    """
+
+    def __init__(self, quantiles=False, edges=None, right=False):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch() if quantiles else None
+        self.hist = Histogram(edges, right) if edges is not None else None
+
+    @classmethod
+    def from_array(cls, values, quantiles=False, edges=None, right=False):
+        """The summary of a whole NumPy array of values at once"""
+        summary = cls(quantiles, edges, right)
+        summary.stats = RunningStats.from_array(values)
+        if quantiles:
+            summary.sketch = QuantileSketch.from_array(values)
+        if edges is not None:
+            summary.hist = Histogram.from_array(values, edges, right)
+        return summary
+
+    def add(self, x):
+        self.stats.add(x)
+        if self.sketch is not None:
+            self.sketch.add(x)
+        if self.hist is not None:
+            self.hist.add(x)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        if self.hist is not None:
+            self.hist.merge(other.hist)
+        return self
+
+    def __len__(self):
+        return self.stats.count
+
+    def quantile(self, p):
+        return self.sketch.quantile(p)
@@ -0,0 +1,109 @@
+import random
+
+# ==============================================================================
+# ALIAS SAMPLER
+# ==============================================================================
+#
+# Walker's alias method: n weighted outcomes are packed into n equal-width
+# columns, each holding at most two outcomes (its own and one alias), so a
+# draw is one uniform, one index and one comparison however many outcomes
+# there are. Tables are built once (Vose's O(n) construction) and reused for
+# every draw.
+
+class AliasSampler:
+    """
+    O(1) sampler over weighted outcomes.
+
+    weights: {outcome: weight}. Weights need not sum to anything in
+    particular; zero-weight outcomes are never drawn.
+    """
+
+    def __init__(self, weights):
+        self.outcomes = tuple(weights)
+        values = [float(w) for w in weights.values()]
+        total = sum(values)
+        if not self.outcomes or total <= 0 or min(values) < 0:
+            raise ValueError("AliasSampler needs non-negative weights with a positive total")
+
+        self.probabilities = {o: w / total for o, w in zip(self.outcomes, values)}
+
+        n = len(values)
+        scaled = [w * n / total for w in values]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, s in enumerate(scaled) if s < 1.0]
+        large = [i for i, s in enumerate(scaled) if s >= 1.0]
+        while small and large:
+            lo = small.pop()
+            hi = large.pop()
+            prob[lo] = scaled[lo]
+            alias[lo] = hi
+            scaled[hi] -= 1.0 - scaled[lo]
+            (small if scaled[hi] < 1.0 else large).append(hi)
+        # Whatever is left over is a full column up to rounding
+        self.prob = tuple(prob)
+        self.alias = tuple(alias)
+        self.n = n
+
+    def draw(self, rand=random.random):
+        """One outcome, using a single uniform from rand"""
+        u = rand() * self.n
+        i = int(u)
+        return self.outcomes[i] if u - i < self.prob[i] else self.outcomes[self.alias[i]]
+
+    def draw_indices(self, rng, size):
+        """
+        Bulk draw for batched runs: an array of outcome indices (into
+        self.outcomes) from a NumPy Generator.
+        """
+        import numpy as np
+
+        prob = np.asarray(self.prob)
+        alias = np.asarray(self.alias, dtype=np.intp)
+        u = rng.random(size) * self.n
+        i = u.astype(np.intp)
+        return np.where(u - i < prob[i], i, alias[i])
+
+    def draw_many(self, rng, size):
+        """Bulk draw of outcomes themselves, as a NumPy array"""
+        import numpy as np
+
+        return np.asarray(self.outcomes)[self.draw_indices(rng, size)]
+
+class DrawPool:
+    """
+    Stand-in for an AliasSampler in batched runs: outcomes are drawn in
+    blocks of block with draw_many() from a NumPy Generator, and draw()
+    hands them out one at a time. Runs advancing in lockstep share the pool,
+    so a round of spawn or loot rolls across the whole batch costs one
+    vectorized draw instead of one Python draw per run.
+    """
+
+    def __init__(self, sampler, rng, block=4096):
+        self.sampler = sampler
+        self.probabilities = sampler.probabilities
+        self.rng = rng
+        self.block = block
+        self.drawn = []
+
+    def draw(self, rand=None):
+        """The next pre-drawn outcome (rand is ignored; the pool has its own Generator)"""
+        if not self.drawn:
+            self.drawn = self.sampler.draw_many(self.rng, self.block).tolist()
+        return self.drawn.pop()
+
+def percent_weights(weights, fallback):
+    """
+    Weights that are percentages of a uniform(0, 100) roll scanned in order:
+    whatever the table leaves of the 100 goes to fallback, and anything past
+    100 is cut off, exactly as the cumulative scans did.
+    """
+    shares = {}
+    cum = 0
+    for outcome, weight in weights.items():
+        lo = min(cum, 100)
+        cum += weight
+        shares[outcome] = shares.get(outcome, 0) + min(cum, 100) - lo
+    if cum < 100:
+        shares[fallback] = shares.get(fallback, 0) + 100 - cum
+    return shares
@@ -1,16 +1,21 @@
 from stable_baselines3 import PPO
 from game_env import ShiftingChasmEnv
+from vec_env import ChasmVecEnv
+import argparse
 import time
 import os
 
-def run_training():
-    print("Launching Game...")
-    env = ShiftingChasmEnv()
+def run_training(backend="browser", n_envs=1, workers=None):
+    print("Launching Game..." if n_envs == 1 else f"Launching {n_envs} Games...")
+    if n_envs == 1:
+        env = ShiftingChasmEnv(backend=backend)
+    else:
+        env = ChasmVecEnv(n_envs, backend=backend, workers=workers)
 
     print("Loading AI Model...")
     model = PPO("MultiInputPolicy", env, verbose=1)
 
-    print("Starting Training! Watch the browser window.")
+    print("Starting Training!" + (" Watch the browser window." if backend == "browser" else ""))
     try:
         model.learn(total_timesteps=10000)
         model.save("roguelike_agent_v1")
@@ -22,4 +27,14 @@ def run_training():
         env.close()
 
 if __name__ == "__main__":
-    run_training()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train a PPO agent on The Shifting Chasm")
+    parser.add_argument("--headless", action="store_true",
+                        help="train on the in-process game core instead of the browser")
+    parser.add_argument("--envs", type=int, default=1,
+                        help="game instances to collect from in lockstep")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes the instances are split over (default: one per core, 0 for in-process)")
+    args = parser.parse_args()
+    if args.envs < 1:
+        parser.error("--envs must be at least 1")
+    run_training("headless" if args.headless else "browser", args.envs, args.workers)
\ No newline at end of file
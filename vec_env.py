@@ -0,0 +1,230 @@
+import functools
+import multiprocessing
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from game_env import ShiftingChasmEnv
+
+# ==========================================
+# VECTORIZED SHIFTING CHASM
+# ==========================================
+#
+# N ShiftingChasmEnv instances behind stable-baselines3's VecEnv interface.
+# The instances are split into shards, one per worker process (or a single
+# in-process shard with workers=0). Every shard steps its instances in a
+# loop and writes their observations, rewards and done flags straight into
+# arrays shared by all shards, so a step costs one small message per worker
+# and the stacked observations are read without copying or pickling
+# anything per instance.
+
+GRID_SIZE = 121
+STATS_SIZE = 4
+
+def make_buffers(n, shared):
+    """The stacked step outputs, as NumPy arrays (over shared memory when shared)"""
+    shapes = {
+        'actions': ((n,), np.int64),
+        'grid': ((n, GRID_SIZE), np.int32),
+        'stats': ((n, STATS_SIZE), np.float32),
+        'terminal_grid': ((n, GRID_SIZE), np.int32),
+        'terminal_stats': ((n, STATS_SIZE), np.float32),
+        'rewards': ((n,), np.float32),
+        'dones': ((n,), np.bool_),
+        'truncated': ((n,), np.bool_),
+    }
+    buffers = {}
+    for name, (shape, dtype) in shapes.items():
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        raw = multiprocessing.RawArray('b', size) if shared else bytearray(size)
+        buffers[name] = (raw, shape, dtype)
+    return buffers
+
+def buffer_arrays(buffers):
+    return {name: np.frombuffer(raw, dtype=dtype).reshape(shape)
+            for name, (raw, shape, dtype) in buffers.items()}
+
+class EnvShard:
+    """
+    The instances indices[0]..indices[-1] of a vectorized env, writing into
+    the full-size stacked arrays at their own rows. Finished episodes are
+    reset right away, as VecEnv expects, with the final observation kept
+    in the terminal_* rows.
+    """
+
+    def __init__(self, make_env, indices, arrays):
+        self.envs = [make_env() for _ in indices]
+        self.indices = list(indices)
+        self.a = arrays
+
+    def write(self, i, obs):
+        self.a['grid'][i] = obs['grid']
+        self.a['stats'][i] = obs['stats']
+
+    def reset(self, seeds, options):
+        for env, i in zip(self.envs, self.indices):
+            obs, _ = env.reset(seed=seeds[i], options=options[i])
+            self.write(i, obs)
+
+    def step(self):
+        a = self.a
+        actions = a['actions']
+        for env, i in zip(self.envs, self.indices):
+            obs, reward, terminated, truncated, _ = env.step(actions[i])
+            a['rewards'][i] = reward
+            a['dones'][i] = done = terminated or truncated
+            a['truncated'][i] = truncated and not terminated
+            if done:
+                a['terminal_grid'][i] = obs['grid']
+                a['terminal_stats'][i] = obs['stats']
+                obs, _ = env.reset()
+            self.write(i, obs)
+
+    def selected(self, indices):
+        return [(i, env) for i, env in zip(self.indices, self.envs) if i in indices]
+
+    def get_attr(self, name, indices):
+        return [getattr(env, name) for _, env in self.selected(indices)]
+
+    def set_attr(self, name, value, indices):
+        for _, env in self.selected(indices):
+            setattr(env, name, value)
+
+    def env_method(self, name, args, kwargs, indices):
+        return [getattr(env, name)(*args, **kwargs) for _, env in self.selected(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices):
+        from stable_baselines3.common.env_util import is_wrapped
+        return [is_wrapped(env, wrapper_class) for _, env in self.selected(indices)]
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+def shard_worker(conn, make_env, indices, buffers):
+    """Worker process loop: run EnvShard commands sent over conn until 'close'"""
+    shard = EnvShard(make_env, indices, buffer_arrays(buffers))
+    try:
+        while True:
+            command, args = conn.recv()
+            if command == 'close':
+                shard.close()
+                conn.send(None)
+                return
+            conn.send(getattr(shard, command)(*args))
+    except KeyboardInterrupt:
+        shard.close()
+
+class ChasmVecEnv(VecEnv):
+    """
+    n_envs ShiftingChasmEnv(backend, **env_options) instances stepped in
+    lockstep. workers is the number of worker processes the instances are
+    split over (0 steps them all in this process; None uses one per CPU
+    core, capped at n_envs). Observations come back stacked:
+    {'grid': (n_envs, 121) int32, 'stats': (n_envs, 4) float32}.
+
+    With the headless backend every instance is a game_core game; with the
+    browser backend every instance is its own Chrome window, so browser
+    collection is bounded by how many Chromes the machine can run.
+    """
+
+    def __init__(self, n_envs, backend="headless", workers=None, seed=None, **env_options):
+        if workers is None:
+            workers = min(n_envs, multiprocessing.cpu_count())
+        workers = min(workers, n_envs)
+        make_env = functools.partial(ShiftingChasmEnv, backend=backend, **env_options)
+
+        self.buffers = make_buffers(n_envs, shared=workers > 0)
+        self.arrays = buffer_arrays(self.buffers)
+        self.shards = []
+        self.pipes = []
+        self.processes = []
+        if workers > 0:
+            ctx = multiprocessing.get_context()
+            for indices in np.array_split(np.arange(n_envs), workers):
+                parent, child = ctx.Pipe()
+                process = ctx.Process(target=shard_worker, daemon=True,
+                                      args=(child, make_env, indices.tolist(), self.buffers))
+                process.start()
+                child.close()
+                self.pipes.append(parent)
+                self.processes.append(process)
+        else:
+            self.shards.append(EnvShard(make_env, range(n_envs), self.arrays))
+        self.closed = False
+
+        observation_space = self._call_all('get_attr', 'observation_space', {0})[0][0]
+        action_space = self._call_all('get_attr', 'action_space', {0})[0][0]
+        super().__init__(n_envs, observation_space, action_space)
+        if seed is not None:
+            self.seed(seed)
+
+    # --- Shard commands ------------------------------------------------------
+
+    def _call_all(self, command, *args):
+        """Run a command on every shard and return their results, in shard order"""
+        for pipe in self.pipes:
+            pipe.send((command, args))
+        results = [getattr(shard, command)(*args) for shard in self.shards]
+        results += [pipe.recv() for pipe in self.pipes]
+        return results
+
+    def _gather(self, command, *args):
+        return [value for values in self._call_all(command, *args) for value in values]
+
+    def _indices(self, indices):
+        if indices is None:
+            return set(range(self.num_envs))
+        if isinstance(indices, int):
+            return {indices}
+        return set(indices)
+
+    # --- VecEnv interface ----------------------------------------------------
+
+    def reset(self):
+        self._call_all('reset', self._seeds, self._options)
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs()
+
+    def step_async(self, actions):
+        self.arrays['actions'][:] = actions
+        for pipe in self.pipes:
+            pipe.send(('step', ()))
+
+    def step_wait(self):
+        for shard in self.shards:
+            shard.step()
+        for pipe in self.pipes:
+            pipe.recv()
+        a = self.arrays
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(a['dones']):
+            infos[i]['terminal_observation'] = {'grid': a['terminal_grid'][i].copy(),
+                                                'stats': a['terminal_stats'][i].copy()}
+            infos[i]['TimeLimit.truncated'] = bool(a['truncated'][i])
+        return self._obs(), a['rewards'].copy(), a['dones'].copy(), infos
+
+    def _obs(self):
+        # Copies, since the next step overwrites the shared arrays in place
+        return {'grid': self.arrays['grid'].copy(), 'stats': self.arrays['stats'].copy()}
+
+    def close(self):
+        if self.closed:
+            return
+        self._call_all('close')
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def get_attr(self, attr_name, indices=None):
+        return self._gather('get_attr', attr_name, self._indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call_all('set_attr', attr_name, value, self._indices(indices))
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._gather('env_method', method_name, method_args, method_kwargs, self._indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._gather('env_is_wrapped', wrapper_class, self._indices(indices))